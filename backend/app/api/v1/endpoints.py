@@ -1,18 +1,18 @@
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
+from typing import Literal
+import asyncio
 import hashlib
 import json
 import os
 import secrets
-import shutil
+import tempfile
 import time
-import unicodedata
 from uuid import uuid4
 
 import jwt
-from dotenv import load_dotenv
-from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
-from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
 from app.api.v1.models import (
     AnalyseData,
@@ -21,14 +21,25 @@ from app.api.v1.models import (
     CredsInput,
     NewProjectInfo,
     QuickAnalyseData,
+    RerunStagesData,
     ShareLinkCreateData,
 )
+from app.core.auth import (
+    ALGORITHM,
+    SECRET_KEY,
+    current_user_dependency,
+    resolve_auth_payload,
+)
+from app.core import blob_store
+from app.core.checkpoints import get_run
+from app.core.instrumentation import stage
+from app.core.rate_limit import RateLimiter, create_rate_limit_store
+from app.core.response_cache import cached_json_response, make_etag
+from app.core.serialization import to_columnar_transcript
+from app.core.share_links import hash_share_token, share_link_resolver
 from app.core.database import (
     build_project_dashboard_summary,
-    check_user,
-    create_analysis,
     create_project,
-    create_project_segment,
     create_project_share_link,
     create_user,
     get_project,
@@ -36,103 +47,48 @@ from app.core.database import (
     get_project_debate_type,
     get_project_for_user,
     get_project_segments,
+    get_project_version,
     get_project_chat_human_messages,
     get_project_chat_ai_messages,
-    get_project_share_link_by_token_hash,
     get_projects,
     get_projects_paginated,
+    get_user_by_name,
     get_user_code,
     list_project_share_links,
     revoke_project_share_link,
-    save_metrics,
-    save_transcription,
+    search_project_segments,
+    update_user_password_hash,
+)
+from app.core.job_queue import enqueue_job, get_job
+from app.core.security import HashPoolSaturated, get_password_hash_async, verify_and_update_password_async
+from app.services.analysis import (
+    ANALYSIS_MODE,
+    PROJECT_ANALYSIS_GRAPH,
+    build_metrics_summary,
+    build_transcript_preview,
 )
-from app.processors.pipeline import DebateFase, Postura, create_chat
-from app.services.metrics import process_complete_analysis
+from app.services.engine_profiles import get_engine_profile, list_engine_profiles
 from data.debate_types import get_debate_type, list_debate_types
+from data.debate_types.base import normalize_alias
 
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-DEPRECATION_SUNSET = "Wed, 30 Sep 2026 23:59:59 GMT"
 DEFAULT_SHARE_LINK_DAYS = 30
 
-RATE_LIMIT_WINDOW_SECONDS = 60
-RATE_LIMIT_MAX_REQUESTS = 60
-_public_dashboard_rate_limit: dict[str, list[float]] = {}
-
-UPLOAD_DIR = Path("uploads/audios")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Modo cola: cuánto espera la petición al worker antes de responder 202
+ANALYSIS_JOB_WAIT_SECONDS = float(os.getenv("ANALYSIS_JOB_WAIT_SECONDS", "600"))
+ANALYSIS_JOB_POLL_SECONDS = 0.5
 
-router = APIRouter()
-
-chats = {}
-
-upct_phase_enum_by_id = {
-    "introduccion": DebateFase.INTRO,
-    "refutacion_1": DebateFase.REF1,
-    "refutacion_2": DebateFase.REF2,
-    "conclusion": DebateFase.CONCLUSION,
-    "final": DebateFase.FINAL,
-}
-
-upct_postura_enum_by_value = {
-    "A Favor": Postura.FAVOR,
-    "En Contra": Postura.CONTRA,
-}
-
-KEY_METRICS_NAMES = [
-    "F0semitoneFrom27.5Hz_sma3nz_stddevNorm",
-    "loudness_sma3_amean",
-    "loudness_sma3_stddevNorm",
-    "loudnessPeaksPerSec",
-    "VoicedSegmentsPerSec",
-    "MeanUnvoicedSegmentLength",
-    "jitterLocal_sma3nz_amean",
-    "shimmerLocaldB_sma3nz_amean",
-]
-
-
-def _normalize_text(value: str) -> str:
-    normalized = unicodedata.normalize("NFKD", value)
-    ascii_value = "".join(c for c in normalized if not unicodedata.combining(c))
-    return " ".join(ascii_value.lower().strip().split())
-
-
-def _extract_bearer_token(request: Request) -> str | None:
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        return None
-    if not auth_header.lower().startswith("bearer "):
-        raise HTTPException(status_code=401, detail="invalid authorization header")
-    token = auth_header.split(" ", 1)[1].strip()
-    if not token:
-        raise HTTPException(status_code=401, detail="missing bearer token")
-    return token
-
-
-def _decode_access_token(token: str) -> dict:
-    try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    except ExpiredSignatureError as exc:
-        raise HTTPException(status_code=401, detail="token expired") from exc
-    except InvalidTokenError as exc:
-        raise HTTPException(status_code=401, detail="invalid token") from exc
+RATE_LIMIT_WINDOW_SECONDS = int(os.getenv("RATE_LIMIT_WINDOW_SECONDS", "60"))
+RATE_LIMIT_MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "60"))
+# Límite por enlace compartido (todas las IPs juntas), por minuto
+SHARE_LINK_RATE_LIMIT_PER_MINUTE = int(os.getenv("SHARE_LINK_RATE_LIMIT_PER_MINUTE", "600"))
 
+_rate_limit_store = create_rate_limit_store()
+_public_ip_limiter = RateLimiter(_rate_limit_store, RATE_LIMIT_MAX_REQUESTS, RATE_LIMIT_WINDOW_SECONDS)
+_share_link_limiter = RateLimiter(_rate_limit_store, SHARE_LINK_RATE_LIMIT_PER_MINUTE, 60)
 
-def _resolve_auth_payload(request: Request, response: Response, legacy_jwt: str | None) -> dict:
-    bearer_token = _extract_bearer_token(request)
-    if bearer_token:
-        return _decode_access_token(bearer_token)
-
-    if legacy_jwt:
-        response.headers["Deprecation"] = "true"
-        response.headers["Sunset"] = DEPRECATION_SUNSET
-        return _decode_access_token(legacy_jwt)
-
-    raise HTTPException(status_code=401, detail="missing authentication token")
+router = APIRouter()
 
 
 def _resolve_project_ownership_or_fail(user_code: str, project_code: str) -> dict:
@@ -147,19 +103,10 @@ def _resolve_project_ownership_or_fail(user_code: str, project_code: str) -> dic
 
 
 def _resolve_phase_config_or_422(debate_config, fase_input: str):
-    fase_cfg = debate_config.get_fase_by_id(fase_input)
+    fase_cfg = debate_config.resolve_fase(fase_input)
     if fase_cfg is not None:
         return fase_cfg
 
-    fase_cfg = debate_config.get_fase_by_nombre(fase_input)
-    if fase_cfg is not None:
-        return fase_cfg
-
-    normalized_input = _normalize_text(fase_input)
-    for candidate in debate_config.fases:
-        if normalized_input in {_normalize_text(candidate.id), _normalize_text(candidate.nombre)}:
-            return candidate
-
     valid_options = [f.id for f in debate_config.fases] + [f.nombre for f in debate_config.fases]
     raise HTTPException(
         status_code=422,
@@ -168,43 +115,30 @@ def _resolve_phase_config_or_422(debate_config, fase_input: str):
 
 
 def _resolve_postura_or_422(debate_config, postura_input: str) -> str:
-    valid_posturas = debate_config.get_posturas_validas()
-    if postura_input in valid_posturas:
-        return postura_input
-
-    normalized_input = _normalize_text(postura_input)
-    for postura in valid_posturas:
-        if normalized_input == _normalize_text(postura):
-            return postura
+    postura = debate_config.resolve_postura(postura_input)
+    if postura is not None:
+        return postura
 
     raise HTTPException(
         status_code=422,
-        detail=f"invalid postura '{postura_input}'. valid values: {valid_posturas}",
+        detail=f"invalid postura '{postura_input}'. valid values: {debate_config.get_posturas_validas()}",
     )
 
 
-def _build_metrics_summary(metrics: dict) -> dict:
-    summary = {}
-    for speaker, speaker_metrics in metrics.items():
-        summary[speaker] = {
-            metric_name: speaker_metrics.get(metric_name)
-            for metric_name in KEY_METRICS_NAMES
-            if metric_name in speaker_metrics
-        }
-    return summary
-
-
-def _build_transcript_preview(transcription: list[dict], max_len: int = 280) -> str:
-    full_text = " ".join(seg.get("text", "") for seg in transcription).strip()
-    if len(full_text) <= max_len:
-        return full_text
-    return full_text[:max_len].rstrip() + "..."
+def _resolve_engine_profile_or_422(*candidates: str | None) -> str:
+    # El primero no vacío gana: petición > proyecto > perfil por defecto
+    profile_name = next((c for c in candidates if c), None)
+    try:
+        return get_engine_profile(profile_name).name
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
 
 
 def _prepare_segments_for_response(
     segments: list[dict],
     include_transcript: bool,
     include_metrics: bool,
+    transcript_format: str = "rows",
 ) -> list[dict]:
     prepared = []
     for segment in segments:
@@ -233,6 +167,9 @@ def _prepare_segments_for_response(
         elif include_transcript:
             item["transcript"] = []
 
+        if transcript_format == "columnar" and "transcript" in item:
+            item["transcript"] = to_columnar_transcript(item["transcript"])
+
         item["transcript_preview"] = transcript_preview
 
         if include_metrics:
@@ -244,7 +181,7 @@ def _prepare_segments_for_response(
 
 
 def _to_fase_id(value: str) -> str:
-    return _normalize_text(value).replace(" ", "_")
+    return normalize_alias(value).replace(" ", "_")
 
 
 def _build_legacy_segments(
@@ -324,15 +261,15 @@ def _build_legacy_segments(
     def _matches_filter(item: dict) -> bool:
         if fase:
             fase_item = str(item.get("fase", ""))
-            if _normalize_text(fase_item) != _normalize_text(fase):
+            if normalize_alias(fase_item) != normalize_alias(fase):
                 return False
         if postura:
             postura_item = str(item.get("postura", ""))
-            if _normalize_text(postura_item) != _normalize_text(postura):
+            if normalize_alias(postura_item) != normalize_alias(postura):
                 return False
         if orador:
             orador_item = str(item.get("orador", ""))
-            if _normalize_text(orador_item) != _normalize_text(orador):
+            if normalize_alias(orador_item) != normalize_alias(orador):
                 return False
         return True
 
@@ -348,7 +285,7 @@ def _build_legacy_segments(
         if idx < len(legacy_prompts):
             transcript_items, metrics_items = _parse_legacy_prompt(legacy_prompts[idx])
 
-        transcript_preview = _build_transcript_preview(transcript_items) if transcript_items else ""
+        transcript_preview = build_transcript_preview(transcript_items) if transcript_items else ""
         recommendation = None
         if idx < len(legacy_ai_messages):
             try:
@@ -379,7 +316,7 @@ def _build_legacy_segments(
                     "score_percent": score_percent,
                     "recommendation": recommendation,
                 },
-                "metrics_summary": _build_metrics_summary(metrics_items),
+                "metrics_summary": build_metrics_summary(metrics_items),
                 "metrics_raw": metrics_items,
                 "transcript_preview": transcript_preview,
                 "transcript": transcript_items,
@@ -398,6 +335,7 @@ def _build_dashboard_payload(
     offset: int,
     include_transcript: bool,
     include_metrics: bool,
+    transcript_format: str = "rows",
 ) -> dict:
     filtered_all = get_project_segments(
         project_code=project["code"],
@@ -439,6 +377,7 @@ def _build_dashboard_payload(
                 paged_items,
                 include_transcript=include_transcript,
                 include_metrics=include_metrics,
+                transcript_format=transcript_format,
             ),
             "total": total_items,
             "limit": limit_items,
@@ -447,20 +386,32 @@ def _build_dashboard_payload(
     }
 
 
-def _enforce_public_rate_limit(request: Request) -> None:
+def _raise_if_limited(result, detail: str) -> None:
+    if result.allowed:
+        return
+    raise HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(result.retry_after)},
+    )
+
+
+async def _enforce_public_rate_limit(request: Request) -> None:
     source = request.client.host if request.client else "unknown"
-    now = time.time()
-    previous = _public_dashboard_rate_limit.get(source, [])
-    alive = [ts for ts in previous if now - ts <= RATE_LIMIT_WINDOW_SECONDS]
-
-    if len(alive) >= RATE_LIMIT_MAX_REQUESTS:
-        raise HTTPException(
-            status_code=429,
-            detail="rate limit exceeded for public dashboard",
-        )
+    _raise_if_limited(
+        await _public_ip_limiter.hit_async(f"public-ip:{source}"),
+        "rate limit exceeded for public dashboard",
+    )
+
 
-    alive.append(now)
-    _public_dashboard_rate_limit[source] = alive
+async def _enforce_share_link_rate_limit(share_link: dict) -> None:
+    _raise_if_limited(
+        await _share_link_limiter.hit_async(
+            f"share-link:{share_link.get('share_id')}",
+            limit=share_link.get("rate_limit_per_minute"),
+        ),
+        "rate limit exceeded for this share link",
+    )
 
 
 @router.post("/status")
@@ -473,13 +424,33 @@ async def get_debate_types():
     return {"debate_types": list_debate_types()}
 
 
+@router.get("/engine-profiles")
+async def get_engine_profiles():
+    return {"engine_profiles": list_engine_profiles()}
+
+
+def _hash_pool_busy(exc: HashPoolSaturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+
+
 @router.post("/login")
 async def login(data: CredsInput):
-    creds = {"user": data.user, "pswd": data.pswd}
-    if not check_user(creds):
+    user = get_user_by_name(data.user)
+    if user is None:
         raise HTTPException(status_code=401, detail="incorrect login")
 
-    user_code = get_user_code(creds)
+    # PBKDF2 en el pool de hashing: una ráfaga de logins no bloquea el resto de rutas
+    try:
+        valid, new_hash = await verify_and_update_password_async(data.pswd, user["pswd"])
+    except HashPoolSaturated as exc:
+        raise _hash_pool_busy(exc) from exc
+    if not valid:
+        raise HTTPException(status_code=401, detail="incorrect login")
+    if new_hash:
+        # Las escrituras de TinyDB esperan al fsync: fuera del event loop
+        await run_in_threadpool(update_user_password_hash, user["code"], new_hash)
+
+    user_code = user["code"]
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     payload = {
         "sub": data.user,
@@ -498,7 +469,15 @@ async def login(data: CredsInput):
 @router.post("/register")
 async def register(data: CredsInput):
     creds = {"user": data.user, "pswd": data.pswd}
-    if not create_user(creds):
+    if get_user_by_name(data.user) is not None:
+        raise HTTPException(status_code=400, detail="incorrect register")
+
+    try:
+        pswd_hash = await get_password_hash_async(data.pswd)
+    except HashPoolSaturated as exc:
+        raise _hash_pool_busy(exc) from exc
+    creds_to_store = {**creds, "pswd_hash": pswd_hash}
+    if not await run_in_threadpool(create_user, creds_to_store):
         raise HTTPException(status_code=400, detail="incorrect register")
 
     user_code = get_user_code(creds)
@@ -519,15 +498,18 @@ async def register(data: CredsInput):
 
 @router.post("/new-project")
 async def newproject(data: NewProjectInfo, request: Request, response: Response):
-    payload = _resolve_auth_payload(request, response, data.jwt)
+    payload = resolve_auth_payload(request, response, data.jwt)
     user_code = payload["user_code"]
 
     try:
         get_debate_type(data.debate_type)
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if data.engine_profile:
+        _resolve_engine_profile_or_422(data.engine_profile)
 
-    project_code = create_project(
+    project_code = await run_in_threadpool(
+        create_project,
         {
             "name": data.name,
             "desc": data.description,
@@ -536,7 +518,8 @@ async def newproject(data: NewProjectInfo, request: Request, response: Response)
             "team_a_name": data.team_a_name,
             "team_b_name": data.team_b_name,
             "debate_topic": data.debate_topic,
-        }
+            "engine_profile": data.engine_profile,
+        },
     )
     if project_code is None:
         raise HTTPException(status_code=500, detail="project creation failed")
@@ -548,18 +531,102 @@ async def newproject(data: NewProjectInfo, request: Request, response: Response)
         "team_a_name": data.team_a_name,
         "team_b_name": data.team_b_name,
         "debate_topic": data.debate_topic,
+        "engine_profile": data.engine_profile,
     }
 
 
+async def _run_analysis_job(kind: str, job: dict):
+    """
+    Ejecuta un análisis según CICERON_ANALYSIS_MODE.
+
+    En modo "inline" se ejecuta en el threadpool de este proceso. En modo
+    "queue" se encola para los workers de análisis y se espera el resultado
+    hasta ANALYSIS_JOB_WAIT_SECONDS; si no llega a tiempo se responde 202
+    con el job_id para consultarlo en /jobs/{job_id}.
+    """
+    if ANALYSIS_MODE != "queue":
+        from app.services.analysis import JOB_RUNNERS, AnalysisError
+        from app.services.batching import SchedulerOverloaded
+
+        try:
+            return await run_in_threadpool(JOB_RUNNERS[kind], job)
+        except SchedulerOverloaded as exc:
+            raise HTTPException(
+                status_code=503,
+                detail=f"transcription queue is busy: {exc}",
+                headers={"Retry-After": "5"},
+            ) from exc
+        except AnalysisError as exc:
+            raise HTTPException(status_code=500, detail=str(exc)) from exc
+        except Exception as exc:
+            raise HTTPException(status_code=500, detail=f"error while analysing {exc}") from exc
+        finally:
+            await run_in_threadpool(blob_store.release_job_audio, job)
+
+    # El worker que procese el trabajo libera el audio al terminar
+    job_id = enqueue_job(kind, job)
+    deadline = time.monotonic() + ANALYSIS_JOB_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(ANALYSIS_JOB_POLL_SECONDS)
+        queued_job = get_job(job_id)
+        if queued_job["status"] == "done":
+            return queued_job["result"]
+        if queued_job["status"] == "failed":
+            _raise_job_error(queued_job)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "message": "analysis queued",
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/v1/jobs/{job_id}",
+        },
+    )
+
+
+def _raise_job_error(job: dict) -> None:
+    error = job.get("error") or {}
+    status_code = error.get("status_code", 500)
+    headers = {"Retry-After": "5"} if status_code == 503 else None
+    raise HTTPException(
+        status_code=status_code,
+        detail=error.get("detail", "error while analysing"),
+        headers=headers,
+    )
+
+
+async def _save_upload(upload, route: str, project_code: str | None = None) -> dict:
+    """
+    Guarda la subida en el almacén de audio con una referencia `upload:`
+    que se libera al terminar el análisis.
+
+    Returns:
+        Campos del trabajo: file_path, audio_ref y audio_sha256
+    """
+    audio_ref = f"upload:{uuid4()}"
+    with stage("upload", route=route):
+        blob = await run_in_threadpool(blob_store.put_stream, upload.file, audio_ref, project_code)
+        await upload.close()
+    return {"file_path": blob["path"], "audio_ref": audio_ref, "audio_sha256": blob["sha256"]}
+
+
+async def _reuse_project_audio(audio_id: str, project_code: str) -> dict:
+    audio_ref = f"upload:{uuid4()}"
+    blob = await run_in_threadpool(
+        blob_store.acquire, audio_id, audio_ref, project_code, required_project=project_code)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="audio not found")
+    return {"file_path": blob["path"], "audio_ref": audio_ref, "audio_sha256": blob["sha256"]}
+
+
 @router.post("/analyse")
 async def analyse(
     request: Request,
     response: Response,
     data: AnalyseData = Depends(AnalyseData.as_form),
 ):
-    file_path = None
-
-    payload = _resolve_auth_payload(request, response, data.jwt)
+    payload = resolve_auth_payload(request, response, data.jwt)
     user_code = payload["user_code"]
     project = _resolve_project_ownership_or_fail(user_code, data.project_code)
 
@@ -571,200 +638,141 @@ async def analyse(
 
     fase_cfg = _resolve_phase_config_or_422(debate_config, data.fase)
     postura_str = _resolve_postura_or_422(debate_config, data.postura)
+    engine_profile = _resolve_engine_profile_or_422(
+        data.engine_profile, project.get("engine_profile"))
+
+    if data.audio_id:
+        audio = await _reuse_project_audio(data.audio_id, project["code"])
+    else:
+        audio = await _save_upload(data.file, "analyse", project["code"])
+    job = {
+        **audio,
+        "run_id": str(uuid4()),
+        "project_code": project["code"],
+        "user_code": user_code,
+        "debate_type": debate_type_id,
+        "fase_id": fase_cfg.id,
+        "postura": postura_str,
+        "orador": data.orador,
+        "num_speakers": data.num_speakers,
+        "engine_profile": engine_profile,
+        "prosody_mode": data.prosody_mode,
+    }
+    return await _run_analysis_job("analyse", job)
 
+
+@router.post("/quick-analyse")
+async def quick_analyse(data: QuickAnalyseData = Depends(QuickAnalyseData.as_form)):
     try:
-        file_name = f"{uuid4()}.wav"
-        file_path = UPLOAD_DIR / file_name
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(data.file.file, buffer)
-        await data.file.close()
-
-        if chats.get(project["code"]) is None:
-            chats[project["code"]] = create_chat(
-                project["code"],
-                project["code"],
-                debate_type_config=debate_config,
-            )
-        chat = chats[project["code"]]
-
-        analysis_data = process_complete_analysis(str(file_path), num_speakers=data.num_speakers)
-        transcription = analysis_data["transcript"]
-        metrics = analysis_data["metrics"]
-
-        save_transcription(str(file_path), transcription, "")
-        save_metrics(str(file_path), metrics)
-
-        duracion = None
-        if transcription:
-            duracion = transcription[-1]["end"] - transcription[0]["start"]
-
-        if debate_type_id == "upct" and fase_cfg.id in upct_phase_enum_by_id:
-            fase_arg = upct_phase_enum_by_id[fase_cfg.id]
-            postura_arg = upct_postura_enum_by_value[postura_str]
-        else:
-            fase_arg = fase_cfg.id
-            postura_arg = postura_str
-
-        resultado = chat.send_evaluation(
-            fase=fase_arg,
-            postura=postura_arg,
-            orador=data.orador,
-            transcripcion=transcription,
-            metricas=metrics,
-            duracion_segundos=duracion,
-        )
+        debate_config = get_debate_type(data.debate_type)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
 
-        criterios = []
-        total = 0
-        for criterio, nota in resultado.puntuaciones.items():
-            anotacion = resultado.anotaciones.get(criterio, "")
-            criterios.append({"criterio": criterio, "nota": nota, "anotacion": anotacion})
-            total += nota
+    fase_cfg = _resolve_phase_config_or_422(debate_config, data.fase)
+    postura_str = _resolve_postura_or_422(debate_config, data.postura)
+    engine_profile = _resolve_engine_profile_or_422(data.engine_profile)
 
-        max_total = len(resultado.puntuaciones) * debate_config.escala_max
-        score_percent = round((total / max_total) * 100, 2) if max_total > 0 else 0.0
+    audio = await _save_upload(data.file, "quick-analyse")
+    job = {
+        **audio,
+        "debate_type": data.debate_type,
+        "fase_id": fase_cfg.id,
+        "postura": postura_str,
+        "orador": data.orador,
+        "num_speakers": data.num_speakers,
+        "engine_profile": engine_profile,
+        "prosody_mode": data.prosody_mode,
+    }
+    return await _run_analysis_job("quick_analyse", job)
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str, request: Request, response: Response):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+
+    # Los análisis de proyecto solo los consulta su dueño; los rápidos son
+    # anónimos y el job_id (uuid4) actúa como credencial
+    owner = job["payload"].get("user_code")
+    if owner is not None:
+        payload = resolve_auth_payload(request, response, None)
+        if payload["user_code"] != owner:
+            raise HTTPException(status_code=404, detail="job not found")
+
+    if job["status"] == "failed":
+        _raise_job_error(job)
+
+    body = {
+        "job_id": job_id,
+        "kind": job["kind"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+    }
+    if job["status"] == "done":
+        body["result"] = job["result"]
+    return body
 
-        if not create_analysis(
-            {
-                "fase": resultado.fase,
-                "postura": resultado.postura,
-                "orador": resultado.orador,
-                "criterios": criterios,
-                "total": total,
-                "max_total": max_total,
-                "project_code": project["code"],
-                "debate_type": debate_type_id,
-            }
-        ):
-            raise HTTPException(status_code=500, detail="error while saving legacy analysis")
 
-        segment_payload = {
-            "segment_id": str(uuid4()),
-            "project_code": project["code"],
-            "user_code": user_code,
-            "debate_type": debate_type_id,
-            "fase_id": fase_cfg.id,
-            "fase_nombre": fase_cfg.nombre,
-            "postura": postura_str,
-            "orador": data.orador,
-            "num_speakers": data.num_speakers,
-            "duration_seconds": duracion,
-            "transcript": transcription,
-            "transcript_preview": _build_transcript_preview(transcription),
-            "metrics_summary": _build_metrics_summary(metrics),
-            "metrics_raw": metrics,
-            "analysis": {
-                "criterios": criterios,
-                "total": total,
-                "max_total": max_total,
-                "score_percent": score_percent,
-            },
-            "created_at": datetime.now(timezone.utc).isoformat(),
-        }
-        if not create_project_segment(segment_payload):
-            raise HTTPException(status_code=500, detail="error while saving project segment")
+def _get_run_for_user_or_404(run_id: str, user_code: str) -> dict:
+    run = get_run(run_id)
+    if run is None or run["user_code"] != user_code:
+        raise HTTPException(status_code=404, detail="run not found")
+    return run
 
-        return {
-            "message": "analysis succeeded!",
-            "fase": fase_cfg.nombre,
-            "fase_id": fase_cfg.id,
-            "postura": resultado.postura,
-            "orador": resultado.orador,
-            "criterios": criterios,
-            "total": total,
-            "max_total": max_total,
-            "score_percent": score_percent,
-            "debate_type": debate_type_id,
-        }
 
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"error while analysing {exc}") from exc
-    finally:
-        if file_path is not None and file_path.exists():
-            file_path.unlink()
+@router.get("/runs/{run_id}")
+async def get_analysis_run(
+    run_id: str,
+    payload: dict = Depends(current_user_dependency),
+):
+    run = await run_in_threadpool(_get_run_for_user_or_404, run_id, payload["user_code"])
+    return {
+        "run_id": run["run_id"],
+        "kind": run["kind"],
+        "project_code": run["payload"].get("project_code"),
+        "stages": [
+            {"stage": name, "completed": name in run["stages"], "completed_at": run["stages"].get(name)}
+            for name in PROJECT_ANALYSIS_GRAPH.names
+        ],
+        "created_at": run["created_at"],
+        "updated_at": run["updated_at"],
+    }
 
 
-@router.post("/quick-analyse")
-async def quick_analyse(data: QuickAnalyseData = Depends(QuickAnalyseData.as_form)):
-    file_path = None
+@router.post("/runs/{run_id}/rerun")
+async def rerun_analysis_run(
+    run_id: str,
+    data: RerunStagesData,
+    request: Request,
+    response: Response,
+):
+    payload = resolve_auth_payload(request, response, data.jwt)
+    run = await run_in_threadpool(_get_run_for_user_or_404, run_id, payload["user_code"])
+    _resolve_project_ownership_or_fail(payload["user_code"], run["payload"]["project_code"])
 
     try:
-        try:
-            debate_config = get_debate_type(data.debate_type)
-        except ValueError as exc:
-            raise HTTPException(status_code=422, detail=str(exc)) from exc
-
-        fase_cfg = _resolve_phase_config_or_422(debate_config, data.fase)
-        postura_str = _resolve_postura_or_422(debate_config, data.postura)
-
-        file_name = f"quick_{uuid4()}.wav"
-        file_path = UPLOAD_DIR / file_name
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(data.file.file, buffer)
-        await data.file.close()
-
-        temp_session_id = f"quick_{id(data)}"
-        chat = create_chat(temp_session_id, temp_session_id, debate_type_config=debate_config)
-
-        analysis_data = process_complete_analysis(str(file_path), num_speakers=data.num_speakers)
-        transcription = analysis_data["transcript"]
-        metrics = analysis_data["metrics"]
-
-        duracion = None
-        if transcription:
-            duracion = transcription[-1]["end"] - transcription[0]["start"]
-
-        if data.debate_type == "upct" and fase_cfg.id in upct_phase_enum_by_id:
-            fase_arg = upct_phase_enum_by_id[fase_cfg.id]
-            postura_arg = upct_postura_enum_by_value[postura_str]
-        else:
-            fase_arg = fase_cfg.id
-            postura_arg = postura_str
-
-        resultado = chat.send_evaluation(
-            fase=fase_arg,
-            postura=postura_arg,
-            orador=data.orador,
-            transcripcion=transcription,
-            metricas=metrics,
-            duracion_segundos=duracion,
-        )
-
-        criterios = []
-        total = 0
-        for criterio, nota in resultado.puntuaciones.items():
-            anotacion = resultado.anotaciones.get(criterio, "")
-            criterios.append({"criterio": criterio, "nota": nota, "anotacion": anotacion})
-            total += nota
-
-        max_total = len(resultado.puntuaciones) * debate_config.escala_max
+        stages = PROJECT_ANALYSIS_GRAPH.with_dependents(data.stages)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
 
-        chat.clear_history()
-        return {
-            "message": "quick analysis succeeded!",
-            "fase": fase_cfg.nombre,
-            "fase_id": fase_cfg.id,
-            "postura": resultado.postura,
-            "orador": resultado.orador,
-            "criterios": criterios,
-            "total": total,
-            "max_total": max_total,
-            "debate_type": data.debate_type,
-        }
-    except HTTPException:
-        raise
-    except Exception as exc:
-        raise HTTPException(status_code=500, detail=f"error while analysing {exc}") from exc
-    finally:
-        if file_path is not None and file_path.exists():
-            file_path.unlink()
+    # Referencia propia al audio mientras dura la re-ejecución; la del
+    # análisis original ya se liberó al terminar
+    job = {**run["payload"], "run_id": run_id, "rerun": stages, "audio_ref": f"upload:{uuid4()}"}
+    blob = None
+    if job.get("audio_sha256"):
+        blob = await run_in_threadpool(
+            blob_store.acquire, job["audio_sha256"], job["audio_ref"], job["project_code"])
+    if blob is None and {"transcription", "metrics"}.intersection(stages):
+        raise HTTPException(status_code=409, detail="audio no longer available, re-run evaluation or persistence only")
+    if blob is not None:
+        job["file_path"] = blob["path"]
+    return await _run_analysis_job("analyse", job)
 
 
 @router.post("/get-projects")
 async def getprojects(data: AuthDataProjects, request: Request, response: Response):
-    payload = _resolve_auth_payload(request, response, data.jwt)
+    payload = resolve_auth_payload(request, response, data.jwt)
 
     # Legacy response is preserved in "result" while adding pagination metadata.
     legacy_result = get_projects({"user_code": payload["user_code"]})
@@ -786,32 +794,81 @@ async def getprojects(data: AuthDataProjects, request: Request, response: Respon
     }
 
 
+@router.get("/search/transcripts")
+async def search_transcripts(
+    payload: dict = Depends(current_user_dependency),
+    q: str = Query(min_length=1, max_length=200),
+    project_code: str | None = Query(default=None),
+    fase: str | None = Query(default=None),
+    postura: str | None = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    # Con proyecto, fase y postura se aceptan en cualquier forma (id/nombre,
+    # sin acentos); sin él se comparan tal cual con lo guardado
+    if project_code:
+        project = _resolve_project_ownership_or_fail(payload["user_code"], project_code)
+        debate_config = get_debate_type(get_project_debate_type(project["code"]))
+        if fase:
+            fase = _resolve_phase_config_or_422(debate_config, fase).id
+        if postura:
+            postura = _resolve_postura_or_422(debate_config, postura)
+
+    found = search_project_segments(
+        payload["user_code"],
+        q,
+        project_code=project_code,
+        fase_id=fase,
+        postura=postura,
+        limit=limit,
+        offset=offset,
+    )
+    items = []
+    for hit in found["items"]:
+        project = get_project_by_code(hit["project_code"]) or {}
+        items.append({**hit, "project_name": project.get("name")})
+    return {"items": items, "total": found["total"], "limit": limit, "offset": offset}
+
+
 @router.post("/get-project")
 async def getproject(data: AuthDataProject, request: Request, response: Response):
-    payload = _resolve_auth_payload(request, response, data.jwt)
+    payload = resolve_auth_payload(request, response, data.jwt)
     project = _resolve_project_ownership_or_fail(payload["user_code"], data.project_code)
 
-    result = get_project({"user_code": payload["user_code"], "project_code": data.project_code})
-    response_payload = {
-        "message": f"here is project {data.project_code}",
-        "project": project,
-        "content": result,
-    }
+    # El ETag solo depende de la versión del proyecto y de los parámetros: si el
+    # cliente ya lo tiene se responde 304 sin reconstruir el dashboard
+    etag = make_etag(
+        "get-project",
+        project["code"],
+        get_project_version(project["code"]),
+        data.model_dump(exclude={"jwt"}),
+    )
 
-    if data.include_segments:
-        dashboard = _build_dashboard_payload(
-            project=project,
-            fase=data.fase,
-            postura=data.postura,
-            orador=data.orador,
-            limit=data.limit,
-            offset=data.offset,
-            include_transcript=data.include_transcript,
-            include_metrics=data.include_metrics,
-        )
-        response_payload["dashboard"] = dashboard
+    def build() -> dict:
+        result = get_project({"user_code": payload["user_code"], "project_code": data.project_code})
+        response_payload = {
+            "message": f"here is project {data.project_code}",
+            "project": project,
+            "content": result,
+        }
+
+        if data.include_segments:
+            dashboard = _build_dashboard_payload(
+                project=project,
+                fase=data.fase,
+                postura=data.postura,
+                orador=data.orador,
+                limit=data.limit,
+                offset=data.offset,
+                include_transcript=data.include_transcript,
+                include_metrics=data.include_metrics,
+                transcript_format=data.transcript_format,
+            )
+            response_payload["dashboard"] = dashboard
 
-    return response_payload
+        return response_payload
+
+    return cached_json_response(request, response, etag, build)
 
 
 @router.post("/projects/{project_code}/share-links")
@@ -821,7 +878,7 @@ async def create_share_link(
     request: Request,
     response: Response,
 ):
-    payload = _resolve_auth_payload(request, response, data.jwt)
+    payload = resolve_auth_payload(request, response, data.jwt)
     project = _resolve_project_ownership_or_fail(payload["user_code"], project_code)
 
     now = datetime.now(timezone.utc)
@@ -833,26 +890,26 @@ async def create_share_link(
         raise HTTPException(status_code=422, detail="expires_at must be in the future")
 
     raw_token = secrets.token_urlsafe(32)
-    token_hash = hashlib.sha256(raw_token.encode("utf-8")).hexdigest()
+    token_hash = hash_share_token(raw_token)
     share_id = str(uuid4())
 
-    created = create_project_share_link(
-        {
-            "share_id": share_id,
-            "project_code": project["code"],
-            "owner_user_code": payload["user_code"],
-            "token_hash": token_hash,
-            "token_prefix": raw_token[:8],
-            "allow_full_transcript": data.allow_full_transcript,
-            "allow_raw_metrics": data.allow_raw_metrics,
-            "expires_at": expires_at.isoformat(),
-            "revoked": False,
-            "created_at": now.isoformat(),
-            "revoked_at": None,
-        }
-    )
-    if not created:
+    share_link = {
+        "share_id": share_id,
+        "project_code": project["code"],
+        "owner_user_code": payload["user_code"],
+        "token_hash": token_hash,
+        "token_prefix": raw_token[:8],
+        "allow_full_transcript": data.allow_full_transcript,
+        "allow_raw_metrics": data.allow_raw_metrics,
+        "rate_limit_per_minute": data.rate_limit_per_minute,
+        "expires_at": expires_at.isoformat(),
+        "revoked": False,
+        "created_at": now.isoformat(),
+        "revoked_at": None,
+    }
+    if not await run_in_threadpool(create_project_share_link, share_link):
         raise HTTPException(status_code=500, detail="failed to create share link")
+    share_link_resolver.add(share_link)
 
     public_url = str(request.base_url).rstrip("/") + f"/api/v1/public/dashboard/{raw_token}"
     return {
@@ -866,11 +923,8 @@ async def create_share_link(
 @router.get("/projects/{project_code}/share-links")
 async def list_share_links(
     project_code: str,
-    request: Request,
-    response: Response,
-    jwt: str | None = Query(default=None),
+    payload: dict = Depends(current_user_dependency),
 ):
-    payload = _resolve_auth_payload(request, response, jwt)
     _resolve_project_ownership_or_fail(payload["user_code"], project_code)
 
     links = list_project_share_links(project_code, payload["user_code"])
@@ -883,6 +937,7 @@ async def list_share_links(
                 "token_prefix": link.get("token_prefix"),
                 "allow_full_transcript": link.get("allow_full_transcript", False),
                 "allow_raw_metrics": link.get("allow_raw_metrics", False),
+                "rate_limit_per_minute": link.get("rate_limit_per_minute"),
                 "expires_at": link.get("expires_at"),
                 "revoked": link.get("revoked", False),
                 "created_at": link.get("created_at"),
@@ -896,20 +951,66 @@ async def list_share_links(
 async def revoke_share_link(
     project_code: str,
     share_id: str,
-    request: Request,
-    response: Response,
-    jwt: str | None = Query(default=None),
+    payload: dict = Depends(current_user_dependency),
 ):
-    payload = _resolve_auth_payload(request, response, jwt)
     _resolve_project_ownership_or_fail(payload["user_code"], project_code)
 
-    revoked = revoke_project_share_link(project_code, payload["user_code"], share_id)
+    revoked = await run_in_threadpool(
+        revoke_project_share_link, project_code, payload["user_code"], share_id)
     if not revoked:
         raise HTTPException(status_code=404, detail="share link not found")
+    share_link_resolver.invalidate(share_id)
 
     return {"message": "share link revoked", "share_id": share_id, "revoked": True}
 
 
+@router.get("/projects/{project_code}/export")
+async def export_project(
+    project_code: str,
+    background_tasks: BackgroundTasks,
+    payload: dict = Depends(current_user_dependency),
+    format: Literal["ndjson", "parquet"] = Query(default="ndjson"),
+    cursor: str | None = Query(default=None),
+):
+    from app.services.export import (
+        ExportError,
+        iter_export_records,
+        iter_ndjson,
+        parquet_available,
+        write_parquet,
+    )
+
+    project = _resolve_project_ownership_or_fail(payload["user_code"], project_code)
+    try:
+        records = iter_export_records([project["code"]], cursor=cursor)
+    except ExportError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if format == "ndjson":
+        return StreamingResponse(
+            iter_ndjson(records),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{project["code"]}.ndjson"'},
+        )
+
+    if not parquet_available():
+        raise HTTPException(status_code=422, detail="parquet export requires pyarrow")
+    # Parquet necesita escribir el pie al final: se escribe por lotes en un
+    # fichero temporal y se sirve desde disco
+    with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp_file:
+        tmp_path = tmp_file.name
+    try:
+        await run_in_threadpool(write_parquet, records, tmp_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    background_tasks.add_task(os.unlink, tmp_path)
+    return FileResponse(
+        tmp_path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"{project['code']}.parquet",
+    )
+
+
 @router.get("/public/dashboard/{token}")
 async def public_dashboard(
     token: str,
@@ -919,13 +1020,14 @@ async def public_dashboard(
     orador: str | None = Query(default=None),
     limit: int = Query(default=20, ge=1, le=100),
     offset: int = Query(default=0, ge=0),
+    transcript_format: Literal["rows", "columnar"] = Query(default="rows"),
 ):
-    _enforce_public_rate_limit(request)
+    await _enforce_public_rate_limit(request)
 
-    token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
-    share_link = get_project_share_link_by_token_hash(token_hash)
-    if not share_link:
+    resolved = share_link_resolver.resolve(token)
+    if resolved is None:
         raise HTTPException(status_code=404, detail="share link not found")
+    share_link, project = resolved
 
     if share_link.get("revoked", False):
         raise HTTPException(status_code=410, detail="share link revoked")
@@ -935,7 +1037,8 @@ async def public_dashboard(
     if expires_at <= datetime.now(timezone.utc):
         raise HTTPException(status_code=410, detail="share link expired")
 
-    project = get_project_by_code(share_link["project_code"])
+    await _enforce_share_link_rate_limit(share_link)
+
     if not project:
         raise HTTPException(status_code=404, detail="project not found")
 
@@ -948,19 +1051,37 @@ async def public_dashboard(
         },
     )
 
-    dashboard = _build_dashboard_payload(
-        project=project,
-        fase=fase,
-        postura=postura,
-        orador=orador,
-        limit=limit,
-        offset=offset,
-        include_transcript=True,
-        include_metrics=share_link.get("allow_raw_metrics", False),
+    include_metrics = share_link.get("allow_raw_metrics", False)
+    etag = make_etag(
+        "public-dashboard",
+        project["code"],
+        get_project_version(project["code"]),
+        share_link.get("share_id"),
+        include_metrics,
+        fase,
+        postura,
+        orador,
+        limit,
+        offset,
+        transcript_format,
     )
 
-    return {
-        "project": dashboard["project"],
-        "summary": dashboard["summary"],
-        "segments": dashboard["segments"],
-    }
+    def build() -> dict:
+        dashboard = _build_dashboard_payload(
+            project=project,
+            fase=fase,
+            postura=postura,
+            orador=orador,
+            limit=limit,
+            offset=offset,
+            include_transcript=True,
+            include_metrics=include_metrics,
+            transcript_format=transcript_format,
+        )
+        return {
+            "project": dashboard["project"],
+            "summary": dashboard["summary"],
+            "segments": dashboard["segments"],
+        }
+
+    return cached_json_response(request, Response(), etag, build)
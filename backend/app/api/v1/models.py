@@ -1,8 +1,8 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import File, Form, UploadFile
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 import re
 
 
@@ -42,6 +42,7 @@ class NewProjectInfo(BaseModel):
     team_a_name: str = Field(default="Equipo A", min_length=1, max_length=64)
     team_b_name: str = Field(default="Equipo B", min_length=1, max_length=64)
     debate_topic: str = Field(default="", min_length=0, max_length=256)
+    engine_profile: Optional[str] = Field(default=None, max_length=32)
 
 
 class AnalyseData(BaseModel):
@@ -53,11 +54,17 @@ class AnalyseData(BaseModel):
     num_speakers: int = Field(...)
     jwt: Optional[str] = Field(default=None)
     project_code: str = Field(...)
-    file: UploadFile
+    engine_profile: Optional[str] = Field(default=None, max_length=32)
+    prosody_mode: Optional[Literal["full", "key"]] = Field(default=None)
+    # Audio ya guardado de este proyecto (sha256) en lugar de subirlo otra vez
+    audio_id: Optional[str] = Field(default=None, pattern=r"^[0-9a-f]{64}$")
+    file: Optional[UploadFile] = Field(default=None)
 
     @field_validator('file')
     @classmethod
-    def validate_wav(cls, v: UploadFile) -> UploadFile:
+    def validate_wav(cls, v: Optional[UploadFile]) -> Optional[UploadFile]:
+        if v is None:
+            return v
         if not v.filename.lower().endswith('.wav'):
             raise ValueError('El archivo debe tener extensión .wav')
 
@@ -68,6 +75,12 @@ class AnalyseData(BaseModel):
 
         return v
 
+    @model_validator(mode="after")
+    def validate_audio_source(self) -> "AnalyseData":
+        if (self.file is None) == (self.audio_id is None):
+            raise ValueError("send either file or audio_id")
+        return self
+
     @classmethod
     def as_form(
         cls,
@@ -77,7 +90,10 @@ class AnalyseData(BaseModel):
         num_speakers: int = Form(...),
         jwt: Optional[str] = Form(default=None),
         project_code: str = Form(...),
-        file: UploadFile = File(...)
+        engine_profile: Optional[str] = Form(default=None),
+        prosody_mode: Optional[Literal["full", "key"]] = Form(default=None),
+        audio_id: Optional[str] = Form(default=None),
+        file: Optional[UploadFile] = File(default=None)
     ) -> "AnalyseData":
         return cls(
             fase=fase,
@@ -86,6 +102,9 @@ class AnalyseData(BaseModel):
             num_speakers=num_speakers,
             jwt=jwt,
             project_code=project_code,
+            engine_profile=engine_profile,
+            prosody_mode=prosody_mode,
+            audio_id=audio_id,
             file=file
         )
 
@@ -100,6 +119,7 @@ class AuthDataProject(BaseModel):
     include_segments: bool = Field(default=False)
     include_transcript: bool = Field(default=False)
     include_metrics: bool = Field(default=False)
+    transcript_format: Literal["rows", "columnar"] = Field(default="rows")
     fase: Optional[str] = Field(default=None, max_length=64)
     postura: Optional[str] = Field(default=None, max_length=32)
     orador: Optional[str] = Field(default=None, max_length=128)
@@ -124,6 +144,8 @@ class QuickAnalyseData(BaseModel):
     orador: str = Field(...)
     num_speakers: int = Field(...)
     debate_type: str = Field(default="upct", min_length=1, max_length=32)
+    engine_profile: Optional[str] = Field(default=None, max_length=32)
+    prosody_mode: Optional[Literal["full", "key"]] = Field(default=None)
     file: UploadFile
 
     @field_validator('file')
@@ -147,6 +169,8 @@ class QuickAnalyseData(BaseModel):
         orador: str = Form(...),
         num_speakers: int = Form(...),
         debate_type: str = Form(default="upct"),
+        engine_profile: Optional[str] = Form(default=None),
+        prosody_mode: Optional[Literal["full", "key"]] = Form(default=None),
         file: UploadFile = File(...)
     ) -> "QuickAnalyseData":
         return cls(
@@ -155,6 +179,8 @@ class QuickAnalyseData(BaseModel):
             orador=orador,
             num_speakers=num_speakers,
             debate_type=debate_type,
+            engine_profile=engine_profile,
+            prosody_mode=prosody_mode,
             file=file
         )
 
@@ -164,3 +190,9 @@ class ShareLinkCreateData(BaseModel):
     expires_at: Optional[datetime] = Field(default=None)
     allow_full_transcript: bool = Field(default=False)
     allow_raw_metrics: bool = Field(default=False)
+    rate_limit_per_minute: Optional[int] = Field(default=None, ge=1, le=100000)
+
+
+class RerunStagesData(BaseModel):
+    jwt: Optional[str] = Field(default=None)
+    stages: list[str] = Field(..., min_length=1)
@@ -1,40 +1,30 @@
 from app.api.v2.models import ProjectModel
-from app.core.database import create_analysis, create_project, check_team, get_stats, save_audio_path, check_user_existence, get_audio_path, save_transcription, get_transcription, save_metrics, get_postura, get_orador, get_saved_transcription_diarization, get_saved_metrics, create_team, get_audio_paths
-from app.processors.pipeline import DebateFase, Postura, create_chat
-from app.services.transcription import split_audio
-from app.services.metrics import process_complete_analysis
-from app.services.helpers import del_audios
+from app.core.database import create_analysis, create_project, check_team, get_stats, save_audio_path, check_user_existence, get_audio_path, save_transcription, get_transcription, save_metrics, get_postura, get_orador, get_saved_transcription_diarization, get_saved_metrics, create_team
+from app.core.auth import decode_access_token
+from app.core import blob_store
 
 from fastapi import APIRouter, File, UploadFile, HTTPException, status, Depends, Form
-import os
-import jwt
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from pathlib import Path
-import shutil
 
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
-UPLOAD_DIR = Path("uploads/audios")
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-
 projects_router = APIRouter()
 
+# Nombres de los enums de app.processors.pipeline (se importa de forma diferida)
 fases = {
-    "Introducción": DebateFase.INTRO,
-    "Refutación 1": DebateFase.REF1,
-    "Refutación 2": DebateFase.REF2,
-    "Conclusión": DebateFase.CONCLUSION,
-    "Final": DebateFase.FINAL
+    "Introducción": "INTRO",
+    "Refutación 1": "REF1",
+    "Refutación 2": "REF2",
+    "Conclusión": "CONCLUSION",
+    "Final": "FINAL"
 }
 
 posturas = {
-    "A Favor": Postura.FAVOR,
-    "En Contra": Postura.CONTRA
+    "A Favor": "FAVOR",
+    "En Contra": "CONTRA"
 }
 
 key_metrics_names = [
@@ -54,7 +44,7 @@ chats = {}
 @projects_router.post("/projects")
 async def create_project(data: ProjectModel):
     try:
-        dec_jwt = jwt.decode(data.jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(data.jwt)
         user_code = dec_jwt["user_code"]
         payload = {"name": data.name,
                    "desc": data.desc, "user_code": user_code}
@@ -74,21 +64,20 @@ async def upload_audio(
         orador: str = Form(...),
         num_speakers: int = Form(...)):
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
-        file_name = f"{abs(hash(f'{project_code}-{fase}-{equipo}'))}"
-        file_path = UPLOAD_DIR / file_name
-
         if fase not in ["Introducción", "Refutación 1", "Refutación 2", "Conclusión", "Final"]:
             raise ValueError(f"{fase} is not a valid phase")
         if not check_team(project_code, equipo):
             raise ValueError(f"{equipo} is not a valid team")
 
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Almacén por contenido: el nombre ya no depende de hash(), que cambia
+        # entre procesos y puede colisionar
+        blob = blob_store.put_stream(file.file, f"v2:{project_code}", project_code)
         await file.close()
+        file_path = blob["path"]
 
         save_audio_path(file_path, project_code, fase,
                         equipo, orador, num_speakers)
@@ -105,8 +94,10 @@ async def get_transcript(
         fase: str,
         equipo: str,
         num_speakers: int):
+    from app.services.transcription import split_audio
+
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
@@ -133,8 +124,10 @@ async def get_prosody(
         enc_jwt: str,
         fase: str,
         equipo: str):
+    from app.services.metrics import process_complete_analysis
+
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
@@ -157,8 +150,10 @@ async def get_interpretation(
         enc_jwt: str,
         fase: str,
         equipo: str):
+    from app.processors.pipeline import DebateFase, Postura, create_chat
+
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
@@ -169,8 +164,8 @@ async def get_interpretation(
         if postura not in ["A Favor", "En Contra"]:
             raise ValueError(f"{postura} is not valid")
 
-        fase = fases[fase]
-        postura = posturas[postura]
+        fase = DebateFase[fases[fase]]
+        postura = Postura[posturas[postura]]
         orador, num_speakers = get_orador(file_path)
 
         if chats.get(project_code) == None:
@@ -241,7 +236,7 @@ async def create_team(
         team: str,
         postura: str):
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
         create_team(name, desc, postura, team, project_code)
@@ -255,7 +250,7 @@ async def get_statistics(
         project_code: str,
         enc_jwt: str):
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
@@ -269,12 +264,13 @@ async def del_audios(
         project_code: str,
         enc_jwt: str):
     try:
-        dec_jwt = jwt.decode(enc_jwt, SECRET_KEY, ALGORITHM)
+        dec_jwt = decode_access_token(enc_jwt)
         if not check_user_existence(dec_jwt["user_code"]):
             raise HTTPException(401, "invalid jwt")
 
-        file_paths = get_audio_paths(project_code)
-        del_audios(file_paths)
+        # El audio puede estar compartido: se sueltan las referencias del
+        # proyecto y el barrido borra lo que quede huérfano
+        blob_store.release(f"v2:{project_code}")
         return {"message": "audios deleted succesfully!"}
     except Exception as e:
         raise HTTPException(500, e)
@@ -0,0 +1,152 @@
+"""
+Autenticación de la API: verificación de JWT con caché y dependencias FastAPI.
+
+Verificar un HS256 es barato pero no gratis, y el dashboard del frontend
+hace polling con el mismo token constantemente. Los tokens ya verificados se
+guardan en una caché LRU con TTL que nunca supera el `exp` del token, de modo
+que un token caducado nunca se sirve desde la caché.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import HTTPException, Query, Request, Response
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+
+from app.core.database import get_user_by_code
+
+load_dotenv()
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = "HS256"
+
+DEPRECATION_SUNSET = "Wed, 30 Sep 2026 23:59:59 GMT"
+
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "1024"))
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+
+
+class TokenCache:
+    """LRU acotada de token -> payload verificado, con caducidad por entrada."""
+
+    def __init__(self, max_size: int = AUTH_TOKEN_CACHE_SIZE, ttl_seconds: float = AUTH_TOKEN_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            valid_until, payload = entry
+            if time.time() >= valid_until:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        valid_until = time.time() + self.ttl_seconds
+        exp = payload.get("exp")
+        if exp is not None:
+            valid_until = min(valid_until, float(exp))
+        with self._lock:
+            self._entries[token] = (valid_until, payload)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+def extract_bearer_token(request: Request) -> str | None:
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return None
+    if not auth_header.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="invalid authorization header")
+    token = auth_header.split(" ", 1)[1].strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="missing bearer token")
+    return token
+
+
+def decode_access_token(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError as exc:
+        raise HTTPException(status_code=401, detail="token expired") from exc
+    except InvalidTokenError as exc:
+        raise HTTPException(status_code=401, detail="invalid token") from exc
+    token_cache.put(token, payload)
+    return payload
+
+
+def resolve_auth_payload(request: Request, response: Response, legacy_jwt: str | None) -> dict:
+    """
+    Payload del JWT de la petición (cabecera Bearer o `jwt` legacy).
+
+    Se resuelve una sola vez por petición y queda en `request.state.auth_payload`.
+    """
+    cached = getattr(request.state, "auth_payload", None)
+    if cached is not None:
+        return cached
+
+    bearer_token = extract_bearer_token(request)
+    if bearer_token:
+        payload = decode_access_token(bearer_token)
+    elif legacy_jwt:
+        response.headers["Deprecation"] = "true"
+        response.headers["Sunset"] = DEPRECATION_SUNSET
+        payload = decode_access_token(legacy_jwt)
+    else:
+        raise HTTPException(status_code=401, detail="missing authentication token")
+
+    request.state.auth_payload = payload
+    return payload
+
+
+def resolve_current_user(request: Request, response: Response, legacy_jwt: str | None) -> dict:
+    """Como resolve_auth_payload, pero además exige que el usuario exista."""
+    cached = getattr(request.state, "current_user", None)
+    if cached is not None:
+        return cached
+
+    payload = resolve_auth_payload(request, response, legacy_jwt)
+    user = get_user_by_code(payload.get("user_code", ""))
+    if user is None:
+        raise HTTPException(status_code=401, detail="invalid token")
+
+    request.state.current_user = payload
+    return payload
+
+
+async def auth_payload_dependency(
+    request: Request,
+    response: Response,
+    jwt: str | None = Query(default=None),
+) -> dict:
+    """Dependencia FastAPI para rutas con token en cabecera o `?jwt=` legacy."""
+    return resolve_auth_payload(request, response, jwt)
+
+
+async def current_user_dependency(
+    request: Request,
+    response: Response,
+    jwt: str | None = Query(default=None),
+) -> dict:
+    """Dependencia FastAPI que además comprueba que el usuario del token existe."""
+    return resolve_current_user(request, response, jwt)
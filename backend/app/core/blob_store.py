@@ -0,0 +1,362 @@
+"""
+Almacén de audio direccionado por contenido.
+
+Cada audio se guarda una sola vez bajo su sha256, en directorios repartidos
+por prefijo (`<AUDIO_STORE_DIR>/ab/cd/abcd...`), con sus metadatos (tamaño,
+duración, frecuencia de muestreo, canales) y sus referencias en SQLite.
+
+Las referencias dicen quién necesita el audio:
+
+- `upload:<id>`: un análisis en curso; se libera al terminar y caduca a las
+  AUDIO_UPLOAD_REF_TTL_SECONDS por si el proceso muere a medias. Al
+  liberarla, si el audio se queda sin referencias (análisis rápido o
+  fallido) se borra en el acto, sin esperar al barrido.
+- `segment:<segment_id>`: el audio de una intervención analizada, que se
+  puede volver a analizar sin subirlo otra vez. Se conserva
+  AUDIO_RETENTION_DAYS desde su último uso; las de la fase final del debate
+  se conservan siempre con AUDIO_KEEP_FINALS.
+- `v2:<project_code>`: audios subidos por la API v2. Caducan como las de
+  segmento (AUDIO_RETENTION_DAYS desde el último uso) o al borrarlos con
+  del_audios.
+
+El barrido (`sweep`, en segundo plano cada AUDIO_SWEEP_INTERVAL_SECONDS o con
+`cli.py audio sweep`) aplica la retención y borra los audios sin referencias.
+Altas y bajas de ficheros se hacen dentro de una transacción IMMEDIATE, así
+que varios procesos pueden compartir el almacén sin carreras.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import uuid4
+
+AUDIO_STORE_DIR = Path(os.getenv("AUDIO_STORE_DIR", "uploads/blobs"))
+AUDIO_STORE_PATH = os.getenv("AUDIO_STORE_PATH", "audio_blobs.sqlite3")
+AUDIO_RETENTION_DAYS = float(os.getenv("AUDIO_RETENTION_DAYS", "30"))
+AUDIO_KEEP_FINALS = os.getenv("AUDIO_KEEP_FINALS", "1") == "1"
+AUDIO_UPLOAD_REF_TTL_SECONDS = float(os.getenv("AUDIO_UPLOAD_REF_TTL_SECONDS", "86400"))
+AUDIO_SWEEP_INTERVAL_SECONDS = float(os.getenv("AUDIO_SWEEP_INTERVAL_SECONDS", "3600"))
+
+_CHUNK_BYTES = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL,
+    duration_seconds REAL,
+    sample_rate INTEGER,
+    channels INTEGER,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blob_refs (
+    sha256 TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    project_code TEXT,
+    final INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (sha256, owner)
+);
+CREATE INDEX IF NOT EXISTS blob_refs_owner ON blob_refs (owner);
+CREATE INDEX IF NOT EXISTS blob_refs_project ON blob_refs (project_code, sha256);
+"""
+
+_initialized_paths: set[str] = set()
+
+
+def _connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or AUDIO_STORE_PATH
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _transaction(path: str | None = None):
+    conn = _connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+
+def blob_path(sha256: str, root: Path | None = None) -> Path:
+    return (root or AUDIO_STORE_DIR) / sha256[:2] / sha256[2:4] / sha256
+
+
+def _probe(path: Path) -> dict:
+    # Las subidas son WAV: la cabecera basta, sin decodificar el audio
+    try:
+        with wave.open(str(path), "rb") as handle:
+            sample_rate = handle.getframerate()
+            return {
+                "duration_seconds": handle.getnframes() / sample_rate if sample_rate else None,
+                "sample_rate": sample_rate,
+                "channels": handle.getnchannels(),
+            }
+    except (wave.Error, EOFError, OSError):
+        return {"duration_seconds": None, "sample_rate": None, "channels": None}
+
+
+def _row_to_blob(row: sqlite3.Row | None, root: Path | None = None) -> dict | None:
+    if row is None:
+        return None
+    blob = dict(row)
+    blob["path"] = str(blob_path(blob["sha256"], root))
+    return blob
+
+
+def put_stream(
+    stream,
+    owner: str,
+    project_code: str | None = None,
+    root: Path | None = None,
+    path: str | None = None,
+) -> dict:
+    """
+    Guarda el contenido de `stream` (si no estaba ya) y lo referencia.
+
+    Returns:
+        Metadatos del blob: sha256, path, size_bytes, duration_seconds,
+        sample_rate, channels, created_at, last_used_at
+    """
+    root = root or AUDIO_STORE_DIR
+    tmp_dir = root / "tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = tmp_dir / f"{uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp_path.open("wb") as buffer:
+            while chunk := stream.read(_CHUNK_BYTES):
+                digest.update(chunk)
+                buffer.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        target = blob_path(sha256, root)
+        metadata = _probe(tmp_path)
+        now = time.time()
+        with _transaction(path) as conn:
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, target)
+            conn.execute(
+                "INSERT INTO blobs (sha256, size_bytes, duration_seconds, sample_rate, channels, "
+                "created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (sha256) DO UPDATE SET last_used_at = excluded.last_used_at",
+                (sha256, size, metadata["duration_seconds"], metadata["sample_rate"],
+                 metadata["channels"], now, now),
+            )
+            conn.execute(
+                "INSERT OR IGNORE INTO blob_refs (sha256, owner, project_code, created_at) VALUES (?, ?, ?, ?)",
+                (sha256, owner, project_code, now),
+            )
+            row = conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+    finally:
+        # Si el contenido ya existía el temporal sobra
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return _row_to_blob(row, root)
+
+
+def get_blob(sha256: str, root: Path | None = None, path: str | None = None) -> dict | None:
+    conn = _connect(path)
+    try:
+        return _row_to_blob(conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone(), root)
+    finally:
+        conn.close()
+
+
+def acquire(
+    sha256: str,
+    owner: str,
+    project_code: str | None = None,
+    final: bool = False,
+    required_project: str | None = None,
+    root: Path | None = None,
+    path: str | None = None,
+) -> dict | None:
+    """
+    Referencia un blob ya guardado (y renueva su último uso).
+
+    Args:
+        required_project: Si se indica, solo se concede si el blob ya está
+            referenciado por ese proyecto (reutilizar audio propio)
+
+    Returns:
+        Metadatos del blob, o None si no existe (o no es del proyecto)
+    """
+    now = time.time()
+    with _transaction(path) as conn:
+        row = conn.execute("SELECT * FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None or not blob_path(sha256, root).exists():
+            return None
+        if required_project is not None and conn.execute(
+            "SELECT 1 FROM blob_refs WHERE sha256 = ? AND project_code = ? LIMIT 1",
+            (sha256, required_project),
+        ).fetchone() is None:
+            return None
+        conn.execute(
+            "INSERT INTO blob_refs (sha256, owner, project_code, final, created_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (sha256, owner) DO UPDATE SET final = MAX(final, excluded.final)",
+            (sha256, owner, project_code, int(final), now),
+        )
+        conn.execute("UPDATE blobs SET last_used_at = ? WHERE sha256 = ?", (now, sha256))
+    return _row_to_blob(row, root)
+
+
+def release(
+    owner: str,
+    sha256: str | None = None,
+    purge: bool = False,
+    root: Path | None = None,
+    path: str | None = None,
+) -> int:
+    """
+    Quita las referencias de `owner` (a un blob o a todos).
+
+    Con `purge` los blobs que se quedan sin referencias se borran ya; si no,
+    lo hace el barrido.
+    """
+    with _transaction(path) as conn:
+        if sha256 is None:
+            released = [row["sha256"] for row in conn.execute(
+                "SELECT sha256 FROM blob_refs WHERE owner = ?", (owner,)).fetchall()]
+            cursor = conn.execute("DELETE FROM blob_refs WHERE owner = ?", (owner,))
+        else:
+            released = [sha256]
+            cursor = conn.execute("DELETE FROM blob_refs WHERE owner = ? AND sha256 = ?", (owner, sha256))
+        if purge and cursor.rowcount:
+            placeholders = ", ".join("?" for _ in released)
+            _delete_orphans(conn, f"AND sha256 IN ({placeholders})", released, root)
+    return cursor.rowcount
+
+
+def _delete_orphans(conn: sqlite3.Connection, condition: str = "", params=(), root: Path | None = None) -> tuple[int, int]:
+    """Borra (fichero y fila) los blobs sin referencias. Returns (borrados, bytes)."""
+    orphans = conn.execute(
+        "SELECT sha256, size_bytes FROM blobs "
+        "WHERE NOT EXISTS (SELECT 1 FROM blob_refs WHERE blob_refs.sha256 = blobs.sha256) "
+        f"{condition}",
+        params,
+    ).fetchall()
+    freed = 0
+    for row in orphans:
+        file_path = blob_path(row["sha256"], root)
+        if file_path.exists():
+            file_path.unlink()
+        _remove_empty_shards(file_path)
+        conn.execute("DELETE FROM blobs WHERE sha256 = ?", (row["sha256"],))
+        freed += row["size_bytes"]
+    return len(orphans), freed
+
+
+def release_job_audio(job: dict) -> None:
+    """Libera el audio de un trabajo de análisis terminado (y lo borra si nadie más lo usa)."""
+    if job.get("audio_ref"):
+        release(job["audio_ref"], purge=True)
+        return
+    # Trabajos encolados antes del almacén: fichero propio en uploads/audios
+    file_path = Path(job["file_path"])
+    if file_path.exists():
+        file_path.unlink()
+
+
+def sweep(
+    now: float | None = None,
+    retention_days: float = AUDIO_RETENTION_DAYS,
+    keep_finals: bool = AUDIO_KEEP_FINALS,
+    upload_ttl_seconds: float = AUDIO_UPLOAD_REF_TTL_SECONDS,
+    root: Path | None = None,
+    path: str | None = None,
+) -> dict:
+    """
+    Aplica la retención y borra los blobs sin referencias.
+
+    Returns:
+        {"expired_refs", "deleted_blobs", "freed_bytes"}
+    """
+    now = now if now is not None else time.time()
+    retention_cutoff = now - retention_days * 86400
+    with _transaction(path) as conn:
+        expired = conn.execute(
+            "DELETE FROM blob_refs WHERE owner LIKE 'upload:%' AND created_at < ?",
+            (now - upload_ttl_seconds,),
+        ).rowcount
+        # La antigüedad de una intervención (o de un audio v2) cuenta desde el
+        # último uso de su audio
+        final_filter = "AND final = 0" if keep_finals else ""
+        expired += conn.execute(
+            "DELETE FROM blob_refs WHERE (owner LIKE 'segment:%' OR owner LIKE 'v2:%') "
+            f"{final_filter} AND sha256 IN (SELECT sha256 FROM blobs WHERE last_used_at < ?)",
+            (retention_cutoff,),
+        ).rowcount
+        deleted, freed = _delete_orphans(conn, root=root)
+    _remove_stale_parts(root or AUDIO_STORE_DIR, now - upload_ttl_seconds)
+    return {"expired_refs": expired, "deleted_blobs": deleted, "freed_bytes": freed}
+
+
+def _remove_empty_shards(file_path: Path) -> None:
+    for directory in (file_path.parent, file_path.parent.parent):
+        try:
+            directory.rmdir()
+        except OSError:
+            return
+
+
+def _remove_stale_parts(root: Path, cutoff: float) -> None:
+    # Temporales de subidas interrumpidas
+    tmp_dir = root / "tmp"
+    if not tmp_dir.exists():
+        return
+    for part in tmp_dir.glob("*.part"):
+        try:
+            if part.stat().st_mtime < cutoff:
+                part.unlink()
+        except FileNotFoundError:
+            continue
+
+
+def usage(path: str | None = None) -> dict:
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT COUNT(*) AS blobs, COALESCE(SUM(size_bytes), 0) AS bytes FROM blobs").fetchone()
+        refs = conn.execute("SELECT COUNT(*) FROM blob_refs").fetchone()[0]
+    finally:
+        conn.close()
+    return {"blobs": row["blobs"], "bytes": row["bytes"], "refs": refs}
+
+
+def start_sweeper(interval_seconds: float = AUDIO_SWEEP_INTERVAL_SECONDS) -> threading.Thread | None:
+    """Barrido periódico en un hilo daemon (None si el intervalo es 0)."""
+    if interval_seconds <= 0:
+        return None
+
+    def _loop():
+        while True:
+            try:
+                result = sweep()
+                if result["deleted_blobs"]:
+                    print(f"audio sweep: {result}")
+            except Exception as exc:
+                print(f"error while sweeping audio blobs: {exc}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=_loop, name="audio-sweeper", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,146 @@
+"""
+Checkpoints de las ejecuciones de análisis, en SQLite.
+
+Cada ejecución (run) guarda su payload y la salida de cada etapa completada
+(transcripción, métricas, evaluación, persistencia) bajo su run_id. Si el
+proceso muere a medias, el trabajo reclamado de nuevo reanuda desde la
+última etapa guardada; una etapa se puede volver a ejecutar a petición
+(p. ej. solo la evaluación tras cambiar el prompt).
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+ANALYSIS_CHECKPOINT_PATH = os.getenv("ANALYSIS_CHECKPOINT_PATH", "checkpoints.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_runs (
+    run_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    user_code TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_stages (
+    run_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    output TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+);
+CREATE INDEX IF NOT EXISTS analysis_runs_updated ON analysis_runs (updated_at);
+"""
+
+_initialized_paths: set[str] = set()
+
+
+def _connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or ANALYSIS_CHECKPOINT_PATH
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _connection(path: str | None = None):
+    conn = _connect(path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _json_default(value):
+    # Escalares y arrays de numpy que llegan desde el stack de audio
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def register_run(run_id: str, kind: str, payload: dict, path: str | None = None) -> None:
+    """Da de alta la ejecución (si ya existe, conserva su payload original)."""
+    now = time.time()
+    with _connection(path) as conn:
+        conn.execute(
+            "INSERT INTO analysis_runs (run_id, kind, payload, user_code, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (run_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (run_id, kind, json.dumps(payload, default=_json_default), payload.get("user_code"), now, now),
+        )
+
+
+def get_run(run_id: str, path: str | None = None) -> dict | None:
+    """
+    Returns:
+        {run_id, kind, payload, user_code, created_at, updated_at,
+        stages: {etapa: completed_at}} o None
+    """
+    with _connection(path) as conn:
+        row = conn.execute("SELECT * FROM analysis_runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        stages = conn.execute(
+            "SELECT stage, completed_at FROM run_stages WHERE run_id = ? ORDER BY completed_at", (run_id,)
+        ).fetchall()
+    run = dict(row)
+    run["payload"] = json.loads(run["payload"])
+    run["stages"] = {stage["stage"]: stage["completed_at"] for stage in stages}
+    return run
+
+
+def load_stage_outputs(run_id: str, path: str | None = None) -> dict:
+    with _connection(path) as conn:
+        rows = conn.execute("SELECT stage, output FROM run_stages WHERE run_id = ?", (run_id,)).fetchall()
+    return {row["stage"]: json.loads(row["output"]) for row in rows}
+
+
+def save_stage_output(run_id: str, stage: str, output, path: str | None = None) -> None:
+    now = time.time()
+    with _connection(path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO run_stages (run_id, stage, output, completed_at) VALUES (?, ?, ?, ?)",
+                (run_id, stage, json.dumps(output, default=_json_default), now),
+            )
+            conn.execute("UPDATE analysis_runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def delete_stage_outputs(run_id: str, stages, path: str | None = None) -> None:
+    stages = list(stages)
+    if not stages:
+        return
+    with _connection(path) as conn:
+        conn.execute(
+            f"DELETE FROM run_stages WHERE run_id = ? AND stage IN ({', '.join('?' for _ in stages)})",
+            [run_id, *stages],
+        )
+
+
+def prune_runs(older_than_seconds: float, path: str | None = None) -> int:
+    """Borra las ejecuciones sin actividad desde hace más de `older_than_seconds`."""
+    cutoff = time.time() - older_than_seconds
+    with _connection(path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM run_stages WHERE run_id IN (SELECT run_id FROM analysis_runs WHERE updated_at < ?)",
+                (cutoff,),
+            )
+            deleted = conn.execute("DELETE FROM analysis_runs WHERE updated_at < ?", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return deleted
@@ -1,9 +1,34 @@
-from tinydb import TinyDB, Query
-from app.core.security import get_password_hash, verify_password
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from tinydb import Query
+from app.core import search_index
+from app.core.security import get_password_hash, verify_and_update_password
+from app.core.storage import LockedTinyDB, open_db
 from uuid import uuid4
 from datetime import datetime, timezone
 
-db = TinyDB('db.json')
+DB_PATH = 'db.json'
+
+# Una instancia por fichero: todas las escrituras sobre db.json (incluido el
+# historial de chat) comparten lock y unidades de trabajo
+_dbs: dict[str, LockedTinyDB] = {}
+_dbs_lock = threading.Lock()
+
+
+def get_db(path: str | None = None) -> LockedTinyDB:
+    key = os.path.abspath(path or DB_PATH)
+    with _dbs_lock:
+        if key not in _dbs:
+            _dbs[key] = open_db(path or DB_PATH)
+        return _dbs[key]
+
+
+db = get_db(DB_PATH)
 users_table = db.table('users')
 projects_table = db.table('projects')
 analysis_table = db.table('analysis')
@@ -13,8 +38,45 @@ audios_transcription_table = db.table('audios_transcription')
 audios_metrics_table = db.table('audios_metrics')
 project_segments_table = db.table('project_segments')
 project_share_links_table = db.table('project_share_links')
+project_versions_table = db.table('project_versions')
 User = Query()
 
+# Índice en memoria de usuarios por código para las rutas autenticadas. Solo
+# guarda nombre y código (nunca el hash); se reconstruye ante un código
+# desconocido, como mucho una vez por USERS_INDEX_MIN_REFRESH_SECONDS.
+USERS_INDEX_MIN_REFRESH_SECONDS = 1.0
+_users_by_code: dict[str, dict] = {}
+_users_index_built_at = 0.0
+_users_index_lock = threading.Lock()
+
+# Versión de cada proyecto: sube con cada segmento/análisis nuevo y alimenta los
+# ETags de los dashboards. Se guarda en la tabla project_versions y se mantiene
+# en memoria; si db.json cambia (otro proceso ha escrito) se recarga.
+_project_versions: dict[str, int] = {}
+_project_versions_mtime: int | None = None
+_project_versions_lock = threading.Lock()
+
+# Los proyectos no se modifican tras crearse: sus filas se cachean por código
+_projects_by_code: dict[str, dict] = {}
+
+# Estadísticas de get_stats por proyecto: (versión del proyecto, stats)
+STATS_CACHE_MAX_ENTRIES = int(os.getenv("STATS_CACHE_MAX_ENTRIES", "256"))
+_stats_cache: OrderedDict[str, tuple[int, dict]] = OrderedDict()
+_stats_cache_lock = threading.Lock()
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Agrupa varias escrituras en una única reescritura atómica de db.json.
+
+    Si el bloque lanza una excepción no se escribe nada. Las funciones de
+    este módulo que se llamen dentro del bloque participan sin cambios. Entre
+    procesos se serializan con el flock de db.json (ver storage.transaction).
+    """
+    with db.storage.transaction():
+        yield
+
 
 def create_user(data: dict):
     try:
@@ -26,13 +88,16 @@ def create_user(data: dict):
             print(f"user {user_name} already exists")
             return False
 
-        hashed_pswd = get_password_hash(data["pswd"])
+        # El endpoint puede traer el hash ya calculado fuera del event loop
+        hashed_pswd = data.get("pswd_hash") or get_password_hash(data["pswd"])
 
         result = users_table.insert({
             'user': user_name,
             'pswd': hashed_pswd,
             'code': user_code
         })
+        if result:
+            _users_by_code[user_code] = {"user": user_name, "code": user_code}
 
         return True if result else False
 
@@ -48,12 +113,48 @@ def check_user(data: dict) -> bool:
         result = users_table.search(User.user == user)
         if not result:
             return False
-        return verify_password(pswd, result[0]["pswd"])
+        valid, new_hash = verify_and_update_password(pswd, result[0]["pswd"])
+        if valid and new_hash:
+            update_user_password_hash(result[0]["code"], new_hash)
+        return valid
     except Exception as e:
         print(f"error {e}")
         return False
 
 
+def get_user_by_name(user: str) -> dict | None:
+    return users_table.get(User.user == user)
+
+
+def _rebuild_users_index(force: bool = False) -> None:
+    global _users_index_built_at
+    with _users_index_lock:
+        if not force and time.monotonic() - _users_index_built_at < USERS_INDEX_MIN_REFRESH_SECONDS:
+            return
+        index = {
+            user["code"]: {"user": user.get("user"), "code": user["code"]}
+            for user in users_table.all()
+            if user.get("code")
+        }
+        _users_by_code.clear()
+        _users_by_code.update(index)
+        _users_index_built_at = time.monotonic()
+
+
+def get_user_by_code(user_code: str) -> dict | None:
+    """Usuario ({user, code}) por código, servido desde el índice en memoria."""
+    user = _users_by_code.get(user_code)
+    if user is None:
+        # Puede haberlo creado otro proceso API desde la última reconstrucción
+        _rebuild_users_index()
+        user = _users_by_code.get(user_code)
+    return user
+
+
+def update_user_password_hash(user_code: str, pswd_hash: str) -> None:
+    users_table.update({"pswd": pswd_hash}, User.code == user_code)
+
+
 def get_user_code(data: dict) -> str:
     user = data["user"]
     result = users_table.search(User.user == user)
@@ -71,8 +172,9 @@ def create_project(data: dict):
         team_a_name = data.get("team_a_name", "Equipo A")
         team_b_name = data.get("team_b_name", "Equipo B")
         debate_topic = data.get("debate_topic", "")
+        engine_profile = data.get("engine_profile")
         project_code = str(uuid4())
-        result = projects_table.insert({
+        project = {
             'name': name,
             'desc': desc,
             'user_code': user_code,
@@ -80,9 +182,17 @@ def create_project(data: dict):
             'debate_type': debate_type,
             'team_a_name': team_a_name,
             'team_b_name': team_b_name,
-            'debate_topic': debate_topic
-        })
-        return project_code if project_code else None
+            'debate_topic': debate_topic,
+            'engine_profile': engine_profile
+        }
+        result = projects_table.insert(project)
+        # El índice de búsqueda es derivado (`cli.py search reindex`): un
+        # fallo aquí no invalida la creación
+        try:
+            search_index.index_project(project)
+        except Exception as e:
+            print(f"error while indexing project: {e}")
+        return project_code if result else None
     except Exception as e:
         print(f"unexpected error: {e}")
         return None
@@ -98,7 +208,7 @@ def create_analysis(data: dict) -> bool:
         total = data["total"]
         max_total = data["max_total"]
         debate_type = data.get("debate_type", "upct")
-        result = analysis_table.insert({
+        record = {
             "project_code": project_code,
             "fase": fase,
             "postura": postura,
@@ -107,7 +217,12 @@ def create_analysis(data: dict) -> bool:
             "total": total,
             "max_total": max_total,
             "debate_type": debate_type
-        })
+        }
+        if data.get("segment_id"):
+            # Enlace con project_segments: al re-ejecutar un análisis se reemplaza
+            record["segment_id"] = data["segment_id"]
+        result = analysis_table.insert(record)
+        bump_project_version(project_code)
         return True
     except Exception as e:
         print(f"unexpected error: {e}")
@@ -125,6 +240,11 @@ def get_projects(data: dict):
         return []
 
 
+def list_project_codes(user_code: str | None = None) -> list[str]:
+    projects = projects_table.search(User.user_code == user_code) if user_code else projects_table.all()
+    return [project["code"] for project in projects if project.get("code")]
+
+
 def get_project(data: dict):
     try:
         user_code = data["user_code"]
@@ -144,22 +264,59 @@ def get_project(data: dict):
 
 def get_project_by_code(project_code: str):
     try:
-        return projects_table.get(User.code == project_code)
+        project = _projects_by_code.get(project_code)
+        if project is None:
+            project = projects_table.get(User.code == project_code)
+            if project is not None:
+                _projects_by_code[project_code] = project
+        return project
     except Exception as e:
         print(f"error {e}")
         return None
 
 
 def get_project_for_user(user_code: str, project_code: str):
+    project = get_project_by_code(project_code)
+    if project is None or project.get("user_code") != user_code:
+        return None
+    return project
+
+
+def db_mtime_ns() -> int | None:
     try:
-        return projects_table.get(
-            (User.code == project_code) & (User.user_code == user_code)
-        )
-    except Exception as e:
-        print(f"error {e}")
+        return os.stat(DB_PATH).st_mtime_ns
+    except OSError:
         return None
 
 
+def get_project_version(project_code: str) -> int:
+    """Versión actual del proyecto (0 si nunca ha cambiado desde que existe la tabla)."""
+    global _project_versions_mtime
+    mtime = db_mtime_ns()
+    if mtime != _project_versions_mtime:
+        with _project_versions_lock:
+            versions = {
+                row["project_code"]: row["version"] for row in project_versions_table.all()
+            }
+            _project_versions.clear()
+            _project_versions.update(versions)
+            _project_versions_mtime = mtime
+    return _project_versions.get(project_code, 0)
+
+
+def bump_project_version(project_code: str) -> int:
+    # Orden de locks: almacenamiento -> versiones (igual que dentro de unit_of_work)
+    with db.storage.transaction(), _project_versions_lock:
+        current = project_versions_table.get(User.project_code == project_code)
+        version = (current["version"] if current else 0) + 1
+        project_versions_table.upsert(
+            {"project_code": project_code, "version": version},
+            User.project_code == project_code,
+        )
+        _project_versions[project_code] = version
+    return version
+
+
 def get_projects_paginated(
     user_code: str,
     q: str | None = None,
@@ -168,6 +325,11 @@ def get_projects_paginated(
     offset: int = 0,
 ):
     try:
+        if q:
+            try:
+                return _search_projects_paginated(user_code, q, debate_type, limit, offset)
+            except Exception as e:
+                print(f"search index unavailable, falling back to scan: {e}")
         projects = projects_table.search(User.user_code == user_code)
         if q:
             q_low = q.lower()
@@ -187,6 +349,33 @@ def get_projects_paginated(
         return {"items": [], "total": 0, "limit": limit, "offset": offset}
 
 
+def rebuild_search_index() -> tuple[int, int]:
+    return search_index.rebuild(projects_table.all(), iter_all_project_segments())
+
+
+def _ensure_search_index() -> None:
+    if not search_index.is_built():
+        rebuild_search_index()
+
+
+def _search_projects_paginated(user_code, q, debate_type, limit, offset) -> dict:
+    """Búsqueda por relevancia en el índice FTS; cada item lleva `highlights`."""
+    _ensure_search_index()
+    found = search_index.search_projects(
+        user_code, q, debate_type=debate_type, limit=limit, offset=offset)
+    items = []
+    for hit in found["items"]:
+        project = get_project_by_code(hit["project_code"])
+        if project:
+            items.append({**project, "highlights": hit["highlights"]})
+    return {"items": items, "total": found["total"], "limit": limit, "offset": offset}
+
+
+def search_project_segments(user_code: str, q: str, **filters) -> dict:
+    _ensure_search_index()
+    return search_index.search_segments(user_code, q, **filters)
+
+
 def get_project_debate_type(project_code: str) -> str:
     """
     Obtiene el tipo de debate de un proyecto.
@@ -210,12 +399,40 @@ def get_project_debate_type(project_code: str) -> str:
 def create_project_segment(data: dict) -> bool:
     try:
         project_segments_table.insert(data)
+        bump_project_version(data["project_code"])
         return True
     except Exception as e:
         print(f"unexpected error: {e}")
         return False
 
 
+def remove_project_segment(segment_id: str) -> dict | None:
+    """
+    Borra un segmento y su análisis legacy (para reemplazarlos al re-ejecutar).
+
+    Returns:
+        El segmento borrado o None si no existía
+    """
+    segment = project_segments_table.get(User.segment_id == segment_id)
+    if segment is None:
+        return None
+    project_segments_table.remove(User.segment_id == segment_id)
+    analysis_table.remove(User.segment_id == segment_id)
+    bump_project_version(segment["project_code"])
+    return segment
+
+
+def remove_audio_results(segment_id: str) -> None:
+    """
+    Borra la transcripción y métricas guardadas de un segmento.
+
+    Se filtra por segment_id y no por file_path: el audio está
+    direccionado por contenido y otros segmentos pueden compartir la ruta.
+    """
+    audios_transcription_table.remove(User.segment_id == segment_id)
+    audios_metrics_table.remove(User.segment_id == segment_id)
+
+
 def get_project_segments(
     project_code: str,
     fase: str | None = None,
@@ -246,6 +463,28 @@ def get_project_segments(
         return {"items": [], "total": 0, "limit": limit, "offset": offset}
 
 
+def iter_project_segments(project_code: str, after: tuple[str, str] | None = None):
+    """
+    Segmentos del proyecto en orden estable (created_at, segment_id).
+
+    Args:
+        after: Clave (created_at, segment_id) del último segmento ya leído
+    """
+    segments = project_segments_table.search(User.project_code == project_code)
+    segments.sort(key=lambda x: (x.get("created_at", ""), x.get("segment_id", "")))
+    for segment in segments:
+        key = (segment.get("created_at", ""), segment.get("segment_id", ""))
+        if after is not None and key <= tuple(after):
+            continue
+        yield segment
+
+
+def iter_all_project_segments():
+    """Todos los segmentos, proyecto a proyecto (uno en memoria cada vez)."""
+    for project_code in list_project_codes():
+        yield from iter_project_segments(project_code)
+
+
 def build_project_dashboard_summary(segments: list[dict]) -> dict:
     total_segments = len(segments)
     if total_segments == 0:
@@ -332,6 +571,14 @@ def revoke_project_share_link(project_code: str, owner_user_code: str, share_id:
         return False
 
 
+def get_all_project_share_links() -> list[dict]:
+    try:
+        return project_share_links_table.all()
+    except Exception as e:
+        print(f"error {e}")
+        return []
+
+
 def get_project_share_link_by_token_hash(token_hash: str):
     try:
         return project_share_links_table.get(User.token_hash == token_hash)
@@ -411,13 +658,14 @@ def save_audio_path(file_path, project_code, phase, team, speaker, num_speakers)
             "speaker": speaker,
             "num_speakers": num_speakers
         })
+        bump_project_version(project_code)
     except Exception as e:
         raise Exception(e)
 
 
 def check_user_existence(user_code) -> bool:
     try:
-        return True if users_table.search(User.user_code == user_code) else False
+        return get_user_by_code(user_code) is not None
     except Exception as e:
         raise Exception(e)
 
@@ -431,13 +679,17 @@ def get_audio_path(project_code, phase, team):
         raise Exception(e)
 
 
-def save_transcription(file_path, transcript, diarization):
+def save_transcription(file_path, transcript, diarization, segment_id=None):
     try:
-        audios_transcription_table.insert({
+        record = {
             "file_path": file_path,
             "transcript": transcript,
             "diarization": diarization
-        })
+        }
+        if segment_id:
+            record["segment_id"] = segment_id
+        audios_transcription_table.insert(record)
+        _bump_audio_project_version(file_path)
     except Exception as e:
         raise Exception(e)
 
@@ -450,12 +702,16 @@ def get_transcription(file_path):
         raise Exception(e)
 
 
-def save_metrics(file_path, metrics):
+def save_metrics(file_path, metrics, segment_id=None):
     try:
-        audios_metrics_table.insert({
+        record = {
             "file_path": file_path,
             "metrics": metrics
-        })
+        }
+        if segment_id:
+            record["segment_id"] = segment_id
+        audios_metrics_table.insert(record)
+        _bump_audio_project_version(file_path)
     except Exception as e:
         raise Exception(e)
 
@@ -520,93 +776,127 @@ def get_analysis(project_code):
         raise Exception(e)
 
 
-def get_stats(project_code):
-    try:
-        analyses = analysis_table.search(User.project_code == project_code)
-        audio_paths_raw = audios_path_table.search(
-            User.project_code == project_code)
-
-        stats = {
-            "global": {
-                "total_score": 0,
-                "max_possible_score": 0,
-                "overall_percentage": 0,
-                "total_audios": len(audio_paths_raw)
-            },
-            "by_phase": {},
-            "by_speaker": {}
-        }
+def _bump_audio_project_version(file_path) -> None:
+    # Transcripciones y métricas solo cuentan en get_stats vía audios_path
+    audio = audios_path_table.get(User.file_path == file_path)
+    if audio:
+        bump_project_version(audio["project_code"])
 
-        for item in analyses:
-            phase_name = item.get('fase', 'Unknown')
-            speaker_name = item.get('orador', 'Unknown')
-            score = item.get('total', 0)
-            max_score = item.get('max_total', 1)
-
-            stats["global"]["total_score"] += score
-            stats["global"]["max_possible_score"] += max_score
-
-            if phase_name not in stats["by_phase"]:
-                stats["by_phase"][phase_name] = {
-                    "score": 0,
-                    "max_score": 0,
-                    "percentage": 0,
-                    "criterios": [],
-                    "audio_metrics": {},
-                    "transcript_preview": ""
-                }
-
-            stats["by_phase"][phase_name]["score"] += score
-            stats["by_phase"][phase_name]["max_score"] += max_score
-
-            if "criterios" in item:
-                stats["by_phase"][phase_name]["criterios"].extend(
-                    item["criterios"])
-
-            if speaker_name not in stats["by_speaker"]:
-                stats["by_speaker"][speaker_name] = {
-                    "total_score": 0,
-                    "participations": 0
-                }
-            stats["by_speaker"][speaker_name]["total_score"] += score
-            stats["by_speaker"][speaker_name]["participations"] += 1
-
-        if stats["global"]["max_possible_score"] > 0:
-            stats["global"]["overall_percentage"] = round(
-                (stats["global"]["total_score"] /
-                 stats["global"]["max_possible_score"]) * 100, 2
-            )
 
-        for audio in audio_paths_raw:
-            file_path = audio['file_path']
-            phase_name = audio.get('phase', 'Unknown')
+def _empty_phase_stats() -> dict:
+    return {
+        "score": 0,
+        "max_score": 0,
+        "percentage": 0,
+        "criterios": [],
+        "audio_metrics": {},
+        "transcript_preview": ""
+    }
+
+
+def _first_by_file_path(table, file_paths: set) -> dict:
+    """Primer documento por file_path (mismo orden que search()[0]) en una sola pasada."""
+    found = {}
+    for doc in table.all():
+        file_path = doc.get("file_path")
+        if file_path in file_paths and file_path not in found:
+            found[file_path] = doc
+    return found
+
+
+def _compute_stats(project_code) -> dict:
+    analyses = analysis_table.search(User.project_code == project_code)
+    audio_paths_raw = audios_path_table.search(
+        User.project_code == project_code)
+
+    stats = {
+        "global": {
+            "total_score": 0,
+            "max_possible_score": 0,
+            "overall_percentage": 0,
+            "total_audios": len(audio_paths_raw)
+        },
+        "by_phase": {},
+        "by_speaker": {}
+    }
+
+    for item in analyses:
+        phase_name = item.get('fase', 'Unknown')
+        speaker_name = item.get('orador', 'Unknown')
+        score = item.get('total', 0)
+        max_score = item.get('max_total', 1)
+
+        stats["global"]["total_score"] += score
+        stats["global"]["max_possible_score"] += max_score
+
+        phase = stats["by_phase"].setdefault(phase_name, _empty_phase_stats())
+        phase["score"] += score
+        phase["max_score"] += max_score
+        if "criterios" in item:
+            phase["criterios"].extend(item["criterios"])
+
+        speaker = stats["by_speaker"].setdefault(
+            speaker_name, {"total_score": 0, "participations": 0})
+        speaker["total_score"] += score
+        speaker["participations"] += 1
+
+    if stats["global"]["max_possible_score"] > 0:
+        stats["global"]["overall_percentage"] = round(
+            (stats["global"]["total_score"] /
+             stats["global"]["max_possible_score"]) * 100, 2
+        )
+
+    # Un recorrido por tabla en lugar de dos búsquedas completas por audio
+    file_paths = {audio['file_path'] for audio in audio_paths_raw}
+    metrics_by_path = _first_by_file_path(audios_metrics_table, file_paths)
+    transcripts_by_path = _first_by_file_path(audios_transcription_table, file_paths)
 
-            metrics_result = audios_metrics_table.search(
-                User.file_path == file_path)
-            transcript_result = audios_transcription_table.search(
-                User.file_path == file_path)
+    for audio in audio_paths_raw:
+        file_path = audio['file_path']
+        phase = stats["by_phase"].setdefault(
+            audio.get('phase', 'Unknown'), _empty_phase_stats())
 
-            if phase_name not in stats["by_phase"]:
-                stats["by_phase"][phase_name] = {
-                    "score": 0, "max_score": 0, "percentage": 0, "criterios": [],
-                    "audio_metrics": {}, "transcript_preview": ""
-                }
+        metrics_result = metrics_by_path.get(file_path)
+        if metrics_result:
+            phase["audio_metrics"] = metrics_result.get("metrics", {})
 
-            if metrics_result:
-                stats["by_phase"][phase_name]["audio_metrics"] = metrics_result[0].get(
-                    "metrics", {})
+        transcript_result = transcripts_by_path.get(file_path)
+        if transcript_result:
+            full_text = transcript_result.get("transcript", "")
+            phase["transcript_preview"] = full_text[:100] + \
+                "..." if len(full_text) > 100 else full_text
 
-            if transcript_result:
-                full_text = transcript_result[0].get("transcript", "")
-                stats["by_phase"][phase_name]["transcript_preview"] = full_text[:100] + \
-                    "..." if len(full_text) > 100 else full_text
+    for data in stats["by_phase"].values():
+        if data["max_score"] > 0:
+            data["percentage"] = round(
+                (data["score"] / data["max_score"]) * 100, 2)
 
-        for phase, data in stats["by_phase"].items():
-            if data["max_score"] > 0:
-                data["percentage"] = round(
-                    (data["score"] / data["max_score"]) * 100, 2)
+    return stats
 
-        return stats
+
+def get_stats(project_code):
+    """
+    Estadísticas agregadas del proyecto, cacheadas por versión del proyecto.
+
+    La versión sube con cada análisis, segmento o audio nuevo del proyecto,
+    así que una entrada cacheada nunca sobrevive a un cambio relevante.
+    """
+    try:
+        version = get_project_version(project_code)
+        with _stats_cache_lock:
+            cached = _stats_cache.get(project_code)
+            if cached is not None and cached[0] == version:
+                _stats_cache.move_to_end(project_code)
+                return copy.deepcopy(cached[1])
+
+        stats = _compute_stats(project_code)
+
+        with _stats_cache_lock:
+            _stats_cache[project_code] = (version, stats)
+            _stats_cache.move_to_end(project_code)
+            while len(_stats_cache) > STATS_CACHE_MAX_ENTRIES:
+                _stats_cache.popitem(last=False)
+        return copy.deepcopy(stats)
 
     except Exception as e:
         raise Exception(e)
@@ -0,0 +1,218 @@
+"""
+Almacén columnar de métricas acústicas por hablante.
+
+Una fila por (segmento, hablante) y una columna REAL por feature de
+openSMILE (eGeMAPSv02), en SQLite. Las columnas de features se crean según
+aparecen, de modo que el almacén acepta tanto el conjunto completo como
+subconjuntos. Las lecturas devuelven arrays de numpy por columna para
+análisis vectorizados (percentiles, comparativas entre temporadas) sin
+cargar los documentos JSON de project_segments.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+FEATURE_STORE_PATH = os.getenv("FEATURE_STORE_PATH", "features.sqlite3")
+
+_METADATA_COLUMNS = {
+    "segment_id": "TEXT NOT NULL",
+    "speaker": "TEXT NOT NULL",
+    "project_code": "TEXT NOT NULL",
+    "debate_type": "TEXT",
+    "fase_id": "TEXT",
+    "postura": "TEXT",
+    "orador": "TEXT",
+    "created_at": "TEXT",
+}
+_FILTER_COLUMNS = ("project_code", "debate_type", "fase_id", "postura", "orador")
+_FEATURE_NAME = re.compile(r"^[A-Za-z0-9_.\-]+$")
+
+_schema_lock = threading.Lock()
+_feature_columns: dict[str, set[str]] = {}
+
+
+def _quote(name: str) -> str:
+    if not _FEATURE_NAME.match(name):
+        raise ValueError(f"invalid feature name '{name}'")
+    return f'"{name}"'
+
+
+@contextmanager
+def _connection(path: str | None = None):
+    path = path or FEATURE_STORE_PATH
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if path not in _feature_columns:
+            _init_schema(conn, path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _init_schema(conn: sqlite3.Connection, path: str) -> None:
+    with _schema_lock:
+        conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{name} {kind}" for name, kind in _METADATA_COLUMNS.items())
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS speaker_features ({columns}, "
+            "PRIMARY KEY (segment_id, speaker))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS speaker_features_project "
+            "ON speaker_features (project_code, created_at)"
+        )
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(speaker_features)")}
+        _feature_columns[path] = existing - set(_METADATA_COLUMNS)
+
+
+def _ensure_feature_columns(conn: sqlite3.Connection, path: str, names) -> None:
+    missing = [name for name in names if name not in _feature_columns[path]]
+    if not missing:
+        return
+    with _schema_lock:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(speaker_features)")}
+        for name in missing:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE speaker_features ADD COLUMN {_quote(name)} REAL")
+        _feature_columns[path].update(missing)
+
+
+def record_segment_features(segment: dict, path: str | None = None) -> int:
+    """
+    Guarda (o reemplaza) las métricas por hablante de un segmento.
+
+    Args:
+        segment: Documento de project_segments (usa `metrics_raw`)
+
+    Solo se guardan métricas de openSMILE: las del modo "key" son
+    aproximaciones y mezclarlas sesgaría los percentiles. Las filas previas
+    del segmento se borran siempre, así que una re-ejecución no deja filas de
+    hablantes que ya no aparecen ni de un análisis "full" anterior.
+
+    Returns:
+        Número de filas (hablantes) escritas
+    """
+    rows = []
+    if (segment.get("engine") or {}).get("prosody_mode", "full") == "full":
+        for speaker, features in (segment.get("metrics_raw") or {}).items():
+            numeric = {
+                name: float(value) for name, value in features.items()
+                if isinstance(value, (int, float)) and _FEATURE_NAME.match(name)
+            }
+            rows.append((speaker, numeric))
+
+    path = path or FEATURE_STORE_PATH
+    with _connection(path) as conn:
+        # Borrado e inserción en la misma transacción
+        conn.execute("DELETE FROM speaker_features WHERE segment_id = ?", (segment["segment_id"],))
+        if not rows:
+            return 0
+        _ensure_feature_columns(conn, path, {name for _, numeric in rows for name in numeric})
+        for speaker, numeric in rows:
+            values = {
+                "segment_id": segment["segment_id"],
+                "speaker": speaker,
+                "project_code": segment["project_code"],
+                "debate_type": segment.get("debate_type"),
+                "fase_id": segment.get("fase_id"),
+                "postura": segment.get("postura"),
+                "orador": segment.get("orador"),
+                "created_at": segment.get("created_at"),
+                **numeric,
+            }
+            names = ", ".join(_quote(name) for name in values)
+            placeholders = ", ".join("?" for _ in values)
+            conn.execute(
+                f"INSERT OR REPLACE INTO speaker_features ({names}) VALUES ({placeholders})",
+                list(values.values()),
+            )
+    return len(rows)
+
+
+def list_features(path: str | None = None) -> list[str]:
+    path = path or FEATURE_STORE_PATH
+    with _connection(path):
+        return sorted(_feature_columns[path])
+
+
+def _where(filters: dict) -> tuple[str, list]:
+    clauses = []
+    params = []
+    for column in _FILTER_COLUMNS:
+        value = filters.get(column)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{column} IN ({', '.join('?' for _ in value)})")
+            params.extend(value)
+        else:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if filters.get("created_from"):
+        clauses.append("created_at >= ?")
+        params.append(filters["created_from"])
+    if filters.get("created_to"):
+        clauses.append("created_at < ?")
+        params.append(filters["created_to"])
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def read_features(features: list[str], path: str | None = None, **filters) -> dict:
+    """
+    Lectura columnar: un array de numpy (float64, NaN si falta) por feature.
+
+    Filtros: project_code, debate_type, fase_id, postura, orador (valor o
+    lista) y created_from / created_to (ISO 8601, p. ej. una temporada).
+    """
+    import numpy as np
+
+    path = path or FEATURE_STORE_PATH
+    with _connection(path) as conn:
+        unknown = [name for name in features if name not in _feature_columns[path]]
+        if unknown:
+            # Otro proceso puede haber añadido columnas desde que se leyó el esquema
+            _init_schema(conn, path)
+            unknown = [name for name in features if name not in _feature_columns[path]]
+        if unknown:
+            raise ValueError(f"unknown features: {', '.join(unknown)}")
+        where, params = _where(filters)
+        selected = ", ".join(["segment_id", "speaker"] + [_quote(name) for name in features])
+        rows = conn.execute(f"SELECT {selected} FROM speaker_features{where}", params).fetchall()
+
+    result = {
+        "segment_id": np.array([row[0] for row in rows], dtype=object),
+        "speaker": np.array([row[1] for row in rows], dtype=object),
+    }
+    values = np.array([row[2:] for row in rows], dtype=np.float64).reshape(len(rows), len(features))
+    for idx, name in enumerate(features):
+        result[name] = values[:, idx]
+    return result
+
+
+def feature_percentiles(
+    features: list[str],
+    percentiles: list[float] = (10, 25, 50, 75, 90),
+    path: str | None = None,
+    **filters,
+) -> dict:
+    """Percentiles por feature (ignorando valores ausentes) con los mismos filtros que read_features."""
+    import numpy as np
+
+    columns = read_features(features, path=path, **filters)
+    summary = {}
+    for name in features:
+        values = columns[name]
+        values = values[~np.isnan(values)]
+        if values.size:
+            computed = [float(v) for v in np.percentile(values, percentiles)]
+        else:
+            computed = [None] * len(percentiles)
+        summary[name] = {
+            "count": int(values.size),
+            "percentiles": {str(p): v for p, v in zip(percentiles, computed)},
+        }
+    return summary
@@ -0,0 +1,212 @@
+"""
+Instrumentación por etapas del pipeline de análisis.
+
+Cada etapa (upload, decode, whisper, diarization, bucketing, opensmile,
+prompt_build, llm, persistence...) se envuelve en un span que mide tiempo
+de pared, tiempo de CPU, RSS del proceso al cerrar la etapa (y su variación
+durante ella) y segundos de audio procesados. Los spans se emiten como logs
+JSON estructurados y se agregan en un registro por proceso que se expone en
+formato Prometheus en /metrics (API) o con start_metrics_server (workers).
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logger = logging.getLogger("ciceron.stages")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+# Límites superiores (segundos) de los buckets del histograma de duración
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class _StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.audio_seconds = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def observe(self, wall: float, cpu: float, audio_seconds: float | None, failed: bool):
+        self.count += 1
+        self.wall_seconds += wall
+        self.cpu_seconds += cpu
+        if audio_seconds:
+            self.audio_seconds += audio_seconds
+        if failed:
+            self.errors += 1
+        for idx, upper in enumerate(DURATION_BUCKETS):
+            if wall <= upper:
+                self.buckets[idx] += 1
+
+
+_registry: dict[str, _StageStats] = {}
+_registry_lock = threading.Lock()
+_listeners: list = []
+
+
+def add_span_listener(callback) -> None:
+    """Registra una función que recibe cada span al cerrarse (p. ej. benchmarks)."""
+    _listeners.append(callback)
+
+
+def remove_span_listener(callback) -> None:
+    if callback in _listeners:
+        _listeners.remove(callback)
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    Pico de memoria residente del proceso desde que arrancó (None si no está
+    disponible). Es monótono: no sirve para atribuir memoria a una etapa.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux devuelve KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss_bytes() -> int | None:
+    """Memoria residente actual del proceso (None fuera de Linux)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+@contextmanager
+def stage(name: str, audio_seconds: float | None = None, **fields):
+    """
+    Mide una etapa del pipeline.
+
+    El span se entrega al bloque para que pueda completar campos conocidos
+    más tarde (por ejemplo, span["audio_seconds"] tras decodificar).
+
+    `rss_bytes` es la memoria residente del proceso al cerrar la etapa y
+    `rss_delta_bytes` su variación durante ella; con etapas concurrentes en
+    otros hilos la variación incluye también la suya.
+
+    Example:
+        >>> with stage("whisper", audio_seconds=12.5, profile="fast"):
+        ...     segments = transcribe(audio)
+    """
+    span = {"stage": name, "audio_seconds": audio_seconds, **fields}
+    wall_started = time.perf_counter()
+    # process_time es de todo el proceso: incluye los hilos de torch/ctranslate2
+    cpu_started = time.process_time()
+    rss_started = current_rss_bytes()
+    failed = False
+    try:
+        yield span
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        wall = time.perf_counter() - wall_started
+        cpu = time.process_time() - cpu_started
+        rss = current_rss_bytes()
+        span.update({
+            "status": "error" if failed else "ok",
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "rss_bytes": rss,
+            "rss_delta_bytes": rss - rss_started if rss is not None and rss_started is not None else None,
+        })
+        with _registry_lock:
+            _registry.setdefault(name, _StageStats()).observe(
+                wall, cpu, span.get("audio_seconds"), failed)
+        logger.info(json.dumps(span, default=str))
+        for callback in list(_listeners):
+            callback(span)
+
+
+def render_prometheus() -> str:
+    """Serializa el registro de etapas en el formato de texto de Prometheus."""
+    lines = [
+        "# HELP ciceron_stage_duration_seconds Wall time per analysis stage.",
+        "# TYPE ciceron_stage_duration_seconds histogram",
+    ]
+    with _registry_lock:
+        snapshot = {name: stats for name, stats in sorted(_registry.items())}
+        for name, stats in snapshot.items():
+            for upper, bucket_count in zip(DURATION_BUCKETS, stats.buckets):
+                lines.append(
+                    f'ciceron_stage_duration_seconds_bucket{{stage="{name}",le="{upper}"}} {bucket_count}')
+            lines.append(
+                f'ciceron_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stats.count}')
+            lines.append(
+                f'ciceron_stage_duration_seconds_sum{{stage="{name}"}} {stats.wall_seconds:.6f}')
+            lines.append(
+                f'ciceron_stage_duration_seconds_count{{stage="{name}"}} {stats.count}')
+
+        counters = (
+            ("ciceron_stage_cpu_seconds_total", "CPU time per analysis stage.", "cpu_seconds"),
+            ("ciceron_stage_audio_seconds_total", "Audio seconds processed per stage.", "audio_seconds"),
+            ("ciceron_stage_errors_total", "Failed executions per stage.", "errors"),
+        )
+        for metric, help_text, attr in counters:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, stats in snapshot.items():
+                lines.append(f'{metric}{{stage="{name}"}} {getattr(stats, attr)}')
+
+    peak = peak_rss_bytes()
+    if peak is not None:
+        lines.append("# HELP ciceron_process_peak_rss_bytes Peak resident memory of the process.")
+        lines.append("# TYPE ciceron_process_peak_rss_bytes gauge")
+        lines.append(f"ciceron_process_peak_rss_bytes {peak}")
+    rss = current_rss_bytes()
+    if rss is not None:
+        lines.append("# HELP ciceron_process_rss_bytes Current resident memory of the process.")
+        lines.append("# TYPE ciceron_process_rss_bytes gauge")
+        lines.append(f"ciceron_process_rss_bytes {rss}")
+
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Sirve /metrics en un hilo aparte para procesos sin API (workers).
+
+    El registro es por proceso: las etapas que ejecuta un worker solo se ven
+    en su propio endpoint, no en el /metrics de la API.
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,168 @@
+"""
+Cola de trabajos duradera respaldada por SQLite.
+
+Los procesos API encolan análisis y los workers los reclaman con un lease:
+si un worker muere, el lease caduca y otro worker vuelve a reclamar el
+trabajo. SQLite en modo WAL permite que varios procesos de la misma
+máquina compartan la cola sin servicios externos.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "1800"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    worker_id TEXT,
+    locked_until REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+_initialized_paths: set[str] = set()
+
+
+def _connect(path: str | None = None) -> sqlite3.Connection:
+    path = path or JOB_QUEUE_PATH
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized_paths:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _connection(path: str | None = None):
+    conn = _connect(path)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _row_to_job(row: sqlite3.Row | None) -> dict | None:
+    if row is None:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["error"] = json.loads(job["error"]) if job["error"] else None
+    return job
+
+
+def enqueue_job(kind: str, payload: dict, path: str | None = None) -> str:
+    job_id = str(uuid4())
+    now = time.time()
+    with _connection(path) as conn:
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, payload, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(payload), now, now),
+        )
+    return job_id
+
+
+def claim_job(worker_id: str, kinds: list[str] | None = None, path: str | None = None) -> dict | None:
+    """
+    Reclama el trabajo pendiente más antiguo (o uno cuyo lease haya caducado).
+
+    Returns:
+        El trabajo reclamado o None si no hay nada que hacer
+    """
+    now = time.time()
+    kind_filter = ""
+    params: list = [now, JOB_MAX_ATTEMPTS]
+    if kinds:
+        kind_filter = f"AND kind IN ({', '.join('?' for _ in kinds)})"
+        params.extend(kinds)
+
+    with _connection(path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # leases caducados sin reintentos disponibles: se dan por fallidos
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', locked_until = NULL, updated_at = ? "
+                "WHERE status = 'running' AND locked_until < ? AND attempts >= ?",
+                (now, now, JOB_MAX_ATTEMPTS),
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs "
+                "WHERE (status = 'queued' OR (status = 'running' AND locked_until < ?)) "
+                f"AND attempts < ? {kind_filter} "
+                "ORDER BY created_at LIMIT 1",
+                params,
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker_id = ?, "
+                    "locked_until = ?, updated_at = ? WHERE job_id = ?",
+                    (worker_id, now + JOB_LEASE_SECONDS, now, row["job_id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    if row is None:
+        return None
+    job = _row_to_job(row)
+    job["status"] = "running"
+    job["attempts"] += 1
+    job["worker_id"] = worker_id
+    return job
+
+
+def complete_job(job_id: str, result: dict, path: str | None = None) -> None:
+    with _connection(path) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, locked_until = NULL, "
+            "updated_at = ? WHERE job_id = ?",
+            (json.dumps(result), time.time(), job_id),
+        )
+
+
+def fail_job(job_id: str, error: dict, retry: bool = False, path: str | None = None) -> bool:
+    """
+    Marca un trabajo como fallido, o lo devuelve a la cola si `retry`.
+
+    Returns:
+        True si el trabajo vuelve a la cola (quedan intentos)
+    """
+    with _connection(path) as conn:
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN ? AND attempts < ? THEN 'queued' ELSE 'failed' END, "
+            "error = ?, locked_until = NULL, updated_at = ? WHERE job_id = ?",
+            (retry, JOB_MAX_ATTEMPTS, json.dumps(error), time.time(), job_id),
+        )
+        row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return row is not None and row["status"] == "queued"
+
+
+def get_job(job_id: str, path: str | None = None) -> dict | None:
+    with _connection(path) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _row_to_job(row)
+
+
+def count_jobs(status: str, path: str | None = None) -> int:
+    with _connection(path) as conn:
+        return conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
@@ -0,0 +1,171 @@
+"""
+Rate limiting con ventana deslizante aproximada (sliding-window counter).
+
+Cada clave guarda solo dos contadores: el de la ventana actual y el de la
+anterior. La tasa estimada es `anterior * fracción_restante + actual`, que
+se calcula en O(1) por petición sin guardar timestamps. Las claves inactivas
+se purgan periódicamente.
+
+El almacenamiento es intercambiable: en memoria (por proceso) o SQLite, que
+comparten todos los workers de la máquina para que el límite sea global.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi.concurrency import run_in_threadpool
+
+RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "ratelimits.sqlite3")
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "60"))
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+
+
+def _roll(window: int, stored_window: int | None, current: int, previous: int) -> tuple[int, int]:
+    """Devuelve (actual, anterior) desplazados a la ventana `window`."""
+    if stored_window == window:
+        return current, previous
+    if stored_window == window - 1:
+        return 0, current
+    return 0, 0
+
+
+def _estimate(now: float, window_seconds: float, current: int, previous: int) -> float:
+    elapsed = (now % window_seconds) / window_seconds
+    return previous * (1.0 - elapsed) + current
+
+
+class InMemoryRateLimitStore:
+    """Contadores en un dict del proceso; válido con un único worker."""
+
+    # hit() no bloquea: se puede llamar desde el event loop
+    blocking = False
+
+    def __init__(self, sweep_seconds: float = RATE_LIMIT_SWEEP_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self._counters: dict[str, tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def hit(self, key: str, limit: int, window_seconds: float, now: float) -> tuple[bool, float]:
+        window = int(now // window_seconds)
+        with self._lock:
+            stored_window, current, previous = self._counters.get(key, (None, 0, 0))
+            current, previous = _roll(window, stored_window, current, previous)
+            estimated = _estimate(now, window_seconds, current, previous)
+            allowed = estimated < limit
+            if allowed:
+                current += 1
+                estimated += 1
+            self._counters[key] = (window, current, previous)
+            self._maybe_sweep(window)
+        return allowed, estimated
+
+    def _maybe_sweep(self, window: int) -> None:
+        # Llamado con el lock tomado: amortizado, una pasada cada sweep_seconds
+        if time.monotonic() - self._last_sweep < self.sweep_seconds:
+            return
+        idle = [key for key, (stored, _, _) in self._counters.items() if stored < window - 1]
+        for key in idle:
+            del self._counters[key]
+        self._last_sweep = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+
+class SQLiteRateLimitStore:
+    """Contadores en SQLite (WAL), compartidos entre procesos de la misma máquina."""
+
+    # hit() puede esperar el lock de escritura (hasta `timeout`): fuera del event loop
+    blocking = True
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH, sweep_seconds: float = RATE_LIMIT_SWEEP_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits ("
+            "key TEXT PRIMARY KEY, window INTEGER NOT NULL, "
+            "current INTEGER NOT NULL, previous INTEGER NOT NULL)"
+        )
+
+    def hit(self, key: str, limit: int, window_seconds: float, now: float) -> tuple[bool, float]:
+        window = int(now // window_seconds)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT window, current, previous FROM rate_limits WHERE key = ?", (key,)
+                ).fetchone()
+                stored_window, current, previous = row if row else (None, 0, 0)
+                current, previous = _roll(window, stored_window, current, previous)
+                estimated = _estimate(now, window_seconds, current, previous)
+                allowed = estimated < limit
+                if allowed:
+                    current += 1
+                    estimated += 1
+                self._conn.execute(
+                    "INSERT INTO rate_limits (key, window, current, previous) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET window = excluded.window, "
+                    "current = excluded.current, previous = excluded.previous",
+                    (key, window, current, previous),
+                )
+                if time.monotonic() - self._last_sweep >= self.sweep_seconds:
+                    self._conn.execute("DELETE FROM rate_limits WHERE window < ?", (window - 1,))
+                    self._last_sweep = time.monotonic()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed, estimated
+
+
+def create_rate_limit_store(kind: str = RATE_LIMIT_STORE):
+    if kind == "memory":
+        return InMemoryRateLimitStore()
+    if kind == "sqlite":
+        return SQLiteRateLimitStore()
+    raise ValueError(f"unknown rate limit store '{kind}'. valid values: memory, sqlite")
+
+
+class RateLimiter:
+    def __init__(self, store, limit: int, window_seconds: float):
+        self.store = store
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    def hit(self, key: str, limit: int | None = None) -> RateLimitResult:
+        limit = limit or self.limit
+        now = time.time()
+        allowed, estimated = self.store.hit(key, limit, self.window_seconds, now)
+        retry_after = 0
+        if not allowed:
+            # Cota superior: al cerrar la ventana actual la anterior deja de pesar
+            retry_after = math.ceil(self.window_seconds - (now % self.window_seconds))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, int(limit - estimated)),
+            retry_after=retry_after,
+        )
+
+    async def hit_async(self, key: str, limit: int | None = None) -> RateLimitResult:
+        """hit() para endpoints async: los stores bloqueantes van al threadpool."""
+        if not getattr(self.store, "blocking", True):
+            return self.hit(key, limit)
+        return await run_in_threadpool(self.hit, key, limit)
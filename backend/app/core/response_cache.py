@@ -0,0 +1,108 @@
+"""
+ETags y caché de respuestas renderizadas para los dashboards.
+
+Las respuestas de dashboard dependen únicamente de la versión del proyecto
+(ver database.get_project_version) y de los parámetros de la petición. Con
+ambos se construye un ETag débil (el middleware de compresión sirve el mismo
+cuerpo en gzip, brotli o sin comprimir, y un ETag fuerte exigiría bytes
+idénticos en todas las representaciones): si coincide con `If-None-Match` se responde
+304 sin leer la base de datos, y si no, el cuerpo JSON ya serializado se sirve
+desde una LRU acotada por número de entradas y por bytes.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from app.core.serialization import render_json
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 2**20)))
+
+
+class RenderedResponseCache:
+    """LRU de clave -> cuerpo JSON serializado (bytes)."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+rendered_responses = RenderedResponseCache()
+
+
+def make_etag(*parts) -> str:
+    """ETag débil a partir de la versión del proyecto y los parámetros de la petición."""
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def _opaque_tag(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return _opaque_tag(etag) in (_opaque_tag(candidate.strip()) for candidate in header.split(","))
+
+
+def cached_json_response(request: Request, response: Response, etag: str, build) -> Response:
+    """
+    Responde 304 si el cliente ya tiene `etag`; si no, sirve el cuerpo cacheado
+    o lo construye con `build()` y lo guarda.
+
+    Las cabeceras ya puestas en `response` (p. ej. Deprecation) se conservan.
+    """
+    headers = {
+        key: value for key, value in response.headers.items()
+        if key not in ("content-length", "content-type")
+    }
+    headers["ETag"] = etag
+    headers["Cache-Control"] = "private, no-cache"
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    body = rendered_responses.get(etag)
+    if body is None:
+        body = render_json(build())
+        rendered_responses.put(etag, body)
+    return Response(content=body, media_type="application/json", headers=headers)
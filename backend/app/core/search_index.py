@@ -0,0 +1,271 @@
+"""
+Índice de búsqueda de texto completo (SQLite FTS5) de proyectos y transcripciones.
+
+Dos tablas FTS5 con el tokenizador unicode61 y `remove_diacritics 2`, que
+pliega mayúsculas y acentos igual que `normalize_alias` de los tipos de debate ("Refutación"
+y "refutacion" son el mismo término). Los proyectos se indexan por nombre,
+descripción y tema del debate; los segmentos, por el texto completo de su
+transcripción. Las consultas devuelven resultados ordenados por bm25 con
+fragmentos resaltados, y se filtran siempre por usuario. Los fragmentos se
+devuelven como HTML escapado en el que solo `<mark>` es marcado.
+
+El índice es derivado de db.json: `python cli.py search reindex` lo
+reconstruye desde cero.
+"""
+
+import html
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search.sqlite3")
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+# Marcadores que recibe FTS5 (uso privado de Unicode): el texto se escapa
+# como HTML y solo después se sustituyen por HIGHLIGHT_OPEN/HIGHLIGHT_CLOSE
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+_STRIP_MARKS = str.maketrans("", "", _MARK_OPEN + _MARK_CLOSE)
+SNIPPET_TOKENS = 24
+
+_TOKENIZER = "unicode61 remove_diacritics 2"
+# Peso bm25 por columna indexada de proyectos: nombre > tema > descripción
+_PROJECT_WEIGHTS = (10.0, 2.0, 5.0)
+
+_schema_lock = threading.Lock()
+_initialized: set[str] = set()
+
+
+@contextmanager
+def _connection(path: str | None = None):
+    path = path or SEARCH_INDEX_PATH
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        if path not in _initialized:
+            _init_schema(conn, path)
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _init_schema(conn: sqlite3.Connection, path: str) -> None:
+    with _schema_lock:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5("
+            "project_code UNINDEXED, user_code UNINDEXED, debate_type UNINDEXED, "
+            f"name, description, debate_topic, tokenize = '{_TOKENIZER}')"
+        )
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5("
+            "segment_id UNINDEXED, project_code UNINDEXED, user_code UNINDEXED, "
+            "fase_id UNINDEXED, postura UNINDEXED, orador UNINDEXED, created_at UNINDEXED, "
+            f"text, tokenize = '{_TOKENIZER}')"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS search_meta (key TEXT PRIMARY KEY, value TEXT)")
+        _initialized.add(path)
+
+
+def build_match_query(q: str) -> str | None:
+    """
+    Convierte texto libre en una consulta FTS5: todos los términos, cada uno
+    como prefijo ("refut" encuentra "refutación"). None si no hay términos.
+    """
+    terms = re.findall(r"\w+", q or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _render_highlight(value: str | None) -> str | None:
+    if value is None:
+        return None
+    escaped = html.escape(value)
+    return escaped.replace(_MARK_OPEN, HIGHLIGHT_OPEN).replace(_MARK_CLOSE, HIGHLIGHT_CLOSE)
+
+
+def _indexed_text(value) -> str:
+    # Sin los marcadores internos: no se pueden colar como <mark> en la salida
+    return (value or "").translate(_STRIP_MARKS)
+
+
+def _segment_text(segment: dict) -> str:
+    transcript = segment.get("transcript") or []
+    if isinstance(transcript, str):
+        return transcript
+    return " ".join(row.get("text", "") for row in transcript if isinstance(row, dict)).strip()
+
+
+def _insert_project(conn: sqlite3.Connection, project: dict) -> None:
+    conn.execute(
+        "INSERT INTO projects_fts (project_code, user_code, debate_type, name, description, debate_topic) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            project["code"],
+            project.get("user_code"),
+            project.get("debate_type"),
+            _indexed_text(project.get("name")),
+            _indexed_text(project.get("desc")),
+            _indexed_text(project.get("debate_topic")),
+        ),
+    )
+
+
+def _insert_segment(conn: sqlite3.Connection, segment: dict) -> None:
+    conn.execute(
+        "INSERT INTO segments_fts (segment_id, project_code, user_code, fase_id, postura, "
+        "orador, created_at, text) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            segment["segment_id"],
+            segment.get("project_code"),
+            segment.get("user_code"),
+            segment.get("fase_id"),
+            segment.get("postura"),
+            segment.get("orador"),
+            segment.get("created_at"),
+            _indexed_text(_segment_text(segment)),
+        ),
+    )
+
+
+def index_project(project: dict, path: str | None = None) -> None:
+    with _connection(path) as conn:
+        conn.execute("DELETE FROM projects_fts WHERE project_code = ?", (project["code"],))
+        _insert_project(conn, project)
+
+
+def index_segment(segment: dict, path: str | None = None) -> None:
+    with _connection(path) as conn:
+        conn.execute("DELETE FROM segments_fts WHERE segment_id = ?", (segment["segment_id"],))
+        _insert_segment(conn, segment)
+
+
+def is_built(path: str | None = None) -> bool:
+    with _connection(path) as conn:
+        row = conn.execute("SELECT value FROM search_meta WHERE key = 'built'").fetchone()
+    return row is not None
+
+
+def rebuild(projects, segments, path: str | None = None) -> tuple[int, int]:
+    """
+    Reconstruye el índice completo en una transacción.
+
+    Returns:
+        (proyectos indexados, segmentos indexados)
+    """
+    project_count = segment_count = 0
+    with _connection(path) as conn:
+        conn.execute("DELETE FROM projects_fts")
+        conn.execute("DELETE FROM segments_fts")
+        for project in projects:
+            _insert_project(conn, project)
+            project_count += 1
+        for segment in segments:
+            _insert_segment(conn, segment)
+            segment_count += 1
+        conn.execute("INSERT OR REPLACE INTO search_meta (key, value) VALUES ('built', '1')")
+        conn.execute("INSERT INTO segments_fts(segments_fts) VALUES ('optimize')")
+        conn.execute("INSERT INTO projects_fts(projects_fts) VALUES ('optimize')")
+    return project_count, segment_count
+
+
+def search_projects(
+    user_code: str,
+    q: str,
+    debate_type: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    path: str | None = None,
+) -> dict:
+    """
+    Proyectos del usuario que contienen todos los términos, por relevancia.
+
+    Returns:
+        {"items": [{project_code, rank, highlights}], "total"}
+    """
+    match = build_match_query(q)
+    if match is None:
+        return {"items": [], "total": 0}
+
+    where = "projects_fts MATCH ? AND user_code = ?"
+    params: list = [match, user_code]
+    if debate_type:
+        where += " AND debate_type = ?"
+        params.append(debate_type)
+
+    weights = ", ".join(str(w) for w in _PROJECT_WEIGHTS)
+    with _connection(path) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM projects_fts WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT project_code, bm25(projects_fts, 0, 0, 0, {weights}) AS rank, "
+            "highlight(projects_fts, 3, ?, ?), highlight(projects_fts, 4, ?, ?), "
+            "highlight(projects_fts, 5, ?, ?) "
+            f"FROM projects_fts WHERE {where} ORDER BY rank LIMIT ? OFFSET ?",
+            [_MARK_OPEN, _MARK_CLOSE] * 3 + params + [limit, offset],
+        ).fetchall()
+
+    items = []
+    for project_code, rank, name, description, debate_topic in rows:
+        highlights = {
+            field: _render_highlight(value)
+            for field, value in (("name", name), ("desc", description), ("debate_topic", debate_topic))
+            if value and _MARK_OPEN in value
+        }
+        items.append({"project_code": project_code, "rank": round(-rank, 6), "highlights": highlights})
+    return {"items": items, "total": total}
+
+
+def search_segments(
+    user_code: str,
+    q: str,
+    project_code: str | None = None,
+    fase_id: str | None = None,
+    postura: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+    path: str | None = None,
+) -> dict:
+    """
+    Intervenciones del usuario cuya transcripción contiene todos los términos.
+
+    Returns:
+        {"items": [{segment_id, project_code, fase_id, postura, orador,
+        created_at, rank, snippet}], "total"}
+    """
+    match = build_match_query(q)
+    if match is None:
+        return {"items": [], "total": 0}
+
+    where = "segments_fts MATCH ? AND user_code = ?"
+    params: list = [match, user_code]
+    for column, value in (("project_code", project_code), ("fase_id", fase_id), ("postura", postura)):
+        if value:
+            where += f" AND {column} = ?"
+            params.append(value)
+
+    with _connection(path) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM segments_fts WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            "SELECT segment_id, project_code, fase_id, postura, orador, created_at, "
+            "bm25(segments_fts) AS rank, snippet(segments_fts, 7, ?, ?, '…', ?) "
+            f"FROM segments_fts WHERE {where} ORDER BY rank LIMIT ? OFFSET ?",
+            [_MARK_OPEN, _MARK_CLOSE, SNIPPET_TOKENS] + params + [limit, offset],
+        ).fetchall()
+
+    items = [
+        {
+            "segment_id": segment_id,
+            "project_code": segment_project,
+            "fase_id": segment_fase,
+            "postura": segment_postura,
+            "orador": orador,
+            "created_at": created_at,
+            "rank": round(-rank, 6),
+            "snippet": _render_highlight(snippet),
+        }
+        for segment_id, segment_project, segment_fase, segment_postura, orador, created_at, rank, snippet in rows
+    ]
+    return {"items": items, "total": total}
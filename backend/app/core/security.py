@@ -1,6 +1,48 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Rondas de PBKDF2 para hashes nuevos. Los hashes guardados con menos rondas se
+# rehacen de forma transparente en el siguiente login (nunca se rebajan).
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Hilos dedicados a hashing: limitan cuántas CPUs puede ocupar una ráfaga de logins
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hashes admitidos a la vez (en curso + en cola); por encima se rechaza en el acto
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+)
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+class HashPoolSaturated(Exception):
+    """El pool de hashing tiene PASSWORD_HASH_MAX_PENDING trabajos pendientes."""
+
+
+def _submit_hash(fn, *args) -> asyncio.Future:
+    # La cola del executor no tiene límite: sin hueco se rechaza en lugar de
+    # acumular trabajos (y esperas) durante una ráfaga de logins
+    if not _hash_slots.acquire(blocking=False):
+        raise HashPoolSaturated("password hashing pool is saturated")
+    try:
+        future = _hash_executor.submit(fn, *args)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return asyncio.wrap_future(future)
 
 
 def get_password_hash(password: str) -> str:
@@ -9,3 +51,30 @@ def get_password_hash(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verifica la contraseña y, si el hash está desactualizado, devuelve uno nuevo.
+
+    Returns:
+        (válida, nuevo_hash) — nuevo_hash es None si no hace falta rehacerlo
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    get_password_hash en el pool de hashing, sin bloquear el event loop.
+
+    Raises:
+        HashPoolSaturated: Si el pool ya tiene PASSWORD_HASH_MAX_PENDING trabajos
+    """
+    return await _submit_hash(get_password_hash, password)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """verify_and_update_password en el pool de hashing (mismo límite que get_password_hash_async)."""
+    return await _submit_hash(verify_and_update_password, plain_password, hashed_password)
@@ -0,0 +1,33 @@
+"""
+Serialización de respuestas JSON.
+
+Con orjson instalado las respuestas se codifican con ORJSONResponse (varias
+veces más rápido que json en payloads con transcripciones completas); sin él
+se usa el JSONResponse estándar. El formato columnar de transcripción
+reduce el tamaño de la respuesta al no repetir las claves en cada fragmento.
+"""
+
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:
+    from fastapi.responses import JSONResponse as DefaultJSONResponse
+
+TRANSCRIPT_FORMATS = ("rows", "columnar")
+
+
+def render_json(content) -> bytes:
+    return DefaultJSONResponse(content=jsonable_encoder(content)).body
+
+
+def to_columnar_transcript(transcript: list[dict]) -> dict:
+    """[{start, end, speaker, text}, ...] -> arrays paralelas por campo."""
+    return {
+        "format": "columnar",
+        "start": [seg.get("start") for seg in transcript],
+        "end": [seg.get("end") for seg in transcript],
+        "speaker": [seg.get("speaker") for seg in transcript],
+        "text": [seg.get("text", "") for seg in transcript],
+    }
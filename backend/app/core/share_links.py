@@ -0,0 +1,113 @@
+"""
+Resolución de enlaces públicos de dashboard (token -> enlace + proyecto).
+
+Mantiene en memoria un índice token_hash -> (enlace, proyecto) construido a
+partir de la tabla project_share_links. El índice se reconstruye cuando
+db.json cambia en disco (otro proceso ha creado o revocado enlaces) o al
+revocar desde este proceso; los enlaces creados aquí se añaden sin releer. Los tokens
+desconocidos se recuerdan en una caché negativa acotada con TTL, de modo que
+repetir un token inventado no cuesta ni siquiera comprobar el fichero.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.database import db_mtime_ns, get_all_project_share_links, get_project_by_code
+
+SHARE_LINK_NEGATIVE_TTL_SECONDS = float(os.getenv("SHARE_LINK_NEGATIVE_TTL_SECONDS", "60"))
+SHARE_LINK_NEGATIVE_MAX_ENTRIES = int(os.getenv("SHARE_LINK_NEGATIVE_MAX_ENTRIES", "10000"))
+
+
+def hash_share_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class ShareLinkResolver:
+    def __init__(
+        self,
+        negative_ttl_seconds: float = SHARE_LINK_NEGATIVE_TTL_SECONDS,
+        negative_max_entries: int = SHARE_LINK_NEGATIVE_MAX_ENTRIES,
+    ):
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.negative_max_entries = negative_max_entries
+        self._by_hash: dict[str, tuple[dict, dict | None]] = {}
+        self._index_mtime: int | None = None
+        self._index_built = False
+        self._missing: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _refresh_index(self) -> None:
+        mtime = db_mtime_ns()
+        if self._index_built and mtime == self._index_mtime:
+            return
+        with self._lock:
+            index = {}
+            for link in get_all_project_share_links():
+                token_hash = link.get("token_hash")
+                if token_hash:
+                    index[token_hash] = (link, get_project_by_code(link.get("project_code")))
+            self._by_hash = index
+            self._index_mtime = mtime
+            self._index_built = True
+            # Puede haber enlaces nuevos: lo que no existía ahora quizá sí
+            self._missing.clear()
+
+    def _is_known_missing(self, token_hash: str) -> bool:
+        with self._lock:
+            missing_since = self._missing.get(token_hash)
+            if missing_since is None:
+                return False
+            if time.monotonic() - missing_since > self.negative_ttl_seconds:
+                del self._missing[token_hash]
+                return False
+            return True
+
+    def _remember_missing(self, token_hash: str) -> None:
+        with self._lock:
+            self._missing[token_hash] = time.monotonic()
+            self._missing.move_to_end(token_hash)
+            while len(self._missing) > self.negative_max_entries:
+                self._missing.popitem(last=False)
+
+    def resolve(self, token: str) -> tuple[dict, dict | None] | None:
+        """
+        Devuelve (enlace, proyecto) para un token en claro, o None si no existe.
+
+        No valida revocación ni caducidad: eso es responsabilidad del endpoint.
+        """
+        token_hash = hash_share_token(token)
+        if self._is_known_missing(token_hash):
+            return None
+        self._refresh_index()
+        resolved = self._by_hash.get(token_hash)
+        if resolved is None:
+            self._remember_missing(token_hash)
+        return resolved
+
+    def add(self, link: dict) -> None:
+        token_hash = link["token_hash"]
+        with self._lock:
+            self._missing.pop(token_hash, None)
+            if self._index_built:
+                self._by_hash[token_hash] = (link, get_project_by_code(link.get("project_code")))
+
+    def invalidate(self, share_id: str) -> None:
+        """Descarta un enlace (p. ej. revocado); se relee del almacenamiento en el próximo acceso."""
+        with self._lock:
+            self._by_hash = {
+                token_hash: resolved for token_hash, resolved in self._by_hash.items()
+                if resolved[0].get("share_id") != share_id
+            }
+            self._index_built = False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_hash = {}
+            self._index_built = False
+            self._missing.clear()
+
+
+share_link_resolver = ShareLinkResolver()
@@ -0,0 +1,467 @@
+"""
+Almacenamiento de TinyDB con un único hilo escritor por fichero.
+
+TinyDB no es seguro entre hilos ni entre procesos y reescribe el fichero
+completo en cada operación. Esta capa:
+
+- Sirve las lecturas desde una instantánea en memoria (se recarga si otro
+  proceso ha modificado el fichero). La instantánea nunca sale de esta capa:
+  las tablas devuelven copias de los documentos y las escrituras trabajan
+  sobre copias de los que tocan, así que mutar un resultado no altera lo
+  que se vuelca a db.json.
+- Serializa las escrituras de las tablas (leer, modificar, escribir) con un
+  lock y las aplica sobre la instantánea; un hilo escritor dedicado las
+  vuelca a disco por lotes cada DB_FLUSH_INTERVAL_SECONDS, con fichero
+  temporal + fsync + os.replace, de modo que db.json nunca queda truncado.
+- Con DB_DURABLE_WRITES (por defecto) cada escritura espera a estar en
+  disco; las escrituras concurrentes comparten el mismo volcado (group commit).
+  Como bloquea el hilo, las rutas async deben escribir desde el threadpool.
+- Entre procesos (API + workers) el volcado se hace bajo flock; si el fichero
+  ha cambiado desde la última carga, los cambios propios se fusionan por
+  documento sobre la versión en disco en lugar de pisarla.
+- `storage.transaction()` abre una unidad de trabajo: las escrituras del
+  hilo se aplican sobre una copia privada y se publican de una vez al salir
+  (o se descartan si hay una excepción). La transacción toma el flock al
+  empezar, recarga la instantánea si otro proceso ha escrito, y lo mantiene
+  hasta volcar su resultado: los leer-modificar-escribir (p. ej. contadores
+  de versión) no pierden actualizaciones entre procesos.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from tinydb import TinyDB
+from tinydb.storages import Storage
+from tinydb.table import Document, Table
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+DB_FLUSH_INTERVAL_SECONDS = float(os.getenv("DB_FLUSH_INTERVAL_SECONDS", "0.02"))
+DB_DURABLE_WRITES = os.getenv("DB_DURABLE_WRITES", "1") == "1"
+
+
+class _OwnedRLock:
+    """RLock que sabe si el hilo actual lo tiene tomado."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._owner = None
+        self._count = 0
+
+    def acquire(self):
+        self._lock.acquire()
+        self._owner = threading.get_ident()
+        self._count += 1
+
+    def release(self):
+        self._count -= 1
+        if self._count == 0:
+            self._owner = None
+        self._lock.release()
+
+    def held_by_current_thread(self) -> bool:
+        return self._owner == threading.get_ident()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _file_signature(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _copy_json(value):
+    # Copia profunda de datos JSON (dict/list/escalares), más rápida que deepcopy
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class _CopiedDocument(Document):
+    """Documento desenlazado de la instantánea (copia profunda)."""
+
+    def __init__(self, value, doc_id):
+        super().__init__(_copy_json(value), doc_id)
+
+
+class _CopyOnAccessTable(dict):
+    """
+    Tabla que reciben los updaters de TinyDB: cada documento se copia la
+    primera vez que se lee o se asigna, y se modifica la copia.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._copied = set()
+
+    def __getitem__(self, doc_id):
+        if doc_id not in self._copied:
+            super().__setitem__(doc_id, _copy_json(super().__getitem__(doc_id)))
+            self._copied.add(doc_id)
+        return super().__getitem__(doc_id)
+
+    def __setitem__(self, doc_id, document):
+        super().__setitem__(doc_id, _copy_json(document))
+        self._copied.add(doc_id)
+
+
+def merge_tables(base: dict, ours: dict, theirs: dict) -> dict:
+    """
+    Fusión a tres bandas por documento: aplica sobre `theirs` (disco) lo que
+    `ours` cambió respecto a `base` (última versión cargada/escrita).
+
+    Los documentos insertados por ambos lados con el mismo id se conservan:
+    el nuestro recibe un id nuevo.
+    """
+    merged = dict(theirs)
+    for name in set(base) | set(ours):
+        base_table = base.get(name, {})
+        our_table = ours.get(name, {})
+        table = dict(theirs.get(name, {}))
+        for doc_id, doc in our_table.items():
+            if doc_id not in base_table:
+                if doc_id in table and table[doc_id] != doc:
+                    doc_id = str(max(int(existing) for existing in table) + 1)
+                table[doc_id] = doc
+            elif doc != base_table[doc_id]:
+                table[doc_id] = doc
+        for doc_id in base_table:
+            if doc_id not in our_table:
+                table.pop(doc_id, None)
+        merged[name] = table
+    return merged
+
+
+class SnapshotStorage(Storage):
+    def __init__(self, path: str, encoding: str = "utf-8", **kwargs):
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+        self.lock = _OwnedRLock()
+        # Sube con cada cambio de la instantánea: invalida las cachés de consultas
+        self.data_version = 0
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._flushed_generation = 0
+        self._flush_error: Exception | None = None
+        self._writer: threading.Thread | None = None
+        self._closing = False
+        self._data: dict = {}
+        self._base_payload: str | None = None
+        self._base_signature = None
+
+        with self._file_lock():
+            if not os.path.exists(path):
+                self._write_file(json.dumps({}, **self.kwargs))
+        self._reload()
+
+    # -- fichero --------------------------------------------------------
+
+    @contextmanager
+    def _file_lock(self):
+        # Reentrante por hilo: la transacción lo mantiene durante su volcado
+        depth = getattr(self._local, "file_lock_depth", 0)
+        if fcntl is None or depth:
+            self._local.file_lock_depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.file_lock_depth = depth
+            return
+        with open(f"{self.path}.lock", "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            self._local.file_lock_depth = 1
+            try:
+                yield
+            finally:
+                self._local.file_lock_depth = 0
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _write_file(self, payload: str) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding=self.encoding) as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _reload(self) -> None:
+        with self.lock:
+            signature = _file_signature(self.path)
+            try:
+                with open(self.path, encoding=self.encoding) as handle:
+                    payload = handle.read()
+            except FileNotFoundError:
+                payload = ""
+            self._data = json.loads(payload) if payload else {}
+            self._base_payload = payload or json.dumps({}, **self.kwargs)
+            self._base_signature = signature
+            self.data_version += 1
+
+    def _changed_on_disk(self) -> bool:
+        return _file_signature(self.path) != self._base_signature
+
+    def _sync_with_disk(self) -> None:
+        # Con el flock y el lock tomados: parte de la última versión en disco
+        if not self._changed_on_disk():
+            return
+        if self._generation != self._flushed_generation:
+            # Hay cambios propios sin volcar: el volcado los fusiona
+            self.flush()
+        else:
+            self._reload()
+
+    # -- interfaz Storage -----------------------------------------------
+
+    def in_transaction(self) -> bool:
+        return getattr(self._local, "depth", 0) > 0
+
+    def read(self) -> dict:
+        if self.in_transaction():
+            if self._local.pending is None:
+                with self.lock:
+                    # Copia superficial: las tablas se sustituyen, nunca se modifican
+                    self._local.pending = dict(self._data)
+            return self._local.pending
+        # Dentro de una escritura (lock tomado) no se recarga: TinyDB lee
+        # varias veces (siguiente id, tabla) y todas deben ver la misma versión
+        if not self.lock.held_by_current_thread():
+            self.refresh()
+        # Copia superficial: TinyDB reasigna tablas sobre el dict devuelto
+        return dict(self._data)
+
+    def refresh(self) -> None:
+        """Recarga la instantánea si otro proceso ha modificado el fichero."""
+        # Solo sin cambios propios pendientes (si los hay, el volcado fusionará
+        # ambas versiones)
+        if self._generation == self._flushed_generation and self._changed_on_disk():
+            with self.lock:
+                if self._generation == self._flushed_generation and self._changed_on_disk():
+                    self._reload()
+
+    def write(self, data: dict) -> None:
+        if self.in_transaction():
+            self._local.pending = data
+            self._local.dirty = True
+            return
+        self._publish(data)
+
+    def _publish(self, data: dict) -> None:
+        with self.lock:
+            self._data = data
+            self._generation += 1
+            self.data_version += 1
+            self._local.generation = self._generation
+        self._ensure_writer()
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_durable(self) -> None:
+        """Espera a que la última escritura de este hilo esté en disco."""
+        generation = getattr(self._local, "generation", 0)
+        # Con el lock tomado el escritor no podría avanzar
+        if not DB_DURABLE_WRITES or self.in_transaction() or self.lock.held_by_current_thread():
+            return
+        with self._cond:
+            while self._flushed_generation < generation:
+                if self._flush_error is not None:
+                    raise OSError(f"error while writing {self.path}") from self._flush_error
+                self._cond.wait()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupa las escrituras del hilo en una sola publicación atómica.
+
+        Mantiene el lock de escritura y el flock de db.json hasta volcar el
+        commit a disco, así que el bloque debe ser corto (solo persistencia,
+        nada de inferencia). Las transacciones anidadas se integran en la
+        exterior.
+        """
+        if self.in_transaction():
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        # Orden de locks: flock -> lock (el mismo que en flush)
+        with self._file_lock():
+            self.lock.acquire()
+            self._local.depth = 1
+            self._local.pending = None
+            self._local.dirty = False
+            committed = False
+            try:
+                self._sync_with_disk()
+                yield
+                self._local.depth = 0
+                if self._local.dirty:
+                    self._publish(self._local.pending)
+                    committed = True
+                    # Volcado síncrono antes de soltar el flock: ningún otro
+                    # proceso puede partir de la versión anterior
+                    self.flush()
+            finally:
+                if not committed:
+                    # Rollback: las cachés pueden tener resultados de la copia descartada
+                    self.data_version += 1
+                self._local.depth = 0
+                self._local.pending = None
+                self._local.dirty = False
+                self.lock.release()
+
+    # -- hilo escritor --------------------------------------------------
+
+    def _ensure_writer(self) -> None:
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._cond:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name=f"tinydb-writer:{self.path}", daemon=True)
+                self._writer.start()
+
+    def _writer_loop(self) -> None:
+        while True:
+            with self._cond:
+                while self._generation == self._flushed_generation and not self._closing:
+                    self._cond.wait()
+                if self._closing and self._generation == self._flushed_generation:
+                    return
+            # Ventana de agrupación: las escrituras que lleguen entretanto
+            # comparten el mismo volcado
+            time.sleep(DB_FLUSH_INTERVAL_SECONDS)
+            try:
+                self.flush()
+            except Exception as exc:
+                with self._cond:
+                    self._flush_error = exc
+                    self._cond.notify_all()
+                time.sleep(1.0)
+
+    def flush(self) -> None:
+        with self._file_lock():
+            with self.lock:
+                generation = self._generation
+                if generation == self._flushed_generation:
+                    return
+                if self._changed_on_disk():
+                    # Otro proceso ha escrito desde nuestra última carga
+                    theirs = {}
+                    with open(self.path, encoding=self.encoding) as handle:
+                        content = handle.read()
+                    if content:
+                        theirs = json.loads(content)
+                    self._data = merge_tables(json.loads(self._base_payload), self._data, theirs)
+                    self.data_version += 1
+                payload = json.dumps(self._data, **self.kwargs)
+            self._write_file(payload)
+            self._base_payload = payload
+            self._base_signature = _file_signature(self.path)
+        with self._cond:
+            self._flushed_generation = generation
+            self._flush_error = None
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self.flush()
+
+
+class LockedTable(Table):
+    """
+    Tabla cuyas escrituras son atómicas entre hilos y esperan al volcado.
+
+    Las lecturas devuelven copias de los documentos (también desde la caché
+    de consultas) y las escrituras no modifican en sitio los de la instantánea.
+    """
+
+    document_class = _CopiedDocument
+    _cache_version = -1
+
+    def _write(self, operation, *args, reset_next_id: bool = False, **kwargs):
+        with self._storage.lock:
+            self._storage.refresh()
+            if reset_next_id:
+                # Otro proceso puede haber insertado: el siguiente id se recalcula
+                self._next_id = None
+            result = operation(*args, **kwargs)
+        self._storage.wait_durable()
+        return result
+
+    def insert(self, document):
+        return self._write(super().insert, document, reset_next_id=True)
+
+    def insert_multiple(self, documents):
+        return self._write(super().insert_multiple, documents, reset_next_id=True)
+
+    def update(self, *args, **kwargs):
+        return self._write(super().update, *args, **kwargs)
+
+    def update_multiple(self, *args, **kwargs):
+        return self._write(super().update_multiple, *args, **kwargs)
+
+    def upsert(self, *args, **kwargs):
+        return self._write(super().upsert, *args, **kwargs)
+
+    def remove(self, *args, **kwargs):
+        return self._write(super().remove, *args, **kwargs)
+
+    def truncate(self):
+        return self._write(super().truncate)
+
+    def _update_table(self, updater):
+        # Como Table._update_table, pero el updater recibe una tabla que copia
+        # los documentos al tocarlos
+        with self._storage.lock:
+            tables = self._storage.read() or {}
+            table = _CopyOnAccessTable(
+                (self.document_id_class(doc_id), doc) for doc_id, doc in tables.get(self.name, {}).items())
+            updater(table)
+            tables[self.name] = {str(doc_id): doc for doc_id, doc in dict.items(table)}
+            self._storage.write(tables)
+            self.clear_cache()
+
+    def search(self, cond):
+        if self._storage.in_transaction():
+            # Sin caché: los resultados sin confirmar no deben verlos otros hilos
+            return [
+                self.document_class(doc, self.document_id_class(doc_id))
+                for doc_id, doc in self._read_table().items()
+                if cond(doc)
+            ]
+        if self._cache_version != self._storage.data_version:
+            self.clear_cache()
+            self._cache_version = self._storage.data_version
+        # La caché guarda sus propias copias: cada llamada recibe otras
+        return [self.document_class(doc, doc.doc_id) for doc in super().search(cond)]
+
+
+class LockedTinyDB(TinyDB):
+    table_class = LockedTable
+
+
+def open_db(path: str) -> LockedTinyDB:
+    database = LockedTinyDB(path, storage=SnapshotStorage)
+    atexit.register(database.storage.close)
+    return database
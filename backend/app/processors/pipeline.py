@@ -9,14 +9,13 @@ from langchain_core.messages import HumanMessage, AIMessage
 import os
 from dotenv import load_dotenv
 
-from app.services.ai_engine import TinyDBChatMessageHistory
+from app.core.instrumentation import stage
+from app.services.ai_engine import create_chat_history
 from data.prompts.prompts import system_prompt_evaluation
 from data.debate_types.base import DebateTypeConfig
 from data.debate_types import get_debate_type, DEFAULT_DEBATE_TYPE
 
 load_dotenv()
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("OpenAI key not found")
 
 
 # ---------------------------------------------------------------------------
@@ -191,10 +190,14 @@ class ChatSession:
         session_id: str,
         db_path: str = "db.json",
         debate_type_config: Optional[DebateTypeConfig] = None,
+        llm=None,
+        history_backend: str = "tinydb",
     ):
         self.project_id = project_id
         self.session_id = session_id
         self.db_path = db_path
+        # Modelo de chat inyectable (benchmarks, pruebas locales); por defecto OpenAI
+        self._llm = llm
 
         # Si no se pasa config, usar UPCT por defecto (retrocompatibilidad)
         if debate_type_config is not None:
@@ -202,15 +205,21 @@ class ChatSession:
         else:
             self.config = get_debate_type(DEFAULT_DEBATE_TYPE)
 
-        self._history = TinyDBChatMessageHistory(
-            session_id, project_id, db_path)
+        self._history = create_chat_history(
+            history_backend, session_id, project_id, db_path)
         self._chain = self._setup_chain()
         self._chain_with_history = self._setup_chain_with_history()
 
     def _setup_chain(self):
         """Configura el chain de LangChain con el system prompt del tipo de debate."""
-        # llm = ChatOpenAI(model="gpt-5-mini-2025-08-07", temperature=0)
-        llm = ChatOpenAI(model="gpt-5-2025-08-07", temperature=0)
+        llm = self._llm
+        if llm is None:
+            # La clave se valida al crear la sesión y no al importar el módulo,
+            # para que los procesos que no evalúan puedan arrancar sin ella
+            if not os.getenv("OPENAI_API_KEY"):
+                raise ValueError("OpenAI key not found")
+            # llm = ChatOpenAI(model="gpt-5-mini-2025-08-07", temperature=0)
+            llm = ChatOpenAI(model="gpt-5-2025-08-07", temperature=0)
 
         prompt = ChatPromptTemplate.from_messages([
             ("system", self.config.system_prompt),
@@ -224,8 +233,9 @@ class ChatSession:
         """Configura el chain con historial de mensajes."""
         return RunnableWithMessageHistory(
             self._chain,
-            lambda sid: TinyDBChatMessageHistory(
-                sid, self.project_id, self.db_path),
+            # La sesión solo usa su propio session_id: el historial en
+            # memoria tiene que ser la misma instancia en cada llamada
+            lambda sid: self._history,
             input_messages_key="input",
             history_messages_key="history",
         )
@@ -280,7 +290,7 @@ class ChatSession:
 
     def _get_parser(self, fase_id: str) -> PydanticOutputParser:
         """Retorna el parser adecuado según el tipo de debate y la fase."""
-        if self.config.id == "retor":
+        if self.config.evaluation_mode == "per_team":
             return PydanticOutputParser(pydantic_object=RetorEvaluationOutput)
 
         # UPCT: fase Final tiene modelo distinto
@@ -398,16 +408,19 @@ class ChatSession:
             postura, Enum) else str(postura)
 
         # Construir el prompt
-        user_message = self._build_evaluation_prompt(
-            fase_id, fase_nombre, postura_str, orador,
-            transcripcion, metricas, duracion_segundos
-        )
+        with stage("prompt_build", debate_type=self.config.id, fase=fase_id) as span:
+            user_message = self._build_evaluation_prompt(
+                fase_id, fase_nombre, postura_str, orador,
+                transcripcion, metricas, duracion_segundos
+            )
+            span["prompt_chars"] = len(user_message)
 
         # Invocar el chain con historial
-        response = self._chain_with_history.invoke(
-            {"input": user_message},
-            config={"configurable": {"session_id": self.session_id}}
-        )
+        with stage("llm", debate_type=self.config.id, fase=fase_id):
+            response = self._chain_with_history.invoke(
+                {"input": user_message},
+                config={"configurable": {"session_id": self.session_id}}
+            )
 
         # Parsear la respuesta
         parser = self._get_parser(fase_id)
@@ -468,6 +481,8 @@ def create_chat(
     session_id: str,
     db_path: str = "db.json",
     debate_type_config: Optional[DebateTypeConfig] = None,
+    llm=None,
+    history_backend: str = "tinydb",
 ) -> ChatSession:
     """
     Crea una nueva sesión de chat para evaluación de debates.
@@ -477,6 +492,9 @@ def create_chat(
         session_id: Identificador de la sesión de evaluación
         db_path: Ruta al archivo de base de datos TinyDB
         debate_type_config: Configuración del tipo de debate (None = UPCT por defecto)
+        llm: Modelo de chat de LangChain a usar (None = ChatOpenAI)
+        history_backend: "tinydb" (historial persistente en db_path) o
+            "memory" (efímero, no escribe en disco)
 
     Returns:
         ChatSession configurada y lista para usar
@@ -504,4 +522,4 @@ def create_chat(
         ...     metricas={...}
         ... )
     """
-    return ChatSession(project_id, session_id, db_path, debate_type_config)
+    return ChatSession(project_id, session_id, db_path, debate_type_config, llm, history_backend)
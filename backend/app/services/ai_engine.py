@@ -1,65 +1,80 @@
 import os
-from tinydb import TinyDB, Query
+from tinydb import Query
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
-from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.chat_history import BaseChatMessageHistory, InMemoryChatMessageHistory
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from dotenv import load_dotenv
 
+from app.core.database import get_db
 from data.prompts.prompts import system_prompt_upct
 
 load_dotenv()
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError(
-        "OpenAI key not found")
+
+# "tinydb": historial persistente en db.json (sesiones de proyecto)
+# "memory": efímero, vive con la sesión (evaluaciones sin estado, quick-analyse)
+CHAT_HISTORY_BACKENDS = ("tinydb", "memory")
 
 
 class TinyDBChatMessageHistory(BaseChatMessageHistory):
     def __init__(self, session_id: str, project_id: str, db_path: str = "db.json"):
-        self.db = TinyDB(db_path)
+        # Instancia compartida: mismo lock de escritura que app.core.database
+        self.db = get_db(db_path)
         self.table = self.db.table("chat_history")
         self.session_id = session_id
         self.project_id = project_id
 
+    def _condition(self):
+        Record = Query()
+        return (Record.session_id == self.session_id) & (
+            Record.project_id == self.project_id)
+
     @property
     def messages(self):
-        Record = Query()
-        res = self.table.get((Record.session_id == self.session_id) & (
-            Record.project_id == self.project_id))
+        res = self.table.get(self._condition())
         if res:
             return messages_from_dict(res["messages"])
         return []
 
     def add_message(self, message: BaseMessage) -> None:
-        Record = Query()
-        existing = self.table.get((Record.session_id == self.session_id) & (
-            Record.project_id == self.project_id))
-
-        current_messages = self.messages
-        current_messages.append(message)
-        messages_dict = messages_to_dict(current_messages)
-
-        if existing:
-            self.table.update(
-                {"messages": messages_dict},
-                (Record.session_id == self.session_id) & (
-                    Record.project_id == self.project_id)
-            )
-        else:
-            self.table.insert({
-                "session_id": self.session_id,
-                "project_id": self.project_id,
-                "messages": messages_dict
-            })
+        self.add_messages([message])
+
+    def add_messages(self, messages) -> None:
+        # Una sola reescritura por turno (pregunta + respuesta), no una por mensaje
+        with self.db.storage.transaction():
+            current = self.table.get(self._condition())
+            if current:
+                self.table.update(
+                    {"messages": current["messages"] + messages_to_dict(list(messages))},
+                    doc_ids=[current.doc_id],
+                )
+            else:
+                self.table.insert({
+                    "session_id": self.session_id,
+                    "project_id": self.project_id,
+                    "messages": messages_to_dict(list(messages)),
+                })
 
     def clear(self) -> None:
-        Record = Query()
-        self.table.remove((Record.session_id == self.session_id)
-                          & (Record.project_id == self.project_id))
+        self.table.remove(self._condition())
+
+
+def create_chat_history(
+    backend: str, session_id: str, project_id: str, db_path: str = "db.json"
+) -> BaseChatMessageHistory:
+    if backend == "tinydb":
+        return TinyDBChatMessageHistory(session_id, project_id, db_path)
+    if backend == "memory":
+        return InMemoryChatMessageHistory()
+    raise ValueError(
+        f"unknown chat history backend '{backend}'. valid values: {list(CHAT_HISTORY_BACKENDS)}")
 
 
 def setup_chat(project_id: str):
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError(
+            "OpenAI key not found")
     llm = ChatOpenAI(model="gpt-5-2025-08-07", temperature=0)
     # llm = ChatOpenAI(model="gpt-5-mini-2025-08-07", temperature=0)
 
@@ -0,0 +1,387 @@
+"""
+Ejecución de análisis fuera de la capa HTTP.
+
+Los endpoints validan la petición, guardan el audio y construyen un trabajo
+serializable (dict). Estas funciones ejecutan ese trabajo, ya sea en el
+propio proceso API (modo inline) o en un worker que lo saca de la cola.
+El stack ML se importa dentro de cada función para que importar este
+módulo siga siendo barato.
+"""
+
+import os
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.core.database import (
+    create_analysis,
+    create_project_segment,
+    remove_audio_results,
+    remove_project_segment,
+    save_metrics,
+    save_transcription,
+    unit_of_work,
+)
+from app.core import blob_store, search_index
+from app.core.checkpoints import register_run
+from app.core.feature_store import record_segment_features
+from app.core.instrumentation import stage
+from app.services.stage_graph import Stage, StageGraph
+from data.debate_types import get_debate_type
+
+# "inline": el proceso API ejecuta el análisis; "queue": lo encola para los workers
+ANALYSIS_MODE = os.getenv("CICERON_ANALYSIS_MODE", "inline")
+
+KEY_METRICS_NAMES = [
+    "F0semitoneFrom27.5Hz_sma3nz_stddevNorm",
+    "loudness_sma3_amean",
+    "loudness_sma3_stddevNorm",
+    "loudnessPeaksPerSec",
+    "VoicedSegmentsPerSec",
+    "MeanUnvoicedSegmentLength",
+    "jitterLocal_sma3nz_amean",
+    "shimmerLocaldB_sma3nz_amean",
+]
+
+# Los enums viven en app.processors.pipeline, que arrastra LangChain/OpenAI:
+# aquí solo se guardan sus nombres y se resuelven al evaluar (import diferido).
+upct_phase_enum_by_id = {
+    "introduccion": "INTRO",
+    "refutacion_1": "REF1",
+    "refutacion_2": "REF2",
+    "conclusion": "CONCLUSION",
+    "final": "FINAL",
+}
+
+upct_postura_enum_by_value = {
+    "A Favor": "FAVOR",
+    "En Contra": "CONTRA",
+}
+
+chats = {}
+
+
+class AnalysisError(Exception):
+    """Fallo del análisis que debe llegar al cliente con su mensaje."""
+
+
+def build_metrics_summary(metrics: dict) -> dict:
+    summary = {}
+    for speaker, speaker_metrics in metrics.items():
+        summary[speaker] = {
+            metric_name: speaker_metrics.get(metric_name)
+            for metric_name in KEY_METRICS_NAMES
+            if metric_name in speaker_metrics
+        }
+    return summary
+
+
+def build_transcript_preview(transcription: list[dict], max_len: int = 280) -> str:
+    full_text = " ".join(seg.get("text", "") for seg in transcription).strip()
+    if len(full_text) <= max_len:
+        return full_text
+    return full_text[:max_len].rstrip() + "..."
+
+
+def _resolve_evaluation_args(debate_type_id: str, fase_cfg, postura_str: str) -> tuple:
+    if debate_type_id == "upct" and fase_cfg.id in upct_phase_enum_by_id:
+        from app.processors.pipeline import DebateFase, Postura
+
+        return (
+            DebateFase[upct_phase_enum_by_id[fase_cfg.id]],
+            Postura[upct_postura_enum_by_value[postura_str]],
+        )
+    return fase_cfg.id, postura_str
+
+
+def _score(resultado, escala_max: int) -> tuple[list[dict], int, int]:
+    criterios = []
+    total = 0
+    for criterio, nota in resultado.puntuaciones.items():
+        anotacion = resultado.anotaciones.get(criterio, "")
+        criterios.append({"criterio": criterio, "nota": nota, "anotacion": anotacion})
+        total += nota
+    max_total = len(resultado.puntuaciones) * escala_max
+    return criterios, total, max_total
+
+
+def _duration(transcription: list[dict]) -> float | None:
+    if not transcription:
+        return None
+    return transcription[-1]["end"] - transcription[0]["start"]
+
+
+def _transcription_stage(job: dict, outputs: dict, context: dict) -> dict:
+    from app.services.transcription import split_audio
+
+    data = split_audio(
+        job["file_path"], job["num_speakers"], engine_profile=job.get("engine_profile"))
+    # El buffer decodificado solo vive en memoria: al reanudar se decodifica de nuevo
+    context["audio"] = data.pop("audio", None)
+    return data
+
+
+def _metrics_stage(job: dict, outputs: dict, context: dict) -> dict:
+    from app.services.metrics import analyse_speakers
+
+    data = {**outputs["transcription"], "audio": context.get("audio")}
+    analysis_data = analyse_speakers(job["file_path"], data, prosody_mode=job.get("prosody_mode"))
+    return {"metrics": analysis_data["metrics"], "engine": analysis_data["engine"]}
+
+
+def _evaluation_stage(job: dict, outputs: dict, context: dict) -> dict:
+    from app.processors.pipeline import create_chat
+
+    debate_type_id = job["debate_type"]
+    debate_config = get_debate_type(debate_type_id)
+    fase_cfg = debate_config.get_fase_by_id(job["fase_id"])
+    project_code = job["project_code"]
+
+    if chats.get(project_code) is None:
+        chats[project_code] = create_chat(
+            project_code,
+            project_code,
+            debate_type_config=debate_config,
+        )
+    chat = chats[project_code]
+
+    transcription = outputs["transcription"]["transcript"]
+    fase_arg, postura_arg = _resolve_evaluation_args(
+        debate_type_id, fase_cfg, job["postura"])
+
+    resultado = chat.send_evaluation(
+        fase=fase_arg,
+        postura=postura_arg,
+        orador=job["orador"],
+        transcripcion=transcription,
+        metricas=outputs["metrics"]["metrics"],
+        duracion_segundos=_duration(transcription),
+    )
+
+    criterios, total, max_total = _score(resultado, debate_config.escala_max)
+    return {
+        "fase": resultado.fase,
+        "postura": resultado.postura,
+        "orador": resultado.orador,
+        "criterios": criterios,
+        "total": total,
+        "max_total": max_total,
+    }
+
+
+def _persistence_stage(job: dict, outputs: dict, context: dict) -> dict:
+    debate_type_id = job["debate_type"]
+    debate_config = get_debate_type(debate_type_id)
+    fase_cfg = debate_config.get_fase_by_id(job["fase_id"])
+    project_code = job["project_code"]
+    file_path = job["file_path"]
+
+    transcription = outputs["transcription"]["transcript"]
+    metrics = outputs["metrics"]["metrics"]
+    engine = outputs["metrics"]["engine"]
+    evaluation = outputs["evaluation"]
+    total = evaluation["total"]
+    max_total = evaluation["max_total"]
+    score_percent = round((total / max_total) * 100, 2) if max_total > 0 else 0.0
+
+    # Un segmento por ejecución: re-ejecutar reemplaza el mismo segment_id
+    segment_payload = {
+        "segment_id": job["run_id"],
+        "project_code": project_code,
+        "user_code": job["user_code"],
+        "debate_type": debate_type_id,
+        "fase_id": fase_cfg.id,
+        "fase_nombre": fase_cfg.nombre,
+        "postura": job["postura"],
+        "orador": job["orador"],
+        "num_speakers": job["num_speakers"],
+        "audio_sha256": job.get("audio_sha256"),
+        "duration_seconds": _duration(transcription),
+        "transcript": transcription,
+        "transcript_preview": build_transcript_preview(transcription),
+        "metrics_summary": build_metrics_summary(metrics),
+        "metrics_raw": metrics,
+        "pauses": outputs["transcription"].get("pauses", {}),
+        "engine": engine,
+        "analysis": {
+            "criterios": evaluation["criterios"],
+            "total": total,
+            "max_total": max_total,
+            "score_percent": score_percent,
+        },
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    # Resultados de audio, análisis legacy y segmento en una única escritura
+    # atómica de db.json: o se guarda todo o nada
+    with stage("persistence", step="commit"), unit_of_work():
+        previous = remove_project_segment(segment_payload["segment_id"])
+        if previous is not None:
+            segment_payload["created_at"] = previous["created_at"]
+            remove_audio_results(segment_payload["segment_id"])
+        save_transcription(file_path, transcription, "", segment_id=segment_payload["segment_id"])
+        save_metrics(file_path, metrics, segment_id=segment_payload["segment_id"])
+        analysis_saved = create_analysis(
+            {
+                "fase": evaluation["fase"],
+                "postura": evaluation["postura"],
+                "orador": evaluation["orador"],
+                "criterios": evaluation["criterios"],
+                "total": total,
+                "max_total": max_total,
+                "project_code": project_code,
+                "debate_type": debate_type_id,
+                "segment_id": segment_payload["segment_id"],
+            }
+        )
+        if not analysis_saved:
+            raise AnalysisError("error while saving legacy analysis")
+        segment_saved = create_project_segment(segment_payload)
+        if not segment_saved:
+            raise AnalysisError("error while saving project segment")
+
+    # El almacén de features es derivado (se puede reconstruir con
+    # `cli.py features backfill`): un fallo aquí no invalida el análisis
+    try:
+        with stage("persistence", step="features"):
+            record_segment_features(segment_payload)
+    except Exception as exc:
+        print(f"error while recording segment features: {exc}")
+
+    # Igual con el índice de búsqueda (`cli.py search reindex`)
+    try:
+        with stage("persistence", step="search_index"):
+            search_index.index_segment(segment_payload)
+    except Exception as exc:
+        print(f"error while indexing segment: {exc}")
+
+    # El audio queda referenciado por la intervención (retención y re-análisis
+    # con audio_id); las de la fase final se conservan con AUDIO_KEEP_FINALS
+    if job.get("audio_sha256"):
+        try:
+            blob_store.acquire(
+                job["audio_sha256"],
+                f"segment:{segment_payload['segment_id']}",
+                project_code,
+                final=fase_cfg.id == debate_config.final_phase_id,
+            )
+        except Exception as exc:
+            print(f"error while referencing segment audio: {exc}")
+
+    return {
+        "message": "analysis succeeded!",
+        "run_id": job["run_id"],
+        "fase": fase_cfg.nombre,
+        "fase_id": fase_cfg.id,
+        "postura": evaluation["postura"],
+        "orador": evaluation["orador"],
+        "criterios": evaluation["criterios"],
+        "total": total,
+        "max_total": max_total,
+        "score_percent": score_percent,
+        "debate_type": debate_type_id,
+        "engine": engine,
+    }
+
+
+# transcription (Whisper + diarización) -> metrics -> evaluation (LLM) -> persistence
+PROJECT_ANALYSIS_GRAPH = StageGraph([
+    Stage("transcription", _transcription_stage),
+    Stage("metrics", _metrics_stage, depends_on=("transcription",)),
+    Stage("evaluation", _evaluation_stage, depends_on=("transcription", "metrics")),
+    Stage("persistence", _persistence_stage, depends_on=("evaluation",)),
+])
+
+
+def run_project_analysis(job: dict) -> dict:
+    """
+    Ejecuta el análisis completo de un audio de proyecto y lo persiste.
+
+    Cada etapa guarda su salida bajo `run_id`: si el proceso muere, el
+    trabajo reclamado de nuevo reanuda desde la última etapa completada, y
+    `rerun` vuelve a ejecutar las etapas indicadas (y las que dependen de ellas).
+
+    Args:
+        job: Dict con file_path, project_code, user_code, debate_type, fase_id,
+            postura, orador, num_speakers, engine_profile, prosody_mode y,
+            opcionalmente, run_id y rerun
+
+    Returns:
+        Respuesta del endpoint /analyse
+    """
+    # Trabajos encolados sin run_id (versiones anteriores): ejecución nueva
+    job = {**job, "run_id": job.get("run_id") or str(uuid4())}
+    register_run(job["run_id"], "analyse", {key: value for key, value in job.items() if key != "rerun"})
+    outputs = PROJECT_ANALYSIS_GRAPH.execute(job["run_id"], job, rerun=job.get("rerun") or ())
+    return outputs["persistence"]
+
+
+def run_quick_analysis(job: dict) -> dict:
+    """
+    Ejecuta un análisis rápido sin proyecto (no persiste resultados).
+
+    Args:
+        job: Dict con file_path, debate_type, fase_id, postura, orador,
+            num_speakers, engine_profile y prosody_mode
+
+    Returns:
+        Respuesta del endpoint /quick-analyse
+    """
+    from app.processors.pipeline import create_chat
+    from app.services.metrics import process_complete_analysis
+
+    debate_type_id = job["debate_type"]
+    debate_config = get_debate_type(debate_type_id)
+    fase_cfg = debate_config.get_fase_by_id(job["fase_id"])
+    postura_str = job["postura"]
+
+    # Historial en memoria: la evaluación rápida no se persiste en db.json
+    temp_session_id = f"quick_{uuid4().hex}"
+    chat = create_chat(
+        temp_session_id, temp_session_id, debate_type_config=debate_config, history_backend="memory")
+
+    # batched=True: varias peticiones rápidas concurrentes comparten lote de Whisper
+    analysis_data = process_complete_analysis(
+        job["file_path"],
+        num_speakers=job["num_speakers"],
+        batched=True,
+        engine_profile=job.get("engine_profile"),
+        prosody_mode=job.get("prosody_mode"),
+    )
+    transcription = analysis_data["transcript"]
+    metrics = analysis_data["metrics"]
+
+    duracion = None
+    if transcription:
+        duracion = transcription[-1]["end"] - transcription[0]["start"]
+
+    fase_arg, postura_arg = _resolve_evaluation_args(
+        debate_type_id, fase_cfg, postura_str)
+
+    resultado = chat.send_evaluation(
+        fase=fase_arg,
+        postura=postura_arg,
+        orador=job["orador"],
+        transcripcion=transcription,
+        metricas=metrics,
+        duracion_segundos=duracion,
+    )
+
+    criterios, total, max_total = _score(resultado, debate_config.escala_max)
+
+    return {
+        "message": "quick analysis succeeded!",
+        "fase": fase_cfg.nombre,
+        "fase_id": fase_cfg.id,
+        "postura": resultado.postura,
+        "orador": resultado.orador,
+        "criterios": criterios,
+        "total": total,
+        "max_total": max_total,
+        "debate_type": debate_type_id,
+        "engine": analysis_data["engine"],
+    }
+
+
+JOB_RUNNERS = {
+    "analyse": run_project_analysis,
+    "quick_analyse": run_quick_analysis,
+}
@@ -0,0 +1,114 @@
+"""
+Worker de análisis: consume la cola de trabajos y ejecuta el stack ML.
+
+Cada proceso worker carga Whisper/pyannote/openSMILE una sola vez y atiende
+`concurrency` trabajos a la vez con un pool de hilos (los análisis rápidos
+concurrentes comparten lote de Whisper). SIGTERM/SIGINT detienen la
+reclamación de trabajos nuevos y esperan a que terminen los que están en curso.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.blob_store import release_job_audio
+from app.core.job_queue import claim_job, complete_job, fail_job
+from app.services.analysis import JOB_RUNNERS, AnalysisError
+
+WORKER_CONCURRENCY = int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "1"))
+WORKER_POLL_SECONDS = float(os.getenv("ANALYSIS_WORKER_POLL_SECONDS", "1.0"))
+
+logger = logging.getLogger("ciceron.worker")
+
+
+def _release_audio(job: dict) -> None:
+    release_job_audio(job["payload"])
+
+
+def process_job(job: dict) -> None:
+    """Ejecuta un trabajo reclamado y registra su resultado en la cola."""
+    from app.services.batching import SchedulerOverloaded
+
+    runner = JOB_RUNNERS.get(job["kind"])
+    if runner is None:
+        fail_job(job["job_id"], {"status_code": 500, "detail": f"unknown job kind '{job['kind']}'"})
+        _release_audio(job)
+        return
+
+    try:
+        result = runner(job["payload"])
+    except SchedulerOverloaded as exc:
+        # Saturación transitoria: vuelve a la cola mientras queden intentos;
+        # el audio solo se conserva si se va a reintentar
+        requeued = fail_job(
+            job["job_id"],
+            {"status_code": 503, "detail": f"transcription queue is busy: {exc}"},
+            retry=True,
+        )
+        if not requeued:
+            _release_audio(job)
+        return
+    except AnalysisError as exc:
+        fail_job(job["job_id"], {"status_code": 500, "detail": str(exc)})
+    except Exception as exc:
+        logger.exception("job %s failed", job["job_id"])
+        fail_job(job["job_id"], {"status_code": 500, "detail": f"error while analysing {exc}"})
+    else:
+        complete_job(job["job_id"], result)
+    _release_audio(job)
+
+
+def _worker_loop(worker_id: str, stop_event: threading.Event, kinds: list[str] | None) -> None:
+    while not stop_event.is_set():
+        try:
+            job = claim_job(worker_id, kinds=kinds)
+        except Exception:
+            logger.exception("could not claim a job")
+            job = None
+        if job is None:
+            stop_event.wait(WORKER_POLL_SECONDS)
+            continue
+        logger.info("job %s (%s) claimed by %s", job["job_id"], job["kind"], worker_id)
+        try:
+            process_job(job)
+        except Exception:
+            # p. ej. la cola no está disponible: el lease caducará y se reintentará
+            logger.exception("could not record the outcome of job %s", job["job_id"])
+
+
+def run_worker(
+    concurrency: int = WORKER_CONCURRENCY,
+    kinds: list[str] | None = None,
+    stop_event: threading.Event | None = None,
+) -> None:
+    """
+    Arranca el worker y bloquea hasta recibir SIGTERM/SIGINT (o `stop_event`).
+
+    Args:
+        concurrency: Trabajos simultáneos en este proceso
+        kinds: Tipos de trabajo a atender (None = todos)
+        stop_event: Evento para detener el worker desde fuera (tests, embebido)
+    """
+    stop_event = stop_event or threading.Event()
+
+    def _handle_signal(signum, frame):
+        logger.info("signal %s received, finishing running jobs", signum)
+        stop_event.set()
+
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _handle_signal)
+        signal.signal(signal.SIGINT, _handle_signal)
+
+    # Carga los modelos antes de reclamar nada: el primer trabajo no paga el arranque
+    import app.processors.pipeline  # noqa: F401
+    import app.services.metrics  # noqa: F401
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("analysis worker %s started with concurrency %d", base_id, concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="analysis") as pool:
+        for idx in range(concurrency):
+            pool.submit(_worker_loop, f"{base_id}:{idx}", stop_event, kinds)
+    logger.info("analysis worker %s stopped", base_id)
@@ -0,0 +1,248 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+
+import numpy as np
+from faster_whisper import BatchedInferencePipeline
+
+from app.services.vad import SAMPLING_RATE, concat_speech
+
+
+# Ventana de agrupación y límites del planificador (configurables por entorno)
+BATCH_WINDOW_MS = int(os.getenv("WHISPER_BATCH_WINDOW_MS", "50"))
+BATCH_MAX_FILES = int(os.getenv("WHISPER_BATCH_MAX_FILES", "8"))
+BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+BATCH_MAX_PENDING = int(os.getenv("WHISPER_BATCH_MAX_PENDING", "32"))
+BATCH_SLO_SECONDS = float(os.getenv("WHISPER_BATCH_SLO_SECONDS", "30"))
+BATCH_LANGUAGE = os.getenv("WHISPER_BATCH_LANGUAGE", "es")
+
+# Whisper trabaja con ventanas de 30 s: ningún clip puede superarlas
+MAX_CLIP_SECONDS = 30.0
+
+TranscriptSegment = namedtuple("TranscriptSegment", ["start", "end", "text"])
+
+
+class SchedulerOverloaded(Exception):
+    """La cola de transcripción no puede admitir la petición dentro de su SLO."""
+
+
+@dataclass
+class _BatchRequest:
+    audio: np.ndarray
+    speech_regions: list[dict]
+    deadline: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Future = field(default_factory=Future)
+
+
+def _split_long_regions(regions: list[dict]) -> list[dict]:
+    clips = []
+    for region in regions:
+        start = region["start"]
+        while region["end"] - start > MAX_CLIP_SECONDS:
+            clips.append({"start": start, "end": start + MAX_CLIP_SECONDS})
+            start += MAX_CLIP_SECONDS
+        if region["end"] > start:
+            clips.append({"start": start, "end": region["end"]})
+    return clips
+
+
+def _pack_windows(clips: list[dict]) -> list[list[dict]]:
+    """Agrupa los clips consecutivos de una petición en ventanas de hasta MAX_CLIP_SECONDS."""
+    windows = []
+    current = []
+    duration = 0.0
+    for clip in clips:
+        length = clip["end"] - clip["start"]
+        if current and duration + length > MAX_CLIP_SECONDS:
+            windows.append(current)
+            current = []
+            duration = 0.0
+        current.append(clip)
+        duration += length
+    if current:
+        windows.append(current)
+    return windows
+
+
+class WhisperBatchScheduler:
+    """
+    Micro-batching delante del modelo Whisper.
+
+    Las peticiones que llegan dentro de una ventana corta se agrupan en una
+    sola llamada al pipeline por lotes de faster-whisper. La admisión se
+    rechaza (backpressure) cuando la cola está llena o cuando la espera
+    estimada ya no cabe en el SLO de la petición; una petición que agota su
+    SLO esperando se cancela (si aún está en cola) y falla con
+    SchedulerOverloaded.
+    """
+
+    def __init__(
+        self,
+        model,
+        window_ms: int = BATCH_WINDOW_MS,
+        max_batch_files: int = BATCH_MAX_FILES,
+        batch_size: int = BATCH_SIZE,
+        max_pending: int = BATCH_MAX_PENDING,
+        slo_seconds: float = BATCH_SLO_SECONDS,
+        language: str | None = BATCH_LANGUAGE,
+        beam_size: int = 1,
+    ):
+        self._pipeline = BatchedInferencePipeline(model=model)
+        self.window_seconds = window_ms / 1000
+        self.max_batch_files = max_batch_files
+        self.batch_size = batch_size
+        self.slo_seconds = slo_seconds
+        self.language = language or None
+        self.beam_size = beam_size
+        self._queue: queue.Queue[_BatchRequest] = queue.Queue(maxsize=max_pending)
+        # media móvil del tiempo por lote, para estimar la espera en cola
+        self._batch_seconds = 1.0
+        self._thread = threading.Thread(
+            target=self._run, name="whisper-batcher", daemon=True)
+        self._thread.start()
+
+    def estimated_wait(self) -> float:
+        pending_batches = self._queue.qsize() // self.max_batch_files + 1
+        return pending_batches * self._batch_seconds
+
+    def submit(self, audio: np.ndarray, speech_regions: list[dict], slo_seconds: float | None = None) -> Future:
+        slo = slo_seconds if slo_seconds is not None else self.slo_seconds
+        if self.estimated_wait() > slo:
+            raise SchedulerOverloaded("estimated transcription wait exceeds slo")
+
+        request = _BatchRequest(
+            audio=audio,
+            speech_regions=speech_regions,
+            deadline=time.monotonic() + slo,
+        )
+        try:
+            self._queue.put_nowait(request)
+        except queue.Full as exc:
+            raise SchedulerOverloaded("transcription queue is full") from exc
+        return request.future
+
+    def transcribe(self, audio: np.ndarray, speech_regions: list[dict], slo_seconds: float | None = None) -> list[TranscriptSegment]:
+        if not speech_regions:
+            return []
+        slo = slo_seconds if slo_seconds is not None else self.slo_seconds
+        future = self.submit(audio, speech_regions, slo)
+        try:
+            return future.result(timeout=slo)
+        except FutureTimeoutError as exc:
+            # Si sigue en cola no llega a procesarse; si ya está en curso su
+            # resultado se descarta
+            future.cancel()
+            raise SchedulerOverloaded("transcription did not finish within slo") from exc
+
+    def _collect_batch(self) -> list[_BatchRequest]:
+        first = self._queue.get()
+        batch = [first]
+        # Se cierra el lote al acabar la ventana, al llenarse, o antes si la
+        # petición más antigua no llegaría a tiempo esperando más.
+        flush_at = min(
+            first.enqueued_at + self.window_seconds,
+            first.deadline - self._batch_seconds,
+        )
+        while len(batch) < self.max_batch_files:
+            remaining = flush_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _live_requests(self, batch: list[_BatchRequest]) -> list[_BatchRequest]:
+        live = []
+        now = time.monotonic()
+        for request in batch:
+            # Cancelada por quien esperaba (agotó su SLO)
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            if request.deadline <= now:
+                request.future.set_exception(
+                    SchedulerOverloaded("transcription slo expired while queued"))
+                continue
+            live.append(request)
+        return live
+
+    def _run(self):
+        while True:
+            batch = self._live_requests(self._collect_batch())
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                results = self._process(batch)
+            except Exception as exc:
+                for request in batch:
+                    request.future.set_exception(exc)
+            else:
+                for request, segments in zip(batch, results):
+                    request.future.set_result(segments)
+            elapsed = time.monotonic() - started
+            self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * elapsed
+            print(
+                f"whisper batch of {len(batch)} files processed in {elapsed:.2f} seconds")
+
+    def _process(self, batch: list[_BatchRequest]) -> list[list[TranscriptSegment]]:
+        # Cada petición ocupa ventanas propias: sus clips se agrupan en
+        # ventanas de hasta MAX_CLIP_SECONDS y cada ventana se coloca en el
+        # buffer rellena de silencio hasta MAX_CLIP_SECONDS exactos. Al
+        # pipeline se le pasa un clip por ventana y, como cada clip ya mide una
+        # ventana entera, nunca se fusiona con el siguiente: ninguna ventana
+        # mezcla dos ficheros. Whisper rellena toda ventana hasta 30 s, así
+        # que el relleno no añade cómputo; los lotes siguen mezclando
+        # ventanas de varias peticiones.
+        window_samples = int(MAX_CLIP_SECONDS * SAMPLING_RATE)
+        buffers = []
+        clips = []
+        owners = []
+        for idx, request in enumerate(batch):
+            for window in _pack_windows(_split_long_regions(request.speech_regions)):
+                speech_audio, offsets = concat_speech(request.audio, window)
+                if not len(speech_audio):
+                    continue
+                window_start = len(buffers) * MAX_CLIP_SECONDS
+                buffer = np.zeros(window_samples, dtype=np.float32)
+                speech_audio = speech_audio[:window_samples]
+                buffer[:len(speech_audio)] = speech_audio
+                buffers.append(buffer)
+                clips.append({"start": window_start, "end": window_start + MAX_CLIP_SECONDS})
+                for concat_start, orig_start, orig_end in offsets:
+                    start = window_start + concat_start
+                    owners.append((start, start + orig_end - orig_start, orig_start, idx))
+
+        results = [[] for _ in batch]
+        if not clips:
+            return results
+
+        segments, _ = self._pipeline.transcribe(
+            np.concatenate(buffers),
+            language=self.language,
+            beam_size=self.beam_size,
+            temperature=0.0,
+            vad_filter=False,
+            clip_timestamps=clips,
+            batch_size=self.batch_size,
+            compression_ratio_threshold=3.5,
+            log_prob_threshold=1.0,
+            no_speech_threshold=0.7,
+        )
+        for seg in segments:
+            for clip_start, clip_end, orig_start, idx in owners:
+                if clip_start <= seg.start < clip_end:
+                    results[idx].append(TranscriptSegment(
+                        start=orig_start + (seg.start - clip_start),
+                        end=orig_start + (min(seg.end, clip_end) - clip_start),
+                        text=seg.text,
+                    ))
+                    break
+        return results
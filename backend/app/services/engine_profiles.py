@@ -0,0 +1,91 @@
+"""
+Perfiles del motor de transcripción.
+
+Cada perfil fija el modelo de Whisper y sus parámetros de decodificación.
+Los entrenamientos priorizan velocidad ("fast") y las finales precisión
+("accurate"); "balanced" mantiene la configuración histórica.
+"""
+
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class EngineProfile:
+    """Configuración de Whisper asociada a un nombre de perfil."""
+    name: str
+    model_size: str
+    device: str = "cpu"
+    compute_type: str = "int8"
+    beam_size: int = 1
+    condition_on_previous_text: bool = True
+
+
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+
+ENGINE_PROFILES: dict[str, EngineProfile] = {
+    "fast": EngineProfile(
+        name="fast",
+        model_size="base",
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        beam_size=1,
+        condition_on_previous_text=False,
+    ),
+    "balanced": EngineProfile(
+        name="balanced",
+        model_size="small",
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        beam_size=1,
+    ),
+    "accurate": EngineProfile(
+        name="accurate",
+        model_size="medium",
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        beam_size=5,
+    ),
+}
+
+DEFAULT_ENGINE_PROFILE = os.getenv("WHISPER_PROFILE", "balanced")
+# Se valida al arrancar (endpoints importa este módulo) y no en el primer
+# análisis, cuando transcription.py carga el modelo por defecto
+if DEFAULT_ENGINE_PROFILE not in ENGINE_PROFILES:
+    print(
+        f"warning: WHISPER_PROFILE '{DEFAULT_ENGINE_PROFILE}' is not a valid profile "
+        f"({', '.join(ENGINE_PROFILES)}), falling back to 'balanced'"
+    )
+    DEFAULT_ENGINE_PROFILE = "balanced"
+
+
+def get_engine_profile(profile_name: str | None = None) -> EngineProfile:
+    """
+    Obtiene un perfil por nombre (None = perfil por defecto).
+
+    Raises:
+        ValueError si el perfil no existe
+    """
+    profile = ENGINE_PROFILES.get(profile_name or DEFAULT_ENGINE_PROFILE)
+    if profile is None:
+        available = ", ".join(ENGINE_PROFILES.keys())
+        raise ValueError(
+            f"Perfil de transcripción '{profile_name}' no encontrado. "
+            f"Perfiles disponibles: {available}"
+        )
+    return profile
+
+
+def list_engine_profiles() -> list[dict]:
+    """Lista los perfiles disponibles con su configuración."""
+    return [
+        {
+            "name": p.name,
+            "model_size": p.model_size,
+            "compute_type": p.compute_type,
+            "beam_size": p.beam_size,
+            "default": p.name == DEFAULT_ENGINE_PROFILE,
+        }
+        for p in ENGINE_PROFILES.values()
+    ]
@@ -0,0 +1,148 @@
+"""
+Exportación de los datos de análisis de uno o varios proyectos.
+
+Los registros (un segmento con su transcripción, métricas y criterios) se
+generan de uno en uno y se serializan como NDJSON o, con pyarrow instalado,
+como Parquet por lotes, así que la memoria no crece con el tamaño de la
+exportación. Cada registro lleva un `cursor` opaco: pasando el último
+recibido se reanuda la exportación justo después de él.
+"""
+
+import base64
+import json
+from typing import Iterable, Iterator
+
+from app.core.database import iter_project_segments
+
+EXPORT_FORMATS = ("ndjson", "parquet")
+PARQUET_BATCH_SIZE = 500
+
+# Columnas escalares del Parquet; las estructuras anidadas van como JSON
+_PARQUET_SCALARS = (
+    "cursor",
+    "segment_id",
+    "project_code",
+    "user_code",
+    "debate_type",
+    "fase_id",
+    "fase_nombre",
+    "postura",
+    "orador",
+    "num_speakers",
+    "duration_seconds",
+    "created_at",
+)
+_PARQUET_JSON = ("transcript", "metrics_raw", "metrics_summary", "analysis", "pauses", "engine")
+
+
+class ExportError(Exception):
+    """Parámetros de exportación no válidos (cursor, formato...)."""
+
+
+def encode_cursor(segment: dict) -> str:
+    key = [segment.get("project_code", ""), segment.get("created_at", ""), segment.get("segment_id", "")]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, project_codes: Iterable[str] | None = None) -> tuple[str, str, str]:
+    """
+    Args:
+        project_codes: Si se indica, el cursor debe ser de uno de estos
+            proyectos (uno ajeno saltaría o repetiría registros sin avisar)
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        project_code, created_at, segment_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as exc:
+        raise ExportError("invalid export cursor") from exc
+    if project_codes is not None and project_code not in set(project_codes):
+        raise ExportError("export cursor does not belong to the requested projects")
+    return project_code, created_at, segment_id
+
+
+def iter_export_records(project_codes: Iterable[str], cursor: str | None = None) -> Iterator[dict]:
+    """
+    Registros de exportación de los proyectos, ordenados por proyecto y fecha.
+
+    Solo un proyecto se tiene en memoria a la vez. El cursor se valida al
+    llamar (ExportError), no al empezar a iterar.
+    """
+    project_codes = sorted(project_codes)
+    after = decode_cursor(cursor, project_codes) if cursor else None
+    return _iter_export_records(project_codes, after)
+
+
+def _iter_export_records(project_codes: list[str], after: tuple[str, str, str] | None) -> Iterator[dict]:
+    for project_code in project_codes:
+        segment_after = None
+        if after is not None:
+            if project_code < after[0]:
+                continue
+            if project_code == after[0]:
+                segment_after = (after[1], after[2])
+        for segment in iter_project_segments(project_code, after=segment_after):
+            record = dict(segment)
+            record["cursor"] = encode_cursor(segment)
+            yield record
+
+
+def iter_ndjson(records: Iterable[dict]) -> Iterator[bytes]:
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    fields = [pa.field(name, pa.string()) for name in _PARQUET_SCALARS]
+    fields[_PARQUET_SCALARS.index("num_speakers")] = pa.field("num_speakers", pa.int64())
+    fields[_PARQUET_SCALARS.index("duration_seconds")] = pa.field("duration_seconds", pa.float64())
+    fields += [pa.field(name, pa.string()) for name in _PARQUET_JSON]
+    return pa.schema(fields)
+
+
+def write_parquet(records: Iterable[dict], output, batch_size: int = PARQUET_BATCH_SIZE) -> int:
+    """
+    Escribe los registros en Parquet, un row group por lote.
+
+    Args:
+        output: Ruta o fichero binario de destino
+
+    Returns:
+        Número de registros escritos
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    written = 0
+    batch: list[dict] = []
+
+    def _flush(writer):
+        columns = {name: [row.get(name) for row in batch] for name in _PARQUET_SCALARS}
+        for name in _PARQUET_JSON:
+            columns[name] = [
+                json.dumps(row[name], ensure_ascii=False, default=str) if name in row else None
+                for row in batch
+            ]
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        batch.clear()
+
+    with pq.ParquetWriter(output, schema) as writer:
+        for record in records:
+            batch.append(record)
+            written += 1
+            if len(batch) >= batch_size:
+                _flush(writer)
+        if batch:
+            _flush(writer)
+    return written
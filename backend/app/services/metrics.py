@@ -1,54 +1,127 @@
 import opensmile
-import pandas as pd
 from pydub import AudioSegment
 import os
+from uuid import uuid4
+from app.core.instrumentation import stage
+from app.services.prosody import extract_key_metrics, get_prosody_mode
 from app.services.transcription import split_audio
+from app.services.vad import SAMPLING_RATE, concat_speech, load_audio
 
 
-def get_audio_metrics(audio_path: str):
-    print(f"extracting metrics from: {audio_path}")
-    smile = opensmile.Smile(
+def _create_smile():
+    return opensmile.Smile(
         # estos se pueden cambiar para conseguir otras características
         feature_set=opensmile.FeatureSet.eGeMAPSv02,
         feature_level=opensmile.FeatureLevel.Functionals
     )
 
-    y = smile.process_file(audio_path)
+
+def get_audio_metrics(audio_path: str):
+    print(f"extracting metrics from: {audio_path}")
+    y = _create_smile().process_file(audio_path)
     metrics = y.to_dict(orient='records')[0]
     print(f"metrics extracted successfully, {len(metrics)} features found")
 
     return metrics
 
 
-def process_complete_analysis(audio_path: str, num_speakers: int):
+def _bucket_decoded_audio(audio, diarization_raw: list[dict]) -> dict:
+    """Concatena, por hablante, sus turnos del buffer ya decodificado."""
+    turns_by_speaker = {}
+    for seg in diarization_raw:
+        turns_by_speaker.setdefault(seg["speaker"], []).append(seg)
+    buckets = {}
+    for spk, turns in turns_by_speaker.items():
+        signal, _ = concat_speech(audio, turns)
+        if len(signal):
+            buckets[spk] = signal
+    return buckets
+
+
+def process_complete_analysis(
+    audio_path: str,
+    num_speakers: int,
+    batched: bool = False,
+    engine_profile: str | None = None,
+    prosody_mode: str | None = None,
+):
     print(f"starting complete analysis for: {audio_path}")
-    data = split_audio(audio_path, num_speakers)
+    data = split_audio(audio_path, num_speakers, batched=batched,
+                       engine_profile=engine_profile)
+    return analyse_speakers(audio_path, data, prosody_mode=prosody_mode)
+
+
+def analyse_speakers(audio_path: str, data: dict, prosody_mode: str | None = None):
+    """
+    Métricas de prosodia por hablante a partir de la salida de split_audio.
+
+    `data["audio"]` (el buffer decodificado) es opcional: al reanudar desde un
+    checkpoint no está y, si hace falta, se vuelve a decodificar el fichero.
+    """
+    prosody_mode = get_prosody_mode(prosody_mode)
     transcript = data["transcript"]
+    # Los turnos de diarización ya vienen restringidos a las regiones de voz
+    # del VAD compartido, así que openSMILE no procesa los silencios
     diarization_raw = data["diarization_raw"]
+    engine = {**data["engine"], "prosody_mode": prosody_mode}
     print(f"transcript retrieved with {len(transcript)} segments")
     print(f"diarization retrieved with {len(diarization_raw)} segments")
 
-    full_audio = AudioSegment.from_file(audio_path)
-    print(f"audio file loaded, duration: {len(full_audio) / 1000:.2f} seconds")
-
-    # Preparamos contenedores para los audios de cada speaker
-    # Usamos un dict para que funcione con cualquier nombre que asigne Pyannote
-    speaker_audio_buckets = {}
-    print("processing diarization segments...")
-
-    for seg in diarization_raw:
-        spk = seg["speaker"]
-        if spk not in speaker_audio_buckets:
-            speaker_audio_buckets[spk] = AudioSegment.empty()
-            print(f"new speaker detected: {spk}")
-
-        # Extraemos el trozo (convertimos segundos a milisegundos)
-        start_ms = seg["start"] * 1000
-        end_ms = seg["end"] * 1000
-        chunk = full_audio[start_ms:end_ms]
-
-        # Lo pegamos al audio total de esa persona
-        speaker_audio_buckets[spk] += chunk
+    if prosody_mode == "key":
+        # Camino rápido: los turnos se cortan del buffer ya decodificado
+        # (16 kHz mono), sin releer el fichero con pydub ni escribir WAV
+        # temporales. eGeMAPS (modo full) no pasa por aquí: sus features
+        # espectrales y de sonoridad dependen del ancho de banda, y todos los
+        # segmentos (con uno o varios hablantes) deben medirse a la frecuencia
+        # original del fichero para ser comparables en el almacén de features.
+        audio = data.get("audio")
+        if audio is None:
+            with stage("decode"):
+                audio = load_audio(audio_path)
+        with stage("bucketing") as bucketing_span:
+            speaker_signals = _bucket_decoded_audio(audio, diarization_raw)
+            bucketing_span["audio_seconds"] = len(audio) / SAMPLING_RATE
+
+        speaker_metrics = {}
+        for spk, signal in speaker_signals.items():
+            audio_duration = len(signal) / SAMPLING_RATE
+            with stage("prosody", audio_seconds=audio_duration, speaker=spk):
+                speaker_metrics[spk] = extract_key_metrics(signal)
+        return {
+            "metadata": {
+                "file": audio_path,
+                "speakers_detected": list(speaker_metrics.keys())
+            },
+            "transcript": transcript,
+            "metrics": speaker_metrics,
+            "pauses": data["pauses"],
+            "engine": engine
+        }
+
+    # Con un solo hablante los turnos son las regiones del VAD (SPEAKER_00)
+    with stage("bucketing") as bucketing_span:
+        full_audio = AudioSegment.from_file(audio_path)
+        print(f"audio file loaded, duration: {len(full_audio) / 1000:.2f} seconds")
+
+        # Preparamos contenedores para los audios de cada speaker
+        # Usamos un dict para que funcione con cualquier nombre que asigne Pyannote
+        speaker_audio_buckets = {}
+        print("processing diarization segments...")
+
+        for seg in diarization_raw:
+            spk = seg["speaker"]
+            if spk not in speaker_audio_buckets:
+                speaker_audio_buckets[spk] = AudioSegment.empty()
+                print(f"new speaker detected: {spk}")
+
+            # Extraemos el trozo (convertimos segundos a milisegundos)
+            start_ms = seg["start"] * 1000
+            end_ms = seg["end"] * 1000
+            chunk = full_audio[start_ms:end_ms]
+
+            # Lo pegamos al audio total de esa persona
+            speaker_audio_buckets[spk] += chunk
+        bucketing_span["audio_seconds"] = len(full_audio) / 1000
 
     print(
         f"all segments processed, total speakers: {len(speaker_audio_buckets)}")
@@ -58,7 +131,8 @@ def process_complete_analysis(audio_path: str, num_speakers: int):
     print("extracting metrics for each speaker...")
     for spk, combined_audio in speaker_audio_buckets.items():
         # Guardamos un archivo temporal para que openSMILE pueda leerlo
-        temp_filename = f"temp_{spk}.wav"
+        # nombre único: con análisis concurrentes los speakers se repiten
+        temp_filename = f"temp_{uuid4().hex}_{spk}.wav"
         audio_duration = len(combined_audio) / 1000
         print(
             f"processing speaker {spk}, audio duration: {audio_duration:.2f} seconds")
@@ -66,7 +140,8 @@ def process_complete_analysis(audio_path: str, num_speakers: int):
         print(f"temporary file created: {temp_filename}")
 
         # Llamamos a tu función de métricas
-        speaker_metrics[spk] = get_audio_metrics(temp_filename)
+        with stage("opensmile", audio_seconds=audio_duration, speaker=spk):
+            speaker_metrics[spk] = get_audio_metrics(temp_filename)
 
         # Limpiamos el archivo temporal (opcional, pero recomendado)
         if os.path.exists(temp_filename):
@@ -79,7 +154,9 @@ def process_complete_analysis(audio_path: str, num_speakers: int):
             "speakers_detected": list(speaker_audio_buckets.keys())
         },
         "transcript": transcript,      # La lista de frases con speaker y tiempo
-        "metrics": speaker_metrics      # Métricas de openSMILE por speaker
+        "metrics": speaker_metrics,     # Métricas de openSMILE por speaker
+        "pauses": data["pauses"],       # Estadísticas de pausas del VAD compartido
+        "engine": engine                # Perfil de Whisper, su RTF y el modo de prosodia
     }
     print(
         f"analysis completed successfully for {len(speaker_audio_buckets)} speakers")
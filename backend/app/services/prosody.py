@@ -0,0 +1,382 @@
+"""
+Extracción de métricas prosódicas por hablante.
+
+Dos modos:
+
+- "full": los 88 funcionales de eGeMAPSv02 con openSMILE (por defecto).
+- "key": las métricas de KEY_METRICS que se pueden reproducir con numpy
+  sobre el buffer ya decodificado, siguiendo la configuración de eGeMAPSv02
+  (tramas, ponderación auditiva, umbrales de picos y de periodos) y
+  calibradas contra openSMILE con `benchmarks/prosody_validation.py` sobre
+  data/test (resultados en benchmarks/prosody_validation.json).
+
+El jitter no se incluye en el modo "key": sin el detector de pitch SHS con
+suavizado de Viterbi de openSMILE, la estimación periodo a periodo no sigue
+los valores de eGeMAPS, y el prompt lo muestra como N/A antes que un valor
+engañoso.
+
+Ambos modos devuelven un dict {nombre de feature: valor} con los nombres de
+eGeMAPS, así que el resto del pipeline no distingue el origen.
+"""
+
+import os
+
+import numpy as np
+
+from app.services.vad import SAMPLING_RATE
+
+PROSODY_MODES = ("full", "key")
+DEFAULT_PROSODY_MODE = os.getenv("PROSODY_MODE", "full")
+
+KEY_METRIC_NAMES = (
+    "F0semitoneFrom27.5Hz_sma3nz_stddevNorm",
+    "loudness_sma3_amean",
+    "loudness_sma3_stddevNorm",
+    "loudnessPeaksPerSec",
+    "VoicedSegmentsPerSec",
+    "MeanUnvoicedSegmentLength",
+    "shimmerLocaldB_sma3nz_amean",
+)
+
+# Tramas como en eGeMAPSv02: 10 ms de salto y 20 ms (Hamming) para la
+# sonoridad; el pitch usa una ventana más larga (>= 2 periodos)
+HOP_SECONDS = 0.010
+LOUDNESS_FRAME_SECONDS = 0.020
+PITCH_FRAME_SECONDS = 0.040
+F0_MIN_HZ = 55.0
+F0_MAX_HZ = 600.0
+# Decisión sonora: pico de autocorrelación normalizada y energía RMS mínima
+# (eGeMAPS descarta el F0 de tramas con RMS < 0.001)
+VOICING_THRESHOLD = 0.7
+VOICING_MIN_RMS = 0.001
+OCTAVE_TOLERANCE = 0.9
+# F0 a más de este factor de la mediana del hablante: error de octava
+OCTAVE_JUMP_RATIO = 1.6
+# Sustituyen al suavizado de Viterbi: se descartan tramos sonoros de una
+# trama y se rellenan huecos sordos de hasta 3 tramas
+MIN_VOICED_FRAMES = 2
+MAX_FILLED_GAP_FRAMES = 3
+MEL_BANDS = 26
+LOUDNESS_COMPRESSION = 0.33
+# Escala del espectro auditivo de openSMILE (ajustada sobre data/test: la
+# relación entre ambas sonoridades es constante, ±0.3 %, a cualquier nivel)
+LOUDNESS_CALIBRATION = 1 / 15.066
+# Peaks2.relThresh de eGeMAPS: un pico debe subir y bajar un 10 % del rango
+PEAK_REL_THRESHOLD = 0.1
+# Marcado de periodos para el shimmer (searchRangeRel de cPitchJitter) y
+# correlación mínima entre periodos consecutivos para aceptar el par
+PERIOD_SEARCH_RANGE = 0.1
+PERIOD_MIN_CORRELATION = 0.65
+# Tramas por lote en las FFT para acotar memoria con audios largos
+_FRAME_BATCH = 2048
+
+
+def get_prosody_mode(mode: str | None = None) -> str:
+    """
+    Valida un modo de extracción (None = modo por defecto).
+
+    Raises:
+        ValueError si el modo no existe
+    """
+    mode = mode or DEFAULT_PROSODY_MODE
+    if mode not in PROSODY_MODES:
+        raise ValueError(
+            f"invalid prosody_mode '{mode}'. valid values: {', '.join(PROSODY_MODES)}")
+    return mode
+
+
+def _frames(signal: np.ndarray, frame_length: int, hop_length: int) -> np.ndarray:
+    if len(signal) < frame_length:
+        signal = np.pad(signal, (0, frame_length - len(signal)))
+    n_frames = 1 + (len(signal) - frame_length) // hop_length
+    return np.lib.stride_tricks.as_strided(
+        signal,
+        shape=(n_frames, frame_length),
+        strides=(signal.strides[0] * hop_length, signal.strides[0]),
+        writeable=False,
+    )
+
+
+def _sma3(values: np.ndarray) -> np.ndarray:
+    # Media móvil de 3 tramas (sufijo _sma3 de openSMILE)
+    if len(values) < 3:
+        return values
+    padded = np.pad(values, 1, mode="edge")
+    return (padded[:-2] + padded[1:-1] + padded[2:]) / 3.0
+
+
+def _sma3_nz(values: np.ndarray) -> np.ndarray:
+    # Como _sma3 pero solo promedia tramas no nulas (sufijo _sma3nz)
+    if len(values) < 3:
+        return values
+    nonzero = (values != 0).astype(np.float64)
+    padded = np.pad(values, 1)
+    weights = np.pad(nonzero, 1)
+    total = padded[:-2] + padded[1:-1] + padded[2:]
+    count = weights[:-2] + weights[1:-1] + weights[2:]
+    smoothed = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    return np.where(nonzero > 0, smoothed, 0.0)
+
+
+def _mel_centers(sampling_rate: int) -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    # Bordes y centros de las bandas (20 Hz - Nyquist, como melspec en eGeMAPS)
+    return mel_to_hz(np.linspace(hz_to_mel(20.0), hz_to_mel(sampling_rate / 2), MEL_BANDS + 2))
+
+
+def _mel_filterbank(n_fft: int, sampling_rate: int) -> np.ndarray:
+    bins = np.floor((n_fft + 1) * _mel_centers(sampling_rate) / sampling_rate).astype(int)
+    bank = np.zeros((MEL_BANDS, n_fft // 2 + 1))
+    for band in range(MEL_BANDS):
+        left, center, right = bins[band], bins[band + 1], bins[band + 2]
+        if center > left:
+            bank[band, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            bank[band, center:right] = (right - np.arange(center, right)) / (right - center)
+    return bank
+
+
+def _equal_loudness(sampling_rate: int) -> np.ndarray:
+    # Curva de igual sonoridad de PLP (doAud en cPlp) en el centro de cada banda
+    squared = _mel_centers(sampling_rate)[1:-1] ** 2
+    return ((squared / (squared + 1.6e5)) ** 2) * ((squared + 1.44e6) / (squared + 9.61e6))
+
+
+def _loudness(signal: np.ndarray, sampling_rate: int) -> np.ndarray:
+    """Sonoridad por trama: espectro auditivo ponderado, comprimido y sumado."""
+    frame_length = int(LOUDNESS_FRAME_SECONDS * sampling_rate)
+    hop_length = int(HOP_SECONDS * sampling_rate)
+    n_fft = 1 << (frame_length - 1).bit_length()
+    frames = _frames(signal, frame_length, hop_length)
+    window = np.hamming(frame_length)
+    bank = _mel_filterbank(n_fft, sampling_rate).T * _equal_loudness(sampling_rate)
+    loudness = np.empty(len(frames))
+    for start in range(0, len(frames), _FRAME_BATCH):
+        batch = frames[start:start + _FRAME_BATCH] * window
+        power = np.abs(np.fft.rfft(batch, n=n_fft, axis=1)) ** 2
+        loudness[start:start + _FRAME_BATCH] = (
+            (power @ bank) ** LOUDNESS_COMPRESSION).sum(axis=1)
+    return loudness * LOUDNESS_CALIBRATION
+
+
+def _run_bounds(mask: np.ndarray) -> list[tuple[int, int]]:
+    """Intervalos [inicio, fin) de los tramos True."""
+    changes = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], changes, [len(mask)]))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if mask[a]]
+
+
+def _pitch(signal: np.ndarray, sampling_rate: int) -> np.ndarray:
+    """
+    F0 en Hz por trama (0 en tramas sordas).
+
+    Autocorrelación normalizada por FFT con interpolación parabólica del pico;
+    el contorno se limpia después como lo haría el suavizado de openSMILE.
+    """
+    frame_length = int(PITCH_FRAME_SECONDS * sampling_rate)
+    hop_length = int(HOP_SECONDS * sampling_rate)
+    min_lag = int(sampling_rate / F0_MAX_HZ)
+    max_lag = min(int(sampling_rate / F0_MIN_HZ), frame_length - 2)
+    # Basta con que la autocorrelación circular no se solape hasta max_lag
+    n_fft = 1 << (frame_length + max_lag).bit_length()
+    frames = _frames(signal, frame_length, hop_length)
+    window = np.hanning(frame_length)
+    # Corrige el sesgo de la ventana en la autocorrelación
+    window_acf = np.fft.irfft(np.abs(np.fft.rfft(window, n=n_fft)) ** 2)[:frame_length]
+    window_acf = window_acf / window_acf[0]
+
+    f0 = np.zeros(len(frames))
+    amplitude = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    lags = np.arange(min_lag, max_lag + 1)
+    for start in range(0, len(frames), _FRAME_BATCH):
+        batch = frames[start:start + _FRAME_BATCH]
+        batch = (batch - batch.mean(axis=1, keepdims=True)) * window
+        acf = np.fft.irfft(np.abs(np.fft.rfft(batch, n=n_fft, axis=1)) ** 2, axis=1)[:, :frame_length]
+        energy = acf[:, :1]
+        acf = np.divide(acf, energy * window_acf, out=np.zeros_like(acf), where=energy > 0)
+        candidates = acf[:, min_lag:max_lag + 1]
+        # Primer máximo local cercano al global: evita errores de octava
+        # (los múltiplos del periodo dan picos casi igual de altos)
+        local_max = np.zeros_like(candidates, dtype=bool)
+        local_max[:, 1:-1] = (candidates[:, 1:-1] >= candidates[:, :-2]) & (candidates[:, 1:-1] > candidates[:, 2:])
+        global_max = candidates.max(axis=1, keepdims=True)
+        eligible = local_max & (candidates >= OCTAVE_TOLERANCE * global_max)
+        best = np.where(eligible.any(axis=1), eligible.argmax(axis=1), candidates.argmax(axis=1))
+        strength = candidates[np.arange(len(best)), best]
+
+        # Interpolación parabólica alrededor del pico
+        left = candidates[np.arange(len(best)), np.clip(best - 1, 0, len(lags) - 1)]
+        right = candidates[np.arange(len(best)), np.clip(best + 1, 0, len(lags) - 1)]
+        denominator = left - 2 * strength + right
+        shift = np.divide(0.5 * (left - right), denominator,
+                          out=np.zeros_like(denominator), where=denominator != 0)
+        lag = lags[best] + np.clip(shift, -0.5, 0.5)
+
+        voiced = (strength >= VOICING_THRESHOLD) & (amplitude[start:start + _FRAME_BATCH] >= VOICING_MIN_RMS)
+        f0[start:start + _FRAME_BATCH] = np.where(voiced, sampling_rate / lag, 0.0)
+
+    # Huecos sordos cortos entre tramas sonoras: se interpola el F0
+    for gap_start, gap_end in _run_bounds(f0 == 0):
+        if gap_start > 0 and gap_end < len(f0) and gap_end - gap_start <= MAX_FILLED_GAP_FRAMES:
+            f0[gap_start:gap_end] = np.interp(
+                np.arange(gap_start, gap_end), [gap_start - 1, gap_end], [f0[gap_start - 1], f0[gap_end]])
+    # Tramos sonoros demasiado cortos: ruido
+    for run_start, run_end in _run_bounds(f0 > 0):
+        if run_end - run_start < MIN_VOICED_FRAMES:
+            f0[run_start:run_end] = 0.0
+
+    # Errores de octava respecto a la mediana del hablante
+    voiced = f0 > 0
+    if voiced.any():
+        median = np.median(f0[voiced])
+        f0 = np.where(voiced & (f0 > OCTAVE_JUMP_RATIO * median), f0 / 2, f0)
+        f0 = np.where(voiced & (f0 < median / OCTAVE_JUMP_RATIO), f0 * 2, f0)
+    return f0
+
+
+def _shimmer(signal: np.ndarray, f0: np.ndarray, sampling_rate: int) -> np.ndarray:
+    """
+    Shimmer local (dB) por trama, periodo a periodo.
+
+    Como cPitchJitter: cada periodo se busca por correlación cruzada con el
+    anterior en ±PERIOD_SEARCH_RANGE del periodo esperado, y solo cuentan los
+    pares de periodos suficientemente parecidos.
+    """
+    hop_length = int(HOP_SECONDS * sampling_rate)
+    n_frames = len(f0)
+    signal = signal.astype(np.float64)
+    # Energía acumulada: la norma de cada ventana candidata en O(1)
+    energy = np.concatenate(([0.0], np.cumsum(signal * signal)))
+    total = np.zeros(n_frames)
+    count = np.zeros(n_frames)
+    for run_start, run_end in _run_bounds(f0 > 0):
+        start = run_start * hop_length
+        end = min(len(signal), run_end * hop_length + int(PITCH_FRAME_SECONDS * sampling_rate))
+        period = sampling_rate / f0[run_start]
+        position = float(start + np.argmax(signal[start:start + int(period) + 1]))
+        periods, amplitudes, correlations, ends = [], [], [], []
+        while True:
+            frame = min(int(position) // hop_length, n_frames - 1)
+            expected = sampling_rate / f0[frame] if f0[frame] > 0 else period
+            length = int(expected)
+            low = int(expected * (1 - PERIOD_SEARCH_RANGE))
+            high = int(np.ceil(expected * (1 + PERIOD_SEARCH_RANGE)))
+            index = int(round(position))
+            if index + high + length + 1 >= end:
+                break
+            reference = signal[index:index + length]
+            offsets = np.arange(index + low - 1, index + high + 2)
+            candidates = np.lib.stride_tricks.sliding_window_view(
+                signal[offsets[0]:offsets[-1] + length], length)
+            numerator = candidates @ reference
+            denominator = np.sqrt((energy[offsets + length] - energy[offsets])
+                                  * (energy[index + length] - energy[index]))
+            correlation = np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
+            best = int(np.argmax(correlation[1:-1])) + 1
+            before, peak, after = correlation[best - 1:best + 2]
+            curvature = before - 2 * peak + after
+            shift = 0.5 * (before - after) / curvature if curvature != 0 else 0.0
+            period = low - 1 + best + float(np.clip(shift, -0.5, 0.5))
+            periods.append(period)
+            correlations.append(peak)
+            amplitudes.append(float(reference.max() - reference.min()))
+            ends.append(index + length)
+            position += period
+        if len(periods) < 2:
+            continue
+
+        correlations = np.array(correlations)
+        amplitudes = np.array(amplitudes)
+        accepted = (correlations[1:] >= PERIOD_MIN_CORRELATION) & (correlations[:-1] >= PERIOD_MIN_CORRELATION)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shimmer = np.abs(20.0 * np.log10(amplitudes[1:] / amplitudes[:-1]))
+        accepted &= np.isfinite(shimmer)
+        frames = np.minimum(np.array(ends[1:]) // hop_length, n_frames - 1)[accepted]
+        np.add.at(total, frames, shimmer[accepted])
+        np.add.at(count, frames, 1)
+    return np.divide(total, count, out=np.zeros(n_frames), where=count > 0)
+
+
+def _count_peaks(contour: np.ndarray) -> int:
+    """
+    Picos con histéresis (Peaks2 de openSMILE): un máximo cuenta cuando el
+    contorno cae desde él más de PEAK_REL_THRESHOLD del rango total.
+    """
+    if len(contour) < 3:
+        return 0
+    delta = PEAK_REL_THRESHOLD * float(contour.max() - contour.min())
+    slope = np.sign(np.diff(contour))
+    turns = np.flatnonzero(slope[1:] != slope[:-1]) + 1
+    count = 0
+    highest, lowest = -np.inf, np.inf
+    looking_for_max = True
+    # Solo los extremos locales pueden cambiar el estado
+    for value in contour[np.concatenate(([0], turns, [len(contour) - 1]))]:
+        highest = max(highest, value)
+        lowest = min(lowest, value)
+        if looking_for_max and value < highest - delta:
+            count += 1
+            lowest = value
+            looking_for_max = False
+        elif not looking_for_max and value > lowest + delta:
+            highest = value
+            looking_for_max = True
+    return count
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Longitudes (en tramas) de los tramos True y de los tramos False."""
+    if not len(mask):
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    changes = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+    bounds = np.concatenate(([0], changes, [len(mask)]))
+    lengths = np.diff(bounds)
+    starts_true = mask[bounds[:-1]]
+    return lengths[starts_true], lengths[~starts_true]
+
+
+def _stddev_norm(values: np.ndarray) -> float:
+    if not len(values):
+        return 0.0
+    mean = float(values.mean())
+    return float(values.std() / mean) if mean else 0.0
+
+
+def extract_key_metrics(signal: np.ndarray, sampling_rate: int = SAMPLING_RATE) -> dict:
+    """
+    Calcula las KEY_METRIC_NAMES a partir de una señal mono en [-1, 1].
+
+    El jitter no se calcula (ver docstring del módulo).
+    """
+    signal = np.asarray(signal, dtype=np.float32)
+    duration = len(signal) / sampling_rate
+    if duration <= 0:
+        return {name: 0.0 for name in KEY_METRIC_NAMES}
+
+    loudness = _sma3(_loudness(signal, sampling_rate))
+
+    f0 = _pitch(signal, sampling_rate)
+    voiced = f0 > 0
+    voiced_runs, unvoiced_runs = _runs(voiced)
+
+    semitones = np.zeros_like(f0)
+    semitones[voiced] = 12.0 * np.log2(f0[voiced] / 27.5)
+    semitones = _sma3_nz(semitones)
+
+    shimmer = _sma3_nz(_shimmer(signal, f0, sampling_rate))
+
+    return {
+        "F0semitoneFrom27.5Hz_sma3nz_stddevNorm": _stddev_norm(semitones[voiced]),
+        "loudness_sma3_amean": float(loudness.mean()),
+        "loudness_sma3_stddevNorm": _stddev_norm(loudness),
+        "loudnessPeaksPerSec": _count_peaks(loudness) / duration,
+        "VoicedSegmentsPerSec": float(len(voiced_runs) / duration),
+        "MeanUnvoicedSegmentLength": (
+            float(unvoiced_runs.mean() * HOP_SECONDS) if len(unvoiced_runs) else 0.0),
+        "shimmerLocaldB_sma3nz_amean": float(shimmer[shimmer > 0].mean()) if (shimmer > 0).any() else 0.0,
+    }
@@ -0,0 +1,72 @@
+"""
+Ejecutor de grafos de etapas con checkpoints.
+
+Las etapas se declaran en orden topológico con sus dependencias. Cada una
+recibe el trabajo, las salidas ya disponibles de las anteriores y un
+contexto en memoria (no persistido, p. ej. el audio decodificado), y su
+salida se guarda en app.core.checkpoints antes de pasar a la siguiente:
+una ejecución interrumpida se reanuda desde la primera etapa sin checkpoint.
+
+Volver a ejecutar una etapa invalida también las que dependen de ella.
+"""
+
+from dataclasses import dataclass
+from typing import Callable
+
+from app.core.checkpoints import delete_stage_outputs, load_stage_outputs, save_stage_output
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    run: Callable[[dict, dict, dict], object]  # (job, outputs, context) -> salida JSON
+    depends_on: tuple[str, ...] = ()
+
+
+class StageGraph:
+    def __init__(self, stages: list[Stage]):
+        seen = set()
+        for stage in stages:
+            missing = [name for name in stage.depends_on if name not in seen]
+            if stage.name in seen or missing:
+                raise ValueError(f"stage '{stage.name}' is duplicated or depends on undeclared stages {missing}")
+            seen.add(stage.name)
+        self.stages = list(stages)
+
+    @property
+    def names(self) -> list[str]:
+        return [stage.name for stage in self.stages]
+
+    def with_dependents(self, names) -> list[str]:
+        """Las etapas indicadas más todas las que dependen de ellas, en orden."""
+        unknown = sorted(set(names) - set(self.names))
+        if unknown:
+            raise ValueError(f"unknown stages {unknown}. valid values: {self.names}")
+        selected = set(names)
+        for stage in self.stages:
+            if selected.intersection(stage.depends_on):
+                selected.add(stage.name)
+        return [name for name in self.names if name in selected]
+
+    def execute(self, run_id: str, job: dict, rerun=(), path: str | None = None) -> dict:
+        """
+        Ejecuta las etapas que no tengan checkpoint (y las de `rerun`).
+
+        Returns:
+            Salida de cada etapa: {etapa: salida}
+        """
+        stale = self.with_dependents(rerun)
+        # Se borran antes de empezar: si el proceso muere durante la
+        # re-ejecución, al reanudar no se mezclan salidas nuevas y viejas
+        delete_stage_outputs(run_id, stale, path=path)
+        stored = load_stage_outputs(run_id, path=path)
+        outputs = {name: output for name, output in stored.items() if name in self.names}
+        context: dict = {}
+        for stage in self.stages:
+            if stage.name in outputs:
+                print(f"run {run_id}: stage {stage.name} restored from checkpoint")
+                continue
+            output = stage.run(job, outputs, context)
+            save_stage_output(run_id, stage.name, output, path=path)
+            outputs[stage.name] = output
+        return outputs
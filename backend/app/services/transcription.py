@@ -3,26 +3,85 @@ import torch
 from pyannote.audio import Pipeline
 
 import os
+import threading
 from dotenv import load_dotenv
 
+from app.core.instrumentation import stage
+from app.services.batching import WhisperBatchScheduler
+from app.services.engine_profiles import EngineProfile, get_engine_profile
+from app.services.vad import (
+    SAMPLING_RATE,
+    VAD_PARAMETERS,
+    compute_pause_stats,
+    concat_speech,
+    detect_speech_regions,
+    load_audio,
+    restore_turns,
+)
+
 
 load_dotenv()
-model_size = "small"
 hf_token = os.getenv('HUGGING_FACE')
 
-# esto hay que cambiarlo, de momento así para probar en local
-model = WhisperModel(model_size, device="cpu", compute_type="int8")
+# Etiqueta (estilo pyannote) que recibe toda la voz cuando no se diariza
+SINGLE_SPEAKER_LABEL = "SPEAKER_00"
+
+# Caché de modelos: cada perfil usado queda residente en memoria
+_models: dict[tuple[str, str, str], WhisperModel] = {}
+_batch_schedulers: dict[str, WhisperBatchScheduler] = {}
+_models_lock = threading.Lock()
+
+
+def get_whisper_model(profile: EngineProfile) -> WhisperModel:
+    key = (profile.model_size, profile.device, profile.compute_type)
+    with _models_lock:
+        if key not in _models:
+            print(f"loading whisper model {profile.model_size} for profile {profile.name}")
+            _models[key] = WhisperModel(
+                profile.model_size, device=profile.device, compute_type=profile.compute_type)
+        return _models[key]
+
+
+def get_batch_scheduler(profile: EngineProfile) -> WhisperBatchScheduler:
+    """Planificador de micro-batching del perfil (se crea al primer uso)."""
+    model = get_whisper_model(profile)
+    with _models_lock:
+        if profile.name not in _batch_schedulers:
+            _batch_schedulers[profile.name] = WhisperBatchScheduler(
+                model, beam_size=profile.beam_size)
+        return _batch_schedulers[profile.name]
+
+
+for _profile_name in os.getenv("WHISPER_PRELOAD_PROFILES", "").split(","):
+    if _profile_name.strip():
+        get_whisper_model(get_engine_profile(_profile_name.strip()))
+# el perfil por defecto se sigue cargando al arrancar, como antes
+get_whisper_model(get_engine_profile())
 
 
-def transcribe(audio_path: str):
-    print(f"starting transcription for: {audio_path}")
-    segments, info = model.transcribe(
-        audio_path,
-        beam_size=1,
-        condition_on_previous_text=True,
+def transcribe(audio, speech_regions: list[dict] | None = None, profile: EngineProfile | None = None):
+    print(f"starting transcription for: {audio if isinstance(audio, str) else 'decoded audio'}")
+    if speech_regions is not None and not speech_regions:
+        print("no speech regions, skipping transcription")
+        return []
+
+    # Si ya tenemos la línea temporal del VAD compartido, Whisper solo
+    # decodifica esas regiones y no vuelve a pasar su propio VAD.
+    if speech_regions is not None:
+        clip_timestamps = []
+        for region in speech_regions:
+            clip_timestamps.extend([region["start"], region["end"]])
+        vad_options = {"vad_filter": False, "clip_timestamps": clip_timestamps}
+    else:
+        vad_options = {"vad_filter": True, "vad_parameters": VAD_PARAMETERS}
+
+    profile = profile or get_engine_profile()
+    segments, info = get_whisper_model(profile).transcribe(
+        audio,
+        beam_size=profile.beam_size,
+        condition_on_previous_text=profile.condition_on_previous_text,
         temperature=0.0,
-        vad_filter=True,
-        vad_parameters={"min_silence_duration_ms": 800, "speech_pad_ms": 300},
+        **vad_options,
         compression_ratio_threshold=3.5,
         log_prob_threshold=1.0,
         no_speech_threshold=0.7
@@ -31,7 +90,12 @@ def transcribe(audio_path: str):
     return segments
 
 
-def run_diarization(audio_path: str, num_speakers: int):
+def run_diarization(
+    audio_path: str,
+    num_speakers: int,
+    audio=None,
+    speech_regions: list[dict] | None = None,
+):
     print(f"starting diarization for: {audio_path}")
     pipeline = Pipeline.from_pretrained(
         "pyannote/speaker-diarization-3.1",
@@ -45,7 +109,22 @@ def run_diarization(audio_path: str, num_speakers: int):
     print(f"using device: {device}")
     pipeline.to(device)
 
-    diarization = pipeline(audio_path, num_speakers=num_speakers)
+    # Con regiones de voz, pyannote solo procesa la voz concatenada y
+    # después se devuelven los turnos a la línea temporal original.
+    offsets = None
+    if audio is not None and speech_regions is not None:
+        speech_audio, offsets = concat_speech(audio, speech_regions)
+        if not offsets:
+            print("no speech regions, skipping diarization")
+            return []
+        diarization_input = {
+            "waveform": torch.from_numpy(speech_audio).unsqueeze(0),
+            "sample_rate": SAMPLING_RATE,
+        }
+    else:
+        diarization_input = audio_path
+
+    diarization = pipeline(diarization_input, num_speakers=num_speakers)
     print("diarization processing completed")
     segments = []
     for turn, _, speaker in diarization.speaker_diarization.itertracks(yield_label=True):
@@ -54,6 +133,8 @@ def run_diarization(audio_path: str, num_speakers: int):
             "end": turn.end,
             "speaker": speaker
         })
+    if offsets is not None:
+        segments = restore_turns(segments, offsets)
     print(f"diarization segments extracted: {len(segments)} segments found")
     return segments
 
@@ -74,13 +155,50 @@ def merge_close_segments(segments, max_gap_seconds=0.3):
     return merged
 
 
-def split_audio(audio_path: str, num_speakers: int):
+def split_audio(
+    audio_path: str,
+    num_speakers: int,
+    audio=None,
+    speech_regions: list[dict] | None = None,
+    batched: bool = False,
+    engine_profile: str | None = None,
+):
     print(f"processing audio file: {audio_path}")
-    whisper_results = list(transcribe(audio_path))
+    profile = get_engine_profile(engine_profile)
+    # VAD compartido: se decodifica y se segmenta la voz una única vez
+    if audio is None:
+        with stage("decode") as span:
+            audio = load_audio(audio_path)
+            span["audio_seconds"] = len(audio) / SAMPLING_RATE
+    audio_seconds = len(audio) / SAMPLING_RATE
+    if speech_regions is None:
+        with stage("vad", audio_seconds=audio_seconds):
+            speech_regions = detect_speech_regions(audio)
+
+    with stage("whisper", audio_seconds=audio_seconds,
+               profile=profile.name, batched=batched) as whisper_span:
+        if batched:
+            # Camino rápido: la petición se agrupa con otras concurrentes
+            whisper_results = get_batch_scheduler(profile).transcribe(audio, speech_regions)
+        else:
+            whisper_results = list(transcribe(audio, speech_regions, profile))
+    whisper_seconds = whisper_span["wall_seconds"]
     print(f"whisper transcription returned {len(whisper_results)} segments")
-    diarization_results = run_diarization(audio_path, num_speakers)
-    diarization_results = merge_close_segments(
-        diarization_results, max_gap_seconds=0.3)
+    single_speaker = num_speakers == 1
+    if single_speaker:
+        # Un único orador declarado: pyannote no aporta nada y suele ser la
+        # etapa más cara en CPU. Toda la voz del VAD se asigna a un hablante.
+        diarization_results = merge_close_segments(
+            [{"start": r["start"], "end": r["end"], "speaker": SINGLE_SPEAKER_LABEL}
+             for r in speech_regions],
+            max_gap_seconds=0.3,
+        )
+    else:
+        with stage("diarization", audio_seconds=audio_seconds, num_speakers=num_speakers):
+            diarization_results = run_diarization(
+                audio_path, num_speakers, audio=audio, speech_regions=speech_regions)
+        diarization_results = merge_close_segments(
+            diarization_results, max_gap_seconds=0.3)
 
     final_transcript = []
     print("matching transcription segments with speaker labels...")
@@ -89,6 +207,15 @@ def split_audio(audio_path: str, num_speakers: int):
         w_start = w_seg.start
         w_end = w_seg.end
 
+        if single_speaker:
+            final_transcript.append({
+                "speaker": SINGLE_SPEAKER_LABEL,
+                "start": round(w_seg.start, 2),
+                "end": round(w_seg.end, 2),
+                "text": w_seg.text.strip()
+            })
+            continue
+
         speaker_id = "UNKNOWN"
         max_overlap = 0.0
         for d_seg in diarization_results:
@@ -130,6 +257,22 @@ def split_audio(audio_path: str, num_speakers: int):
         f"matching completed, {len(final_transcript)} final transcript segments created")
     return {
         "audio_file": audio_path,
+        # Buffer decodificado (float32, 16 kHz) para que el llamante no relea el fichero
+        "audio": audio,
         "transcript": final_transcript,
-        "diarization_raw": diarization_results
+        "diarization_raw": diarization_results,
+        "speech_regions": speech_regions,
+        "pauses": compute_pause_stats(speech_regions, audio_seconds),
+        "engine": {
+            "profile": profile.name,
+            "model_size": profile.model_size,
+            "compute_type": profile.compute_type,
+            "beam_size": profile.beam_size,
+            "batched": batched,
+            "diarization": "single_speaker" if single_speaker else "pyannote",
+            "audio_seconds": round(audio_seconds, 2),
+            "transcription_seconds": round(whisper_seconds, 2),
+            # real-time factor: segundos de cómputo por segundo de audio
+            "rtf": round(whisper_seconds / audio_seconds, 4) if audio_seconds > 0 else None,
+        },
     }
@@ -0,0 +1,102 @@
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+
+SAMPLING_RATE = 16000
+
+# mismos parámetros que usaba el vad_filter interno de Whisper
+VAD_PARAMETERS = {"min_silence_duration_ms": 800, "speech_pad_ms": 300}
+
+
+def load_audio(audio_path: str) -> np.ndarray:
+    """Decodifica el audio una sola vez a mono float32 a 16 kHz."""
+    return decode_audio(audio_path, sampling_rate=SAMPLING_RATE)
+
+
+def detect_speech_regions(audio: np.ndarray) -> list[dict]:
+    """
+    Ejecuta el VAD (Silero) sobre el audio decodificado.
+
+    Returns:
+        Lista de regiones de voz con "start" y "end" en segundos
+    """
+    print("running shared vad pre-pass...")
+    timestamps = get_speech_timestamps(audio, VadOptions(**VAD_PARAMETERS))
+    regions = [
+        {
+            "start": ts["start"] / SAMPLING_RATE,
+            "end": ts["end"] / SAMPLING_RATE,
+        }
+        for ts in timestamps
+    ]
+    print(f"vad completed, {len(regions)} speech regions found")
+    return regions
+
+
+def compute_pause_stats(regions: list[dict], duration: float) -> dict:
+    """Estadísticas de pausas a partir de la línea temporal de voz."""
+    speech_seconds = sum(r["end"] - r["start"] for r in regions)
+    pauses = [
+        regions[i + 1]["start"] - regions[i]["end"]
+        for i in range(len(regions) - 1)
+        if regions[i + 1]["start"] > regions[i]["end"]
+    ]
+    total_pause = sum(pauses)
+    return {
+        "duration_seconds": round(duration, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "speech_ratio": round(speech_seconds / duration, 4) if duration > 0 else 0.0,
+        "num_pauses": len(pauses),
+        "total_pause_seconds": round(total_pause, 2),
+        "mean_pause_seconds": round(total_pause / len(pauses), 2) if pauses else 0.0,
+        "max_pause_seconds": round(max(pauses), 2) if pauses else 0.0,
+        "leading_silence_seconds": round(regions[0]["start"], 2) if regions else round(duration, 2),
+        "trailing_silence_seconds": round(duration - regions[-1]["end"], 2) if regions else 0.0,
+    }
+
+
+def concat_speech(audio: np.ndarray, regions: list[dict]) -> tuple[np.ndarray, list[tuple[float, float, float]]]:
+    """
+    Concatena solo las regiones de voz del audio.
+
+    Returns:
+        (audio concatenado, mapa de offsets) donde cada entrada del mapa es
+        (inicio en el audio concatenado, inicio original, fin original)
+    """
+    chunks = []
+    offsets = []
+    cursor = 0.0
+    for region in regions:
+        start = int(region["start"] * SAMPLING_RATE)
+        end = int(region["end"] * SAMPLING_RATE)
+        if end <= start:
+            continue
+        chunks.append(audio[start:end])
+        offsets.append((cursor, region["start"], region["end"]))
+        cursor += (end - start) / SAMPLING_RATE
+    if not chunks:
+        return np.zeros(0, dtype=np.float32), []
+    return np.concatenate(chunks), offsets
+
+
+def restore_turns(turns: list[dict], offsets: list[tuple[float, float, float]]) -> list[dict]:
+    """
+    Devuelve los turnos calculados sobre el audio concatenado a la línea
+    temporal original, partiendo los que cruzan una frontera entre regiones.
+    """
+    restored = []
+    for turn in turns:
+        for concat_start, orig_start, orig_end in offsets:
+            concat_end = concat_start + (orig_end - orig_start)
+            overlap_start = max(turn["start"], concat_start)
+            overlap_end = min(turn["end"], concat_end)
+            if overlap_end <= overlap_start:
+                continue
+            restored.append({
+                "start": orig_start + (overlap_start - concat_start),
+                "end": orig_start + (overlap_end - concat_start),
+                "speaker": turn["speaker"],
+            })
+    restored.sort(key=lambda x: x["start"])
+    return restored
@@ -0,0 +1,56 @@
+"""
+Modelo de chat local para medir ChatSession.send_evaluation sin red.
+
+Lee los criterios del prompt de evaluación y responde con un JSON válido
+para el parser de la fase, con una puntuación fija por criterio.
+"""
+
+import json
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+def _extract_criterios(prompt: str) -> list[str]:
+    criterios = []
+    capturing = False
+    for line in prompt.splitlines():
+        if line.startswith(("CRITERIOS A EVALUAR", "BLOQUES A EVALUAR")):
+            capturing = True
+            continue
+        if capturing:
+            if not line.strip():
+                break
+            if line.startswith("- "):
+                item = line[2:].strip()
+                # RETOR: "- Nombre (criterio_id)"
+                if item.endswith(")") and "(" in item:
+                    item = item[item.rindex("(") + 1:-1]
+                criterios.append(item)
+    return criterios
+
+
+class FakeEvaluationChatModel(BaseChatModel):
+    score: int = 2
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-evaluation"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = messages[-1].content
+        criterios = _extract_criterios(prompt)
+        payload = {
+            "puntuaciones": {c: self.score for c in criterios},
+            "anotaciones": {c: "sin observaciones" for c in criterios},
+            "feedback": "respuesta generada por el modelo de benchmark",
+        }
+        if "sumatorio_oradores" in criterios:
+            payload.update({
+                "mejor_orador": "Orador 1",
+                "justificacion_mejor_orador": "benchmark",
+                "feedback_equipo": "benchmark",
+            })
+        message = AIMessage(content=json.dumps(payload, ensure_ascii=False))
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,79 @@
+"""
+Presupuesto de tiempo de arranque de la API.
+
+Importa `main` en un intérprete limpio (sin OPENAI_API_KEY) y falla si la
+importación supera el presupuesto o si arrastra alguno de los módulos
+pesados del stack ML, que solo deben cargarse al ejecutar un análisis.
+
+Uso (desde backend/):
+    python -m benchmarks.import_budget --budget-seconds 1.5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = (
+    "torch",
+    "pyannote.audio",
+    "faster_whisper",
+    "ctranslate2",
+    "opensmile",
+    "pandas",
+    "pydub",
+    "langchain_openai",
+    "openai",
+    "app.services.transcription",
+    "app.services.metrics",
+    "app.processors.pipeline",
+)
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+heavy = [m for m in json.loads(sys.argv[1]) if m in sys.modules]
+print(json.dumps({"import_seconds": round(elapsed, 4), "heavy_modules": heavy}))
+"""
+
+
+def measure_import() -> dict:
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE, json.dumps(HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        return {"error": completed.stderr.strip().splitlines()[-1:] or ["import failed"]}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="API import-time budget check")
+    parser.add_argument("--budget-seconds", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    result = measure_import()
+    result["budget_seconds"] = args.budget_seconds
+    print(json.dumps(result, indent=2))
+
+    if "error" in result:
+        return 1
+    if result["heavy_modules"] or result["import_seconds"] > args.budget_seconds:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Benchmark de ráfaga de logins.
+
+Registra usuarios en una base de datos temporal, lanza `--logins` peticiones
+concurrentes a /api/v1/login contra la app ASGI en proceso y, a la vez, sondea
+POST /api/v1/status para medir cuánto esperan las rutas baratas detrás del
+hashing. Emite un informe JSON con logins/s y latencias p50/p95/max.
+
+Uso (desde backend/):
+    python -m benchmarks.login_throughput --users 20 --logins 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return round(ordered[idx] * 1000, 2)
+
+
+def _latency_report(latencies: list[float]) -> dict:
+    return {
+        "count": len(latencies),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def _run(args) -> dict:
+    import httpx
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        users = [{"user": f"bench_user_{idx}", "pswd": f"bench-pass-{idx}"} for idx in range(args.users)]
+        for creds in users:
+            response = await client.post("/api/v1/register", json=creds)
+            response.raise_for_status()
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        login_latencies: list[float] = []
+        probe_latencies: list[float] = []
+        failures = 0
+        done = asyncio.Event()
+
+        async def login(idx: int):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/v1/login", json=users[idx % len(users)])
+                login_latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.post("/api/v1/status")
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(args.probe_interval)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login(idx) for idx in range(args.logins)))
+        wall = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    from app.core.security import PASSWORD_HASH_ROUNDS, PASSWORD_HASH_WORKERS
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "cpu_count": os.cpu_count(),
+            "hash_rounds": PASSWORD_HASH_ROUNDS,
+            "hash_workers": PASSWORD_HASH_WORKERS,
+        },
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "logins_per_second": round(args.logins / wall, 2) if wall > 0 else None,
+        "login_latency": _latency_report(login_latencies),
+        "status_probe_latency": _latency_report(probe_latencies),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="CiceronAI login burst benchmark")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-interval", type=float, default=0.01,
+                        help="seconds between /status probes during the burst")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    # --output es relativo al cwd de la invocación, no al directorio temporal
+    output_path = Path(args.output).resolve() if args.output else None
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # db.json y uploads/ se crean relativos al cwd: aislados en un directorio temporal
+        os.chdir(tmp_dir)
+        try:
+            report = asyncio.run(_run(args))
+        finally:
+            os.chdir(previous_cwd)
+
+    output = json.dumps(report, indent=2)
+    if output_path:
+        output_path.write_text(output)
+    print(output)
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Validación del extractor de métricas clave frente a openSMILE (eGeMAPSv02).
+
+Para cada grabación de data/test (y audio sintético opcional) trocea la
+señal de voz (VAD compartido) en fragmentos de --chunk-seconds, calcula las
+KEY_METRIC_NAMES con ambos extractores sobre cada fragmento y a cada
+--gain (los umbrales absolutos deben aguantar grabaciones más bajas), e
+informa del error relativo por métrica, la correlación entre fragmentos y
+el speedup por segundo de audio. Sale con código 1 si el error relativo
+medio de alguna métrica supera --max-error.
+
+Los resultados de referencia sobre data/test están en
+benchmarks/prosody_validation.json.
+
+Uso (desde backend/):
+    python -m benchmarks.prosody_validation
+    python -m benchmarks.prosody_validation --output benchmarks/prosody_validation.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARK_DIR.parent
+TEST_AUDIO_DIR = BACKEND_DIR / "data" / "test"
+
+
+def _speech_signal(audio_path: str):
+    from app.services.vad import concat_speech, detect_speech_regions, load_audio
+
+    audio = load_audio(audio_path)
+    signal, _ = concat_speech(audio, detect_speech_regions(audio))
+    return signal
+
+
+def _create_smile():
+    # Directo y no vía app.services.metrics, que carga Whisper al importarse
+    import opensmile
+
+    return opensmile.Smile(
+        feature_set=opensmile.FeatureSet.eGeMAPSv02,
+        feature_level=opensmile.FeatureLevel.Functionals,
+    )
+
+
+def compare_signal(source: str, signal, smile) -> dict:
+    from app.services.prosody import KEY_METRIC_NAMES, extract_key_metrics
+    from app.services.vad import SAMPLING_RATE
+
+    audio_seconds = len(signal) / SAMPLING_RATE
+
+    started = time.perf_counter()
+    full = smile.process_signal(signal, SAMPLING_RATE).to_dict(orient="records")[0]
+    full_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    key = extract_key_metrics(signal)
+    key_seconds = time.perf_counter() - started
+
+    metrics = {}
+    for name in KEY_METRIC_NAMES:
+        reference = float(full.get(name, 0.0))
+        value = key[name]
+        metrics[name] = {
+            "opensmile": round(reference, 6),
+            "key": round(value, 6),
+            "relative_error": round(abs(value - reference) / abs(reference), 4) if reference else None,
+        }
+    return {
+        "source": source,
+        "speech_seconds": round(audio_seconds, 2),
+        "opensmile_seconds": round(full_seconds, 4),
+        "key_seconds": round(key_seconds, 4),
+        "speedup": round(full_seconds / key_seconds, 1) if key_seconds > 0 else None,
+        "metrics": metrics,
+    }
+
+
+def compare_source(source: str, audio_path: str, smile, chunk_seconds: float, gains: list[float]) -> list[dict]:
+    from app.services.vad import SAMPLING_RATE
+
+    print(f"validating {source}", file=sys.stderr)
+    signal = _speech_signal(audio_path)
+    chunk_length = int(chunk_seconds * SAMPLING_RATE) if chunk_seconds > 0 else len(signal)
+    cases = []
+    for index, start in enumerate(range(0, len(signal) - chunk_length + 1, max(chunk_length, 1))):
+        chunk = signal[start:start + chunk_length]
+        for gain in gains:
+            cases.append(compare_signal(f"{source}#{index}@{gain:g}", chunk * gain, smile))
+    return cases
+
+
+def summarize(cases: list[dict]) -> dict:
+    """Error relativo medio y máximo y correlación (con >= 3 casos) por métrica."""
+    import numpy as np
+
+    from app.services.prosody import KEY_METRIC_NAMES
+
+    summary = {}
+    for name in KEY_METRIC_NAMES:
+        errors = [c["metrics"][name]["relative_error"] for c in cases
+                  if c["metrics"][name]["relative_error"] is not None]
+        reference = np.array([c["metrics"][name]["opensmile"] for c in cases])
+        values = np.array([c["metrics"][name]["key"] for c in cases])
+        correlation = None
+        if len(cases) >= 3 and reference.std() > 0 and values.std() > 0:
+            correlation = round(float(np.corrcoef(reference, values)[0, 1]), 3)
+        summary[name] = {
+            "mean_relative_error": round(sum(errors) / len(errors), 4) if errors else None,
+            "max_relative_error": round(max(errors), 4) if errors else None,
+            "correlation": correlation,
+        }
+    speedups = [c["speedup"] for c in cases if c["speedup"]]
+    return {
+        "metrics": summary,
+        "mean_speedup": round(sum(speedups) / len(speedups), 1) if speedups else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Validate the key prosody extractor against openSMILE")
+    parser.add_argument("--synthetic", action="append", type=float, default=[],
+                        help="also validate synthetic single-speaker audio of this many seconds (repeatable)")
+    parser.add_argument("--no-test-recordings", action="store_true",
+                        help="skip the recordings in data/test")
+    parser.add_argument("--chunk-seconds", type=float, default=20.0,
+                        help="split each speech signal into chunks of this length (0 = whole signal)")
+    parser.add_argument("--gain", action="append", type=float,
+                        help="also validate each chunk scaled by this gain (repeatable, default 1 and 0.25)")
+    parser.add_argument("--max-error", type=float, default=0.15,
+                        help="fail if the mean relative error of any metric exceeds this bound")
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from benchmarks.synthetic import generate_debate_audio, write_wav
+
+    smile = _create_smile()
+    gains = args.gain or [1.0, 0.25]
+    cases = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = []
+        if not args.no_test_recordings:
+            sources += [(path.stem, str(path)) for path in sorted(TEST_AUDIO_DIR.glob("*.m4a"))]
+        for seconds in args.synthetic:
+            path = Path(tmp_dir) / f"synthetic_{int(seconds)}s.wav"
+            write_wav(str(path), generate_debate_audio(seconds, 1))
+            sources.append((f"synthetic_{int(seconds)}s", str(path)))
+        for source, path in sources:
+            cases.extend(compare_source(source, path, smile, args.chunk_seconds, gains))
+
+    summary = summarize(cases) if cases else {}
+    failed = [name for name, result in summary.get("metrics", {}).items()
+              if result["mean_relative_error"] is not None and result["mean_relative_error"] > args.max_error]
+    report = {
+        "chunk_seconds": args.chunk_seconds,
+        "gains": gains,
+        "max_error": args.max_error,
+        "failed": failed,
+        "summary": summary,
+        "cases": cases,
+    }
+    rendered = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(rendered + "\n", encoding="utf-8")
+    print(rendered)
+    if failed:
+        print(f"mean relative error above {args.max_error:g}: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Benchmark offline del pipeline de análisis.
+
+Ejecuta split_audio, process_complete_analysis y ChatSession.send_evaluation
+(con un modelo de chat local) sobre las grabaciones de data/test y sobre
+audio sintético, y emite un informe JSON con real-time factor, latencia por
+etapa, pico de memoria y tokens del prompt. Opcionalmente compara contra un
+baseline guardado y falla si hay regresiones.
+
+Uso (desde backend/):
+    python -m benchmarks.run --synthetic 60x1 --synthetic 120x2 --output report.json
+    python -m benchmarks.run --save-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCHMARK_DIR.parent
+DEFAULT_BASELINE = BENCHMARK_DIR / "baseline.json"
+TEST_AUDIO_DIR = BACKEND_DIR / "data" / "test"
+
+# Métricas comparadas contra el baseline (más alto = peor)
+COMPARED_METRICS = ("wall_seconds", "rtf", "peak_rss_mb", "prompt_tokens")
+
+
+def _count_tokens(text: str) -> tuple[int, bool]:
+    """Cuenta tokens con tiktoken si está instalado; si no, aproxima (4 chars/token)."""
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return len(encoding.encode(text)), True
+    except Exception:
+        return len(text) // 4, False
+
+
+class _SpanCollector:
+    def __init__(self):
+        self.spans = []
+
+    def __call__(self, span: dict):
+        self.spans.append(dict(span))
+
+    def stage_seconds(self) -> dict:
+        totals = {}
+        for span in self.spans:
+            totals[span["stage"]] = round(
+                totals.get(span["stage"], 0.0) + span["wall_seconds"], 4)
+        return totals
+
+
+def _measure(case: str, fn, audio_seconds: float):
+    from app.core.instrumentation import add_span_listener, peak_rss_bytes, remove_span_listener
+
+    collector = _SpanCollector()
+    add_span_listener(collector)
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        remove_span_listener(collector)
+    wall = time.perf_counter() - started
+    peak = peak_rss_bytes()
+    return result, {
+        "case": case,
+        "audio_seconds": round(audio_seconds, 2),
+        "wall_seconds": round(wall, 4),
+        "rtf": round(wall / audio_seconds, 4) if audio_seconds > 0 else None,
+        "stages": collector.stage_seconds(),
+        # pico del proceso: es monótono, refleja el máximo hasta este caso
+        "peak_rss_mb": round(peak / 2**20, 1) if peak is not None else None,
+    }
+
+
+def _audio_seconds(path: str) -> float:
+    from app.services.vad import SAMPLING_RATE, load_audio
+    return len(load_audio(path)) / SAMPLING_RATE
+
+
+def bench_source(source: str, audio_path: str, num_speakers: int, engine_profile: str | None) -> list[dict]:
+    from app.processors.pipeline import create_chat
+    from app.services.metrics import process_complete_analysis
+    from app.services.transcription import split_audio
+    from benchmarks.fake_chat import FakeEvaluationChatModel
+
+    print(f"benchmarking {source} ({num_speakers} speakers)")
+    audio_seconds = _audio_seconds(audio_path)
+    results = []
+
+    _, report = _measure(
+        "split_audio",
+        lambda: split_audio(audio_path, num_speakers, engine_profile=engine_profile),
+        audio_seconds,
+    )
+    results.append(report)
+
+    analysis, report = _measure(
+        "process_complete_analysis",
+        lambda: process_complete_analysis(
+            audio_path, num_speakers, engine_profile=engine_profile),
+        audio_seconds,
+    )
+    results.append(report)
+
+    transcript = analysis["transcript"]
+    duration = transcript[-1]["end"] - transcript[0]["start"] if transcript else None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chat = create_chat(
+            "benchmark", f"benchmark_{source}",
+            db_path=os.path.join(tmp_dir, "bench_db.json"),
+            llm=FakeEvaluationChatModel(),
+        )
+        _, report = _measure(
+            "send_evaluation",
+            lambda: chat.send_evaluation(
+                fase="introduccion",
+                postura="A Favor",
+                orador="Orador 1",
+                transcripcion=transcript,
+                metricas=analysis["metrics"],
+                duracion_segundos=duration,
+            ),
+            audio_seconds,
+        )
+        prompt = next(
+            (m["content"] for m in chat.get_history() if m["type"] == "human"), "")
+        report["prompt_tokens"], report["prompt_tokens_exact"] = _count_tokens(prompt)
+    results.append(report)
+
+    for report in results:
+        report["source"] = source
+    return results
+
+
+def compare_with_baseline(cases: list[dict], baseline: dict, tolerance: float) -> list[dict]:
+    """Devuelve las métricas que empeoran más de `tolerance` respecto al baseline."""
+    baseline_cases = {
+        f"{c['source']}:{c['case']}": c for c in baseline.get("cases", [])}
+    regressions = []
+    for case in cases:
+        key = f"{case['source']}:{case['case']}"
+        reference = baseline_cases.get(key)
+        if reference is None:
+            continue
+        pairs = [(m, case.get(m), reference.get(m)) for m in COMPARED_METRICS]
+        pairs += [
+            (f"stages.{name}", seconds, reference.get("stages", {}).get(name))
+            for name, seconds in case.get("stages", {}).items()
+        ]
+        for metric, current, previous in pairs:
+            if current is None or not previous:
+                continue
+            if current > previous * (1 + tolerance):
+                regressions.append({
+                    "case": key,
+                    "metric": metric,
+                    "baseline": previous,
+                    "current": current,
+                    "change_percent": round((current / previous - 1) * 100, 1),
+                })
+    return regressions
+
+
+def _parse_synthetic(spec: str) -> tuple[float, int]:
+    seconds, _, speakers = spec.partition("x")
+    return float(seconds), int(speakers or 1)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="CiceronAI offline pipeline benchmark")
+    parser.add_argument("--synthetic", action="append", default=None,
+                        help="synthetic audio as SECONDSxSPEAKERS (repeatable, default 60x1 and 60x2)")
+    parser.add_argument("--no-test-recordings", action="store_true",
+                        help="skip the recordings in data/test")
+    parser.add_argument("--engine-profile", default=None)
+    parser.add_argument("--output", default=None, help="write the JSON report to this file")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed relative slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    # El benchmark nunca llama a OpenAI: basta con una clave ficticia
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark-fake-key")
+    sys.path.insert(0, str(BACKEND_DIR))
+    from benchmarks.synthetic import generate_debate_audio, write_wav
+
+    cases = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sources = []
+        if not args.no_test_recordings:
+            for path in sorted(TEST_AUDIO_DIR.glob("*.m4a")):
+                sources.append((path.stem, str(path), 1))
+        for idx, spec in enumerate(args.synthetic or ["60x1", "60x2"]):
+            seconds, speakers = _parse_synthetic(spec)
+            path = os.path.join(tmp_dir, f"synthetic_{spec}.wav")
+            write_wav(path, generate_debate_audio(seconds, speakers, seed=idx))
+            sources.append((f"synthetic_{spec}", path, speakers))
+
+        for source, path, speakers in sources:
+            cases.extend(bench_source(source, path, speakers, args.engine_profile))
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "engine_profile": args.engine_profile,
+        },
+        "cases": cases,
+    }
+
+    baseline_path = Path(args.baseline)
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text())
+        report["regressions"] = compare_with_baseline(cases, baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output)
+    print(output)
+
+    if args.save_baseline:
+        baseline_path.write_text(output)
+        print(f"baseline stored at {baseline_path}")
+        return 0
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Punto de entrada para los roles de despliegue y tareas de mantenimiento de CiceronAI.
+
+    python cli.py api --port 8000      # solo HTTP, encola los análisis
+    python cli.py worker --concurrency 2   # ejecuta los análisis encolados
+    python cli.py export --output season.ndjson   # exporta todos los proyectos
+    python cli.py features backfill               # rellena el almacén de features
+    python cli.py search reindex                  # reconstruye el índice de búsqueda
+    python cli.py debate-types validate liga.json # valida una definición de tipo de debate
+    python cli.py audio sweep                     # aplica la retención del almacén de audio
+
+Los roles api y worker comparten JOB_QUEUE_PATH y el directorio uploads/,
+por lo que deben ejecutarse en la misma máquina (o sobre un volumen compartido).
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+
+
+def _run_api(args) -> int:
+    import uvicorn
+
+    # El proceso API no ejecuta análisis salvo que se pida expresamente
+    os.environ["CICERON_ANALYSIS_MODE"] = "inline" if args.inline else "queue"
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        reload=args.reload,
+    )
+    return 0
+
+
+def _run_worker(args) -> int:
+    from app.core.instrumentation import start_metrics_server
+    from app.services.analysis_worker import run_worker
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    # Las métricas de etapas son por proceso: el /metrics de la API no ve las del worker
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port, args.metrics_host)
+    run_worker(concurrency=args.concurrency, kinds=args.kind)
+    return 0
+
+
+def _run_export(args) -> int:
+    from app.core.database import list_project_codes
+    from app.services.export import ExportError, iter_export_records, iter_ndjson, parquet_available, write_parquet
+
+    project_codes = args.project or list_project_codes(args.user_code)
+    last_cursor = None
+
+    def _tracked(records):
+        nonlocal last_cursor
+        for record in records:
+            last_cursor = record["cursor"]
+            yield record
+
+    try:
+        records = _tracked(iter_export_records(project_codes, cursor=args.cursor))
+    except ExportError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    if args.format == "parquet":
+        if not parquet_available():
+            print("parquet export requires pyarrow", file=sys.stderr)
+            return 1
+        if not args.output:
+            print("--output is required for parquet exports", file=sys.stderr)
+            return 1
+        written = write_parquet(records, args.output)
+    else:
+        written = 0
+        output = open(args.output, "ab" if args.cursor else "wb") if args.output else sys.stdout.buffer
+        try:
+            for line in iter_ndjson(records):
+                output.write(line)
+                written += 1
+        finally:
+            if args.output:
+                output.close()
+            else:
+                output.flush()
+
+    # Para reanudar una exportación interrumpida: --cursor <último cursor>
+    print(f"exported {written} records; last cursor: {last_cursor}", file=sys.stderr)
+    return 0
+
+
+def _run_features_backfill(args) -> int:
+    from app.core.database import iter_all_project_segments
+    from app.core.feature_store import record_segment_features
+
+    segments = rows = 0
+    for segment in iter_all_project_segments():
+        rows += record_segment_features(segment)
+        segments += 1
+    print(f"backfilled {rows} speaker rows from {segments} segments", file=sys.stderr)
+    return 0
+
+
+def _run_features_percentiles(args) -> int:
+    from app.core.feature_store import feature_percentiles
+
+    filters = {
+        "debate_type": args.debate_type,
+        "fase_id": args.fase_id,
+        "created_from": args.created_from,
+        "created_to": args.created_to,
+    }
+    summary = feature_percentiles(args.feature, percentiles=args.percentile or [10, 25, 50, 75, 90], **filters)
+    print(json.dumps(summary, indent=2))
+    return 0
+
+
+def _run_search_reindex(args) -> int:
+    from app.core.database import rebuild_search_index
+
+    projects, segments = rebuild_search_index()
+    print(f"indexed {projects} projects and {segments} segments", file=sys.stderr)
+    return 0
+
+
+def _run_debate_types_validate(args) -> int:
+    from data.debate_types import DEBATE_TYPES
+    from data.debate_types.registry import DebateTypeDefinitionError, load_definition
+
+    failed = 0
+    for path in args.path:
+        try:
+            config = load_definition(path, DEBATE_TYPES)
+        except (DebateTypeDefinitionError, OSError, UnicodeDecodeError) as exc:
+            print(f"{path}: {exc}", file=sys.stderr)
+            failed += 1
+            continue
+        print(f"{path}: ok ({config.id}, {len(config.fases)} fases, {len(config.criterios_config)} criterios)",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _run_debate_types_export(args) -> int:
+    from dataclasses import asdict, fields
+
+    from data.debate_types import get_debate_type
+
+    config = get_debate_type(args.debate_type)
+    definition = {f.name: getattr(config, f.name) for f in fields(config) if f.init}
+    definition["fases"] = [asdict(fase) for fase in config.fases]
+    definition["criterios_config"] = [asdict(criterio) for criterio in config.criterios_config]
+    # Plantilla para un formato nuevo: hereda los prompts en lugar de copiarlos
+    del definition["system_prompt"], definition["normativa"]
+    definition["prompts_from"] = config.id
+    print(json.dumps(definition, indent=2, ensure_ascii=False))
+    return 0
+
+
+def _run_audio_sweep(args) -> int:
+    from app.core.blob_store import sweep, usage
+
+    result = sweep(retention_days=args.retention_days) if args.retention_days is not None else sweep()
+    print(json.dumps({**result, "usage": usage()}, indent=2))
+    return 0
+
+
+def _run_runs_show(args) -> int:
+    from app.core.checkpoints import get_run
+
+    run = get_run(args.run_id)
+    if run is None:
+        print(f"run {args.run_id} not found", file=sys.stderr)
+        return 1
+    print(json.dumps(run, indent=2, ensure_ascii=False))
+    return 0
+
+
+def _run_runs_rerun(args) -> int:
+    from uuid import uuid4
+
+    from app.core import blob_store
+    from app.core.checkpoints import get_run
+    from app.services.analysis import PROJECT_ANALYSIS_GRAPH, run_project_analysis
+
+    run = get_run(args.run_id)
+    if run is None:
+        print(f"run {args.run_id} not found", file=sys.stderr)
+        return 1
+    try:
+        stages = PROJECT_ANALYSIS_GRAPH.with_dependents(args.stage)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    job = {**run["payload"], "run_id": args.run_id, "rerun": stages, "audio_ref": f"upload:{uuid4()}"}
+    blob = None
+    if job.get("audio_sha256"):
+        blob = blob_store.acquire(job["audio_sha256"], job["audio_ref"], job["project_code"])
+    if blob is None and {"transcription", "metrics"}.intersection(stages):
+        print("audio no longer available, re-run evaluation or persistence only", file=sys.stderr)
+        return 1
+    if blob is not None:
+        job["file_path"] = blob["path"]
+    print(f"re-running {', '.join(stages)} for run {args.run_id}", file=sys.stderr)
+    try:
+        result = run_project_analysis(job)
+    finally:
+        blob_store.release_job_audio(job)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0
+
+
+def _run_runs_prune(args) -> int:
+    from app.core.checkpoints import prune_runs
+
+    deleted = prune_runs(args.older_than_days * 86400)
+    print(f"pruned {deleted} runs", file=sys.stderr)
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="CiceronAI command line")
+    subparsers = parser.add_subparsers(dest="role", required=True)
+
+    api = subparsers.add_parser("api", help="serve the HTTP API")
+    api.add_argument("--host", default="127.0.0.1")
+    api.add_argument("--port", type=int, default=8000)
+    api.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    api.add_argument("--reload", action="store_true")
+    api.add_argument("--inline", action="store_true",
+                     help="run analyses inside the API process instead of queueing them")
+    api.set_defaults(handler=_run_api)
+
+    worker = subparsers.add_parser("worker", help="run queued analyses")
+    worker.add_argument("--concurrency", type=int,
+                        default=int(os.getenv("ANALYSIS_WORKER_CONCURRENCY", "1")),
+                        help="analyses run at the same time by this process")
+    worker.add_argument("--kind", action="append", choices=["analyse", "quick_analyse"],
+                        help="only take jobs of this kind (repeatable)")
+    worker.add_argument("--metrics-port", type=int,
+                        default=int(os.getenv("WORKER_METRICS_PORT", "0")),
+                        help="serve this worker's stage metrics at /metrics on this port (0 = off)")
+    worker.add_argument("--metrics-host", default=os.getenv("WORKER_METRICS_HOST", "0.0.0.0"))
+    worker.set_defaults(handler=_run_worker)
+
+    export = subparsers.add_parser("export", help="export analysis data as NDJSON or Parquet")
+    selection = export.add_mutually_exclusive_group()
+    selection.add_argument("--project", action="append", help="project code (repeatable)")
+    selection.add_argument("--user-code", help="export every project of this user")
+    export.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    export.add_argument("--output", help="output file (NDJSON defaults to stdout)")
+    export.add_argument("--cursor", help="resume after this record cursor (NDJSON appends to --output)")
+    export.set_defaults(handler=_run_export)
+
+    features = subparsers.add_parser("features", help="speaker feature store")
+    features_commands = features.add_subparsers(dest="features_command", required=True)
+    backfill = features_commands.add_parser("backfill", help="rebuild the store from project_segments")
+    backfill.set_defaults(handler=_run_features_backfill)
+    percentiles = features_commands.add_parser("percentiles", help="feature percentiles")
+    percentiles.add_argument("--feature", action="append", required=True, help="eGeMAPS feature (repeatable)")
+    percentiles.add_argument("--percentile", action="append", type=float)
+    percentiles.add_argument("--debate-type")
+    percentiles.add_argument("--fase-id")
+    percentiles.add_argument("--created-from", help="ISO date, inclusive")
+    percentiles.add_argument("--created-to", help="ISO date, exclusive")
+    percentiles.set_defaults(handler=_run_features_percentiles)
+
+    search = subparsers.add_parser("search", help="full-text search index")
+    search_commands = search.add_subparsers(dest="search_command", required=True)
+    reindex = search_commands.add_parser("reindex", help="rebuild the index from projects and project_segments")
+    reindex.set_defaults(handler=_run_search_reindex)
+
+    debate_types = subparsers.add_parser("debate-types", help="declarative debate type definitions")
+    debate_types_commands = debate_types.add_subparsers(dest="debate_types_command", required=True)
+    validate = debate_types_commands.add_parser("validate", help="validate JSON/YAML definition files")
+    validate.add_argument("path", nargs="+")
+    validate.set_defaults(handler=_run_debate_types_validate)
+    export_type = debate_types_commands.add_parser("export", help="print a debate type as a JSON definition")
+    export_type.add_argument("debate_type")
+    export_type.set_defaults(handler=_run_debate_types_export)
+
+    audio = subparsers.add_parser("audio", help="content-addressed audio store")
+    audio_commands = audio.add_subparsers(dest="audio_command", required=True)
+    sweep = audio_commands.add_parser("sweep", help="apply retention and delete unreferenced audio")
+    sweep.add_argument("--retention-days", type=float, help="override AUDIO_RETENTION_DAYS")
+    sweep.set_defaults(handler=_run_audio_sweep)
+
+    runs = subparsers.add_parser("runs", help="checkpointed project analysis runs")
+    runs_commands = runs.add_subparsers(dest="runs_command", required=True)
+    show = runs_commands.add_parser("show", help="print a run and its completed stages")
+    show.add_argument("run_id")
+    show.set_defaults(handler=_run_runs_show)
+    rerun = runs_commands.add_parser("rerun", help="re-run stages (and their dependents) inline")
+    rerun.add_argument("run_id")
+    rerun.add_argument("--stage", action="append", required=True,
+                       help="transcription, metrics, evaluation or persistence (repeatable)")
+    rerun.set_defaults(handler=_run_runs_rerun)
+    prune = runs_commands.add_parser("prune", help="delete checkpoints of inactive runs")
+    prune.add_argument("--older-than-days", type=float, default=30)
+    prune.set_defaults(handler=_run_runs_prune)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
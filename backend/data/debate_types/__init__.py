@@ -1,13 +1,14 @@
 """
 Registro central de tipos de debate.
 
-Importa y registra todas las configuraciones de tipos de debate disponibles.
-Para anadir un nuevo tipo de debate:
-1. Crear un archivo en data/debate_types/ con la configuracion
-2. Importar y registrar aqui en DEBATE_TYPES
+Los tipos integrados (UPCT, RETOR) se definen en Python junto a sus prompts.
+Para anadir un nuevo tipo de debate sin desplegar, basta con dejar un fichero
+JSON/YAML en DEBATE_TYPES_DIR (ver data/debate_types/registry.py): se valida
+y se carga en caliente.
 """
 
 from data.debate_types.base import DebateTypeConfig
+from data.debate_types.registry import DebateTypeRegistry
 from data.debate_types.upct import UPCT_CONFIG
 from data.debate_types.retor import RETOR_CONFIG
 from data.prompts.prompts import (
@@ -24,12 +25,15 @@ UPCT_CONFIG.normativa = normativa_fases_upct
 RETOR_CONFIG.system_prompt = system_prompt_retor
 RETOR_CONFIG.normativa = normativa_retor
 
-# Registro de tipos de debate: id -> config
+# Tipos de debate integrados: id -> config
 DEBATE_TYPES: dict[str, DebateTypeConfig] = {
     "upct": UPCT_CONFIG,
     "retor": RETOR_CONFIG,
 }
 
+# Integrados + ficheros declarativos, con recarga en caliente
+registry = DebateTypeRegistry(DEBATE_TYPES)
+
 DEFAULT_DEBATE_TYPE = "upct"
 
 
@@ -46,9 +50,9 @@ def get_debate_type(debate_type_id: str) -> DebateTypeConfig:
     Raises:
         ValueError si el tipo no existe
     """
-    config = DEBATE_TYPES.get(debate_type_id)
+    config = registry.get(debate_type_id)
     if config is None:
-        available = ", ".join(DEBATE_TYPES.keys())
+        available = ", ".join(registry.all().keys())
         raise ValueError(
             f"Tipo de debate '{debate_type_id}' no encontrado. "
             f"Tipos disponibles: {available}"
@@ -64,7 +68,7 @@ def list_debate_types() -> list[dict]:
         Lista de dicts con id, nombre, descripcion, fases, escala, modo
     """
     result = []
-    for dt_id, config in DEBATE_TYPES.items():
+    for dt_id, config in registry.all().items():
         result.append({
             "id": config.id,
             "nombre": config.nombre,
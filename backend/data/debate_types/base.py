@@ -5,9 +5,17 @@ Cada tipo de debate (UPCT, RETOR, etc.) debe crear una instancia de
 DebateTypeConfig con sus propias fases, criterios, escala y prompts.
 """
 
+import unicodedata
 from dataclasses import dataclass, field
 
 
+def normalize_alias(value: str) -> str:
+    """Forma canonica para comparar ids y nombres: sin acentos, minusculas y espacios simples."""
+    normalized = unicodedata.normalize("NFKD", value)
+    ascii_value = "".join(c for c in normalized if not unicodedata.combining(c))
+    return " ".join(ascii_value.lower().strip().split())
+
+
 @dataclass
 class FaseConfig:
     """Configuracion de una fase individual del debate."""
@@ -18,6 +26,7 @@ class FaseConfig:
     permite_preguntas: bool = True
     permite_minuto_oro: bool = False
     orador_unico: bool = False  # True si la fase debe hacerla un solo orador (ej: Conclusion RETOR)
+    aliases: list[str] = field(default_factory=list)  # Otros nombres aceptados en la API
 
 
 @dataclass
@@ -77,19 +86,59 @@ class DebateTypeConfig:
     # Tiempos por fase (fase_id -> segundos)
     tiempos_por_fase: dict[str, int] = field(default_factory=dict)
 
+    # Indices de busqueda, construidos una vez en __post_init__
+    _fases_by_id: dict[str, FaseConfig] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _fases_by_nombre: dict[str, FaseConfig] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _fases_by_alias: dict[str, FaseConfig] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _criterios_by_id: dict[str, CriterioConfig] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _posturas_by_alias: dict[str, str] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.build_indexes()
+
+    def build_indexes(self) -> None:
+        """
+        Construye los indices por id, nombre y alias normalizado.
+
+        Las configuraciones se tratan como inmutables: si se modifican fases,
+        criterios o posturas despues de crearlas hay que volver a llamarlo.
+        """
+        # En caso de colision gana la primera definicion, como en la busqueda lineal
+        self._fases_by_id = {}
+        self._fases_by_nombre = {}
+        self._fases_by_alias = {}
+        for fase in self.fases:
+            self._fases_by_id.setdefault(fase.id, fase)
+            self._fases_by_nombre.setdefault(fase.nombre, fase)
+        for fase in self.fases:
+            for alias in (fase.id, fase.nombre, *fase.aliases):
+                self._fases_by_alias.setdefault(normalize_alias(alias), fase)
+        self._criterios_by_id = {}
+        for criterio in self.criterios_config:
+            self._criterios_by_id.setdefault(criterio.id, criterio)
+        self._posturas_by_alias = {}
+        for postura in self.posturas:
+            self._posturas_by_alias.setdefault(normalize_alias(postura), postura)
+
     def get_fase_by_id(self, fase_id: str) -> FaseConfig | None:
         """Busca una fase por su ID."""
-        for fase in self.fases:
-            if fase.id == fase_id:
-                return fase
-        return None
+        return self._fases_by_id.get(fase_id)
 
     def get_fase_by_nombre(self, nombre: str) -> FaseConfig | None:
         """Busca una fase por su nombre display."""
-        for fase in self.fases:
-            if fase.nombre == nombre:
-                return fase
-        return None
+        return self._fases_by_nombre.get(nombre)
+
+    def resolve_fase(self, value: str) -> FaseConfig | None:
+        """Busca una fase por id, nombre o alias, sin distinguir mayusculas ni acentos."""
+        return (
+            self._fases_by_id.get(value)
+            or self._fases_by_nombre.get(value)
+            or self._fases_by_alias.get(normalize_alias(value))
+        )
+
+    def resolve_postura(self, value: str) -> str | None:
+        """Devuelve la postura canonica, sin distinguir mayusculas ni acentos."""
+        return self._posturas_by_alias.get(normalize_alias(value))
 
     def get_criterios_for_fase(self, fase_id: str) -> list[str]:
         """Devuelve los IDs de criterios para una fase dada."""
@@ -100,10 +149,7 @@ class DebateTypeConfig:
 
     def get_criterio_config(self, criterio_id: str) -> CriterioConfig | None:
         """Busca un criterio por su ID."""
-        for c in self.criterios_config:
-            if c.id == criterio_id:
-                return c
-        return None
+        return self._criterios_by_id.get(criterio_id)
 
     def get_fases_nombres(self) -> dict[str, str]:
         """Devuelve un dict nombre -> id para las fases."""
@@ -0,0 +1,335 @@
+"""
+Registro de tipos de debate con recarga en caliente.
+
+Junto a los tipos integrados (upct, retor), cada fichero JSON o YAML de
+DEBATE_TYPES_DIR declara un tipo de debate con los mismos campos que
+DebateTypeConfig. Los ficheros se validan al cargarse y el directorio se
+revisa como mucho cada DEBATE_TYPES_RELOAD_SECONDS: anadir, editar o borrar
+un fichero no requiere reiniciar. Un fichero invalido no se aplica (se
+mantiene su ultima version valida) y el error queda en `registry.errors`.
+
+Un fichero con el id de un tipo integrado lo sustituye. Los prompts se dan
+en linea (`system_prompt`, `normativa`), en ficheros relativos al de la
+definicion (`system_prompt_file`, `normativa_file`) o se heredan de un tipo
+integrado (`prompts_from`).
+"""
+
+import json
+import os
+import re
+import string
+import threading
+import time
+from dataclasses import fields
+from pathlib import Path
+
+from data.debate_types.base import CriterioConfig, DebateTypeConfig, FaseConfig, normalize_alias
+
+DEBATE_TYPES_DIR = Path(os.getenv(
+    "DEBATE_TYPES_DIR", str(Path(__file__).resolve().parent / "definitions")))
+DEBATE_TYPES_RELOAD_SECONDS = float(os.getenv("DEBATE_TYPES_RELOAD_SECONDS", "2"))
+DEFINITION_SUFFIXES = (".json", ".yaml", ".yml")
+EVALUATION_MODES = ("per_speaker", "per_team")
+
+_ID_PATTERN = re.compile(r"^[a-z0-9_]{1,32}$")
+_PROMPT_KEYS = {"system_prompt_file", "normativa_file", "prompts_from"}
+
+
+class DebateTypeDefinitionError(ValueError):
+    pass
+
+
+def _init_fields(cls) -> set[str]:
+    return {f.name for f in fields(cls) if f.init}
+
+
+def _check_keys(data: dict, allowed: set[str], required: tuple, where: str) -> None:
+    if not isinstance(data, dict):
+        raise DebateTypeDefinitionError(f"{where} must be an object")
+    unknown = sorted(set(data) - allowed)
+    if unknown:
+        raise DebateTypeDefinitionError(f"{where}: unknown fields {unknown}")
+    missing = [key for key in required if not data.get(key)]
+    if missing:
+        raise DebateTypeDefinitionError(f"{where}: missing required fields {missing}")
+
+
+def _check_type(value, expected, where: str) -> None:
+    # bool es subclase de int: no se acepta True como numero
+    if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+        raise DebateTypeDefinitionError(f"{where} must be of type {expected.__name__}")
+
+
+def _check_str_list(value, where: str) -> list[str]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise DebateTypeDefinitionError(f"{where} must be a list of strings")
+    return value
+
+
+def _check_prompt(prompt: str, where: str) -> None:
+    # El system prompt se usa como plantilla de LangChain: las llaves
+    # literales deben ir dobladas
+    try:
+        names = [name for _, name, _, _ in string.Formatter().parse(prompt) if name is not None]
+    except ValueError as exc:
+        raise DebateTypeDefinitionError(f"{where}: {exc}") from exc
+    if names:
+        raise DebateTypeDefinitionError(
+            f"{where} contains template fields {names}; escape literal braces as {{{{ }}}}")
+
+
+def _build_fase(data: dict, index: int) -> FaseConfig:
+    where = f"fases[{index}]"
+    _check_keys(data, _init_fields(FaseConfig), ("id", "nombre", "descripcion"), where)
+    for key in ("id", "nombre", "descripcion"):
+        _check_type(data[key], str, f"{where}.{key}")
+    if "tiempo_segundos" in data:
+        _check_type(data["tiempo_segundos"], int, f"{where}.tiempo_segundos")
+        if data["tiempo_segundos"] < 0:
+            raise DebateTypeDefinitionError(f"{where}.tiempo_segundos must be >= 0")
+    for key in ("permite_preguntas", "permite_minuto_oro", "orador_unico"):
+        if key in data:
+            _check_type(data[key], bool, f"{where}.{key}")
+    _check_str_list(data.get("aliases", []), f"{where}.aliases")
+    return FaseConfig(**data)
+
+
+def _build_criterio(data: dict, index: int) -> CriterioConfig:
+    where = f"criterios_config[{index}]"
+    _check_keys(data, _init_fields(CriterioConfig), ("id", "nombre", "descripcion"), where)
+    for key in ("id", "nombre", "descripcion"):
+        _check_type(data[key], str, f"{where}.{key}")
+    _check_str_list(data.get("sub_items", []), f"{where}.sub_items")
+    return CriterioConfig(**data)
+
+
+def _unique(values: list[str], where: str) -> None:
+    seen = set()
+    for value in values:
+        if value in seen:
+            raise DebateTypeDefinitionError(f"{where}: duplicated '{value}'")
+        seen.add(value)
+
+
+def _read_prompt_file(base_dir: Path, relative: str, where: str) -> str:
+    _check_type(relative, str, where)
+    try:
+        return (base_dir / relative).read_text(encoding="utf-8")
+    except OSError as exc:
+        raise DebateTypeDefinitionError(f"{where}: cannot read {relative}: {exc}") from exc
+
+
+def build_config(
+    data: dict,
+    base_dir: Path | None = None,
+    builtins: dict[str, DebateTypeConfig] | None = None,
+) -> DebateTypeConfig:
+    """
+    Valida una definicion declarativa y construye su DebateTypeConfig.
+
+    Raises:
+        DebateTypeDefinitionError con el primer problema encontrado
+    """
+    config_fields = _init_fields(DebateTypeConfig)
+    _check_keys(data, config_fields | _PROMPT_KEYS, ("id", "nombre", "descripcion", "fases", "criterios_config"),
+                "definition")
+    data = dict(data)
+
+    type_id = data["id"]
+    if not isinstance(type_id, str) or not _ID_PATTERN.match(type_id):
+        raise DebateTypeDefinitionError("id must match [a-z0-9_]{1,32}")
+
+    if not isinstance(data["fases"], list) or not isinstance(data["criterios_config"], list):
+        raise DebateTypeDefinitionError("fases and criterios_config must be lists")
+    fases = [_build_fase(item, i) for i, item in enumerate(data["fases"])]
+    criterios = [_build_criterio(item, i) for i, item in enumerate(data["criterios_config"])]
+    fase_ids = [fase.id for fase in fases]
+    criterio_ids = [criterio.id for criterio in criterios]
+    _unique(fase_ids, "fases.id")
+    _unique(criterio_ids, "criterios_config.id")
+    _unique(
+        [alias for fase in fases for alias in {normalize_alias(a) for a in (fase.id, fase.nombre, *fase.aliases)}],
+        "fases (id, nombre and aliases, ignoring case and accents)",
+    )
+
+    posturas = _check_str_list(data.get("posturas", ["A Favor", "En Contra"]), "posturas")
+    if len(posturas) < 2:
+        raise DebateTypeDefinitionError("posturas needs at least two values")
+    _unique([normalize_alias(postura) for postura in posturas], "posturas (ignoring case and accents)")
+
+    evaluation_mode = data.get("evaluation_mode", "per_speaker")
+    if evaluation_mode not in EVALUATION_MODES:
+        raise DebateTypeDefinitionError(f"evaluation_mode must be one of {list(EVALUATION_MODES)}")
+
+    escala_min = data.get("escala_min", 0)
+    escala_max = data.get("escala_max", 4)
+    _check_type(escala_min, int, "escala_min")
+    _check_type(escala_max, int, "escala_max")
+    if escala_min >= escala_max:
+        raise DebateTypeDefinitionError("escala_min must be lower than escala_max")
+
+    criterios_por_fase = data.get("criterios_por_fase", {})
+    if not isinstance(criterios_por_fase, dict):
+        raise DebateTypeDefinitionError("criterios_por_fase must be an object")
+    for fase_id, ids in criterios_por_fase.items():
+        if fase_id not in fase_ids:
+            raise DebateTypeDefinitionError(f"criterios_por_fase: unknown fase '{fase_id}'")
+        unknown = sorted(set(_check_str_list(ids, f"criterios_por_fase.{fase_id}")) - set(criterio_ids))
+        if unknown:
+            raise DebateTypeDefinitionError(f"criterios_por_fase.{fase_id}: unknown criterios {unknown}")
+    if evaluation_mode == "per_speaker":
+        without = [fase_id for fase_id in fase_ids if not criterios_por_fase.get(fase_id)]
+        if without:
+            raise DebateTypeDefinitionError(f"criterios_por_fase: per_speaker types need criterios for {without}")
+
+    tiempos = data.get("tiempos_por_fase", {})
+    if not isinstance(tiempos, dict) or not set(tiempos) <= set(fase_ids):
+        raise DebateTypeDefinitionError("tiempos_por_fase must map known fase ids to seconds")
+
+    has_final_phase = data.get("has_final_phase", False)
+    _check_type(has_final_phase, bool, "has_final_phase")
+    if has_final_phase and data.get("final_phase_id") not in fase_ids:
+        raise DebateTypeDefinitionError("final_phase_id must be one of the fase ids when has_final_phase is set")
+
+    prompts_from = data.pop("prompts_from", None)
+    if prompts_from is not None:
+        source = (builtins or {}).get(prompts_from)
+        if source is None:
+            raise DebateTypeDefinitionError(f"prompts_from: unknown built-in debate type '{prompts_from}'")
+        data.setdefault("system_prompt", source.system_prompt)
+        data.setdefault("normativa", source.normativa)
+    base_dir = base_dir or Path.cwd()
+    for key in ("system_prompt", "normativa"):
+        file_key = f"{key}_file"
+        if file_key in data:
+            if key in data and prompts_from is None:
+                raise DebateTypeDefinitionError(f"use either {key} or {file_key}, not both")
+            data[key] = _read_prompt_file(base_dir, data.pop(file_key), file_key)
+        _check_type(data.get(key, ""), str, key)
+    if not data.get("system_prompt", "").strip():
+        raise DebateTypeDefinitionError("system_prompt is required (inline, system_prompt_file or prompts_from)")
+    _check_prompt(data["system_prompt"], "system_prompt")
+
+    data["fases"] = fases
+    data["criterios_config"] = criterios
+    data["posturas"] = posturas
+    return DebateTypeConfig(**data)
+
+
+def _parse_file(path: Path) -> dict:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix == ".json":
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise DebateTypeDefinitionError(f"invalid JSON: {exc}") from exc
+    try:
+        import yaml
+    except ImportError as exc:
+        raise DebateTypeDefinitionError("YAML definitions require pyyaml") from exc
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as exc:
+        raise DebateTypeDefinitionError(f"invalid YAML: {exc}") from exc
+
+
+def load_definition(path: str | Path, builtins: dict[str, DebateTypeConfig] | None = None) -> DebateTypeConfig:
+    """Lee y valida un fichero de definicion (.json, .yaml o .yml)."""
+    path = Path(path)
+    if path.suffix not in DEFINITION_SUFFIXES:
+        raise DebateTypeDefinitionError(f"unsupported definition file {path.name}")
+    return build_config(_parse_file(path), base_dir=path.parent, builtins=builtins)
+
+
+def _file_signature(path: Path):
+    st = path.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+class DebateTypeRegistry:
+    """Tipos integrados + ficheros de un directorio, recargados por mtime."""
+
+    def __init__(
+        self,
+        builtins: dict[str, DebateTypeConfig],
+        directory: Path = DEBATE_TYPES_DIR,
+        reload_seconds: float = DEBATE_TYPES_RELOAD_SECONDS,
+    ):
+        self._builtins = dict(builtins)
+        self.directory = Path(directory)
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._types: dict[str, DebateTypeConfig] = dict(builtins)
+        # fichero -> (firma, config) de la ultima version valida
+        self._loaded: dict[Path, tuple] = {}
+        self._signature = None
+        self._checked_at: float | None = None
+        self.errors: dict[str, str] = {}
+
+    def _scan(self) -> list[tuple[Path, tuple]]:
+        files = []
+        try:
+            candidates = sorted(self.directory.iterdir())
+        except FileNotFoundError:
+            return files
+        for path in candidates:
+            if path.suffix in DEFINITION_SUFFIXES and path.is_file():
+                try:
+                    files.append((path, _file_signature(path)))
+                except FileNotFoundError:
+                    continue
+        return files
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.reload_seconds:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.reload_seconds:
+                return
+            self._checked_at = now
+            files = self._scan()
+            signature = tuple((path.name, file_signature) for path, file_signature in files)
+            if signature == self._signature and not force:
+                return
+
+            types = dict(self._builtins)
+            loaded = {}
+            errors = {}
+            file_ids: dict[str, str] = {}
+            for path, file_signature in files:
+                cached = self._loaded.get(path)
+                if cached is not None and cached[0] == file_signature:
+                    config = cached[1]
+                else:
+                    try:
+                        config = load_definition(path, self._builtins)
+                    except Exception as exc:
+                        # Cualquier fallo de un fichero (p. ej. UnicodeDecodeError)
+                        # se queda en ese fichero: get() nunca debe lanzar
+                        errors[path.name] = str(exc)
+                        print(f"invalid debate type definition {path.name}: {exc}")
+                        if cached is None:
+                            continue
+                        # Se mantiene la ultima version valida del fichero
+                        config = cached[1]
+                if config.id in file_ids:
+                    errors[path.name] = f"debate type '{config.id}' already defined in {file_ids[config.id]}"
+                    print(f"invalid debate type definition {path.name}: {errors[path.name]}")
+                    continue
+                file_ids[config.id] = path.name
+                loaded[path] = (cached[0] if path.name in errors else file_signature, config)
+                types[config.id] = config
+
+            self._loaded = loaded
+            self._types = types
+            self._signature = signature
+            self.errors = errors
+
+    def get(self, debate_type_id: str) -> DebateTypeConfig | None:
+        self.refresh()
+        return self._types.get(debate_type_id)
+
+    def all(self) -> dict[str, DebateTypeConfig]:
+        self.refresh()
+        return dict(self._types)
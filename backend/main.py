@@ -1,10 +1,29 @@
+import os
+import threading
+from importlib import import_module
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.v1.endpoints import router as router
+from app.core.blob_store import start_sweeper
+from app.core.instrumentation import render_prometheus
+from app.core.serialization import DefaultJSONResponse
+
+# Respuestas por debajo de este tamaño no compensan el coste de comprimir
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
 
-app = FastAPI(title="CiceronAI")
+app = FastAPI(title="CiceronAI", default_response_class=DefaultJSONResponse)
 app.include_router(router, prefix="/api/v1")
 
+# brotli (con gzip como alternativa) si brotli-asgi está instalado; si no, gzip
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],      # <--- Esto permite cualquier origen
@@ -17,3 +36,31 @@ app.add_middleware(
 @app.get("/")
 async def root():
     return {"message": "welcome to ciceron AI"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(
+        render_prometheus(),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+def _import_ml_stack():
+    for module_name in ("app.services.metrics", "app.processors.pipeline"):
+        import_module(module_name)
+
+
+@app.on_event("startup")
+async def preload_ml_stack():
+    # El stack ML (Whisper, pyannote, openSMILE, LangChain) se importa de forma
+    # diferida en el primer análisis. En procesos dedicados a analizar se puede
+    # precargar en segundo plano para no penalizar la primera petición.
+    if os.getenv("CICERON_PRELOAD_MODELS", "0") == "1":
+        threading.Thread(target=_import_ml_stack, name="ml-preload", daemon=True).start()
+
+
+@app.on_event("startup")
+async def start_audio_sweeper():
+    # Retención del almacén de audio; AUDIO_SWEEP_INTERVAL_SECONDS=0 lo desactiva
+    start_sweeper()